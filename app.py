@@ -571,17 +571,42 @@ def main():
             "content": query_to_run
         })
         
-        # Yanıt üret
-        with st.spinner("🤔 Tarihsel kayıtlar araştırılıyor..."):
+        display_message("user", query_to_run)
+        
+        # Yanıt üret: Gemini'nin ürettiği metin geldikçe placeholder'a yazılır
+        # (kullanıcı tüm yanıtı değil ilk token'ı bekler)
+        with st.chat_message("assistant", avatar="📜"):
+            placeholder = st.empty()
+            placeholder.markdown("🤔 Tarihsel kayıtlar araştırılıyor...")
             try:
-                result = st.session_state.rag_system.query(query_to_run)
+                response_text = ""
+                result = None
+                stream_error = False
+                saved = False
+                for event in st.session_state.rag_system.query_stream(query_to_run):
+                    if event["type"] == "delta":
+                        response_text += event["text"]
+                        placeholder.markdown(response_text + "▌")
+                    elif event["type"] == "error":
+                        # Yarım kalan yanıt hata notuyla işaretlenir, hata metni yanıta eklenmez
+                        stream_error = True
+                        if event["partial"]:
+                            response_text = (f"{event['partial']}\n\n---\n"
+                                             f"⚠️ *Yanıt tamamlanamadı, yukarıdaki metin eksik olabilir. "
+                                             f"{event['message']}*")
+                        else:
+                            response_text = event["message"]
+                    else:
+                        result = event["result"]
+                placeholder.markdown(response_text)
                 
-                # Bot yanıtını ekle
+                # Bot yanıtını ekle (hata durumunda ekranda gösterilen işaretli metin saklanır)
                 st.session_state.messages.append({
                     "role": "assistant",
-                    "content": result["response"],
+                    "content": response_text if stream_error else result["response"],
                     "sources": result["sources"]
                 })
+                saved = True
 
                 # Bir sonraki render'da en alta scroll yapılması için bayrağı ayarla
                 st.session_state.scroll_to_bottom = True
@@ -590,7 +615,23 @@ def main():
                 st.rerun()
 
             except Exception as e:
-                st.error(f"Sorgu işlenirken bir hata oluştu: {str(e)}")
+                if saved:
+                    raise
+                # Akış başladıysa kullanıcının gördüğü kısmi yanıt silinmez, hata notuyla saklanır
+                if response_text:
+                    response_text += (f"\n\n---\n⚠️ *Yanıt tamamlanamadı, yukarıdaki metin eksik olabilir. "
+                                      f"Hata: {str(e)}*")
+                    placeholder.markdown(response_text)
+                    st.session_state.messages.append({
+                        "role": "assistant",
+                        "content": response_text,
+                        "sources": result["sources"] if result else []
+                    })
+                    st.session_state.scroll_to_bottom = True
+                    st.rerun()
+                else:
+                    placeholder.empty()
+                    st.error(f"Sorgu işlenirken bir hata oluştu: {str(e)}")
                 
     # Eğer bir önceki adımda yeni mesaj eklendiyse (bayrak True ise),
     # sayfanın en altına kaydırmak için JS enjekte et.
@@ -3,19 +3,22 @@ Tarih Bilgi Rehberi Chatbot Package
 RAG tabanlı Türk Tarihi bilgi asistanı
 """
 
+import importlib
+
 __version__ = "1.0.0"
 __author__ = "Akbank GenAI Bootcamp"
 __description__ = "RAG-based Turkish History information chatbot"
 
-# Import ana modülleri
-from .rag_system import RAGSystem
-from .retrieval import FAISSRetriever
-from .utils import (
-    clean_text,
-    Timer,
-    SimpleLogger,
-    ensure_dir
-)
+# Ana modüller ilk erişimde import edilir: "from src import clean_text" RAGSystem'in
+# ağır bağımlılıklarını (Gemini, PyTorch / ONNX Runtime, FAISS) yüklemez
+_LAZY_ATTRS = {
+    'RAGSystem': '.rag_system',
+    'FAISSRetriever': '.retrieval',
+    'clean_text': '.utils',
+    'Timer': '.utils',
+    'SimpleLogger': '.utils',
+    'ensure_dir': '.utils'
+}
 
 __all__ = [
     'RAGSystem',
@@ -24,4 +27,19 @@ __all__ = [
     'Timer',
     'SimpleLogger',
     'ensure_dir'
-]
\ No newline at end of file
+]
+
+
+def __getattr__(name):
+    """Paket özniteliğini ilk erişimde ilgili modülden yükle"""
+    module_name = _LAZY_ATTRS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value  # Sonraki erişimler doğrudan gelsin
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,494 @@
+"""
+Artefakt Paketi Modülü
+FAISS index'i, chunk deposu ve embedding modeli dosyalarını sürümlü, checksum'lı
+tek bir paket (bundle) olarak yayınlar, indirir ve doğrular
+
+Paket dizini:
+    artifacts.json      -> sürüm, boyut (dimension), index tipi, model adı, dosya hash'leri
+    faiss_index/...     -> index.faiss, chunk_store/, bm25/, stats.json (veya shards/)
+    embedding_model/... -> sentence-transformers model dosyaları (opsiyonel)
+
+Kurulum models/artifacts/<sürüm>/ altına yapılır; dosyalar önce geçici bir dizine
+paralel indirilir ve SHA-256 ile doğrulanır, sonra dizin tek rename ile yerine konur
+ve current.json atomik olarak yeni sürümü gösterir. Yarım kalan kurulum mevcut
+sürümü bozmaz. Kurulu ve doğrulanmış paket varsa hiçbir uzak çağrı yapılmaz;
+offline modda ağa hiç çıkılmaz.
+
+Kurulu paket salt okunurdur: index (upsert / silme, compaction, metadata.json
+dönüşümü) paketin kendisinde değil, sürümün ilk etkinleştirilmesinde oluşturulan
+models/artifacts/work/<sürüm>/ çalışma kopyasında açılır. Böylece paket manifestle
+uyumlu kalır ve sonraki açılışlarda yeniden indirilmez. Sürüm ilk kez
+etkinleştirilirken tüm dosyaların hash'i kontrol edilir; sonraki açılışlarda
+(ARTIFACT_VERIFY=full değilse) sadece boyutlar.
+
+Ayna (mirror) yerel bir dizin veya URL (file://, http://, https://) olabilir;
+paketteki dosyalar aynanın köküne göre aynı yollarda beklenir.
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path, PurePosixPath, PureWindowsPath
+from typing import Dict, List, Optional
+
+
+MANIFEST_FILE = "artifacts.json"
+MANIFEST_FORMAT = 1
+CURRENT_FILE = "current.json"
+INDEX_SUBDIR = "faiss_index"
+MODEL_SUBDIR = "embedding_model"
+WORK_SUBDIR = "work"
+
+DEFAULT_ARTIFACT_DIR = "models/artifacts"
+DEFAULT_FETCH_WORKERS = 8
+DEFAULT_RETRIES = 3
+DEFAULT_TIMEOUT = 60
+READ_CHUNK = 1024 * 1024
+
+# Sürüm adı tek bir dizin adı olmalı (kurulum dizini ve staging adında kullanılır)
+_VERSION_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._+-]*$")
+
+
+class ArtifactError(RuntimeError):
+    """Paket bulunamadı, doğrulanamadı veya offline modda indirilmesi gerekti"""
+
+
+def file_sha256(path: Path) -> str:
+    """Dosyanın SHA-256 hash'i (parça parça okunur)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(READ_CHUNK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def safe_join(base: Path, relative_path: str) -> Path:
+    """
+    Manifestten (uzak aynadan) gelen göreli yolu base altına güvenle ekle.
+    Mutlak yollar, "..", boş / "." bileşenler ve ters bölü reddedilir; sonuç
+    (sembolik bağlar çözüldükten sonra) base dışına çıkıyorsa hata verilir.
+
+    Args:
+        base: Kök dizin
+        relative_path: "/" ayraçlı göreli yol
+
+    Returns:
+        base altındaki yol
+    """
+    parts = relative_path.split("/") if isinstance(relative_path, str) else [""]
+    if (not relative_path or "\\" in relative_path or PurePosixPath(relative_path).is_absolute()
+            or PureWindowsPath(relative_path).drive or any(part in ("", ".", "..") for part in parts)):
+        raise ArtifactError(f"Geçersiz paket dosya yolu: {relative_path!r}")
+
+    base = Path(base)
+    path = base.joinpath(*parts)
+    if not path.resolve().is_relative_to(base.resolve()):
+        raise ArtifactError(f"Paket dosya yolu paket dizini dışına çıkıyor: {relative_path!r}")
+    return path
+
+
+def check_version(version: str) -> str:
+    """Sürüm adının tek ve güvenli bir dizin adı olduğunu doğrula"""
+    if not isinstance(version, str) or not _VERSION_RE.match(version) or version == WORK_SUBDIR:
+        raise ArtifactError(f"Geçersiz paket sürümü: {version!r}")
+    return version
+
+
+def _write_json_atomic(path: Path, data: Dict):
+    """JSON dosyasını geçici dosya + os.replace ile atomik yaz"""
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def build_manifest(bundle_dir: str, version: str, model_name: str = None) -> Dict:
+    """
+    Paket dizinindeki tüm dosyaları hash'leyip artifacts.json oluştur
+
+    Args:
+        bundle_dir: Paket dizini (faiss_index/ ve opsiyonel embedding_model/ içerir)
+        version: Paket sürümü (örn. "2025.06.1")
+        model_name: Index'i oluşturan embedding modeli (None ise stats.json'dan)
+
+    Returns:
+        Manifest dictionary
+    """
+    bundle_dir = Path(bundle_dir)
+    # Shard'lı index'te stats.json her shard'ın kendi dizinindedir
+    stats = {}
+    index_dir = bundle_dir / INDEX_SUBDIR
+    stats_files = [index_dir / "stats.json"] + sorted(index_dir.glob("shards/*/stats.json"))
+    for stats_file in stats_files:
+        if stats_file.exists():
+            with open(stats_file, 'r', encoding='utf-8') as f:
+                stats = json.load(f)
+            break
+
+    files = []
+    for path in sorted(bundle_dir.rglob("*")):
+        if not path.is_file() or path.name in (MANIFEST_FILE, CURRENT_FILE) or path.name.endswith(".tmp"):
+            continue
+        files.append({
+            "path": path.relative_to(bundle_dir).as_posix(),
+            "size": path.stat().st_size,
+            "sha256": file_sha256(path)
+        })
+
+    manifest = {
+        "format": MANIFEST_FORMAT,
+        "version": version,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "model_name": model_name or stats.get("model_name"),
+        "embedding_backend": stats.get("embedding_backend", "torch"),
+        "dimension": stats.get("dimension"),
+        "index_type": stats.get("index", {}).get("factory", "Flat"),
+        "files": files
+    }
+    _write_json_atomic(bundle_dir / MANIFEST_FILE, manifest)
+    return manifest
+
+
+def create_bundle(output_dir: str, version: str, index_dir: str = "models/faiss_index",
+                  model_dir: str = None) -> Dict:
+    """
+    Mevcut index'i (ve opsiyonel yerel model dizinini) yayınlanabilir pakete kopyala
+
+    Args:
+        output_dir: Paket dizini (ayna olarak sunulabilir)
+        version: Paket sürümü
+        index_dir: Kaynak FAISS index dizini
+        model_dir: Kaynak sentence-transformers model dizini (None: model paketlenmez)
+
+    Returns:
+        Manifest dictionary
+    """
+    output_dir = Path(output_dir)
+    if output_dir.exists():
+        shutil.rmtree(output_dir)
+    output_dir.mkdir(parents=True)
+
+    shutil.copytree(index_dir, output_dir / INDEX_SUBDIR,
+                    ignore=shutil.ignore_patterns("*.tmp", "__pycache__"))
+    if model_dir:
+        shutil.copytree(model_dir, output_dir / MODEL_SUBDIR,
+                        ignore=shutil.ignore_patterns("*.tmp", "__pycache__"))
+
+    manifest = build_manifest(output_dir, version)
+    print(f"✅ Paket oluşturuldu: {output_dir} (sürüm {version}, {len(manifest['files'])} dosya)")
+    return manifest
+
+
+class ArtifactStore:
+    """Sürümlü paketlerin yerel deposu: doğrulama, paralel indirme, atomik kurulum"""
+
+    def __init__(self, root: str = DEFAULT_ARTIFACT_DIR, mirror: str = None, offline: bool = False,
+                 version: str = None, max_workers: int = DEFAULT_FETCH_WORKERS, full_verify: bool = False):
+        """
+        Args:
+            root: Kurulu paketlerin dizini
+            mirror: Paket aynası (yerel dizin veya file:// / http(s):// URL'i)
+            offline: Ağa hiç çıkma (paket kurulu değilse hata)
+            version: İstenen paket sürümü (None: kurulu olan, yoksa aynadaki)
+            max_workers: Paralel indirme thread sayısı
+            full_verify: Açılışta boyut yerine tüm dosyaların hash'ini kontrol et
+        """
+        self.root = Path(root)
+        self.mirror = mirror
+        self.offline = offline
+        self.version = version
+        self.max_workers = max_workers
+        self.full_verify = full_verify
+
+    @classmethod
+    def from_env(cls) -> "ArtifactStore":
+        """ARTIFACT_DIR, ARTIFACT_MIRROR, ARTIFACT_VERSION, OFFLINE, ARTIFACT_VERIFY ortam değişkenlerinden oluştur"""
+        return cls(
+            root=os.getenv("ARTIFACT_DIR", DEFAULT_ARTIFACT_DIR),
+            mirror=os.getenv("ARTIFACT_MIRROR") or None,
+            offline=os.getenv("OFFLINE", "0") == "1",
+            version=os.getenv("ARTIFACT_VERSION") or None,
+            max_workers=int(os.getenv("ARTIFACT_FETCH_WORKERS", DEFAULT_FETCH_WORKERS)),
+            full_verify=os.getenv("ARTIFACT_VERIFY", "size") == "full"
+        )
+
+    # ==================== KURULU PAKET ====================
+
+    def current(self) -> Optional[Dict]:
+        """Kurulu paketin manifesti (yoksa None)"""
+        current_file = self.root / CURRENT_FILE
+        if not current_file.exists():
+            return None
+        with open(current_file, 'r', encoding='utf-8') as f:
+            pointer = json.load(f)
+        manifest_file = safe_join(self.root, check_version(pointer["path"])) / MANIFEST_FILE
+        if not manifest_file.exists():
+            return None
+        with open(manifest_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def bundle_dir(self, version: str) -> Path:
+        """Sürümün kurulum dizini"""
+        return self.root / check_version(version)
+
+    def work_dir(self, version: str) -> Path:
+        """Sürümün yazılabilir çalışma dizini (index burada açılır)"""
+        return self.root / WORK_SUBDIR / check_version(version)
+
+    def verify(self, manifest: Dict, bundle_dir: Path, full: bool = None) -> List[str]:
+        """
+        Paket dosyalarını manifeste göre doğrula
+
+        Args:
+            manifest: Paket manifesti
+            bundle_dir: Paket dizini
+            full: Hash'leri de kontrol et (None: full_verify ayarı)
+
+        Returns:
+            Eksik veya bozuk dosyaların yolları (boş: paket sağlam)
+        """
+        full = self.full_verify if full is None else full
+        bad = []
+        for entry in manifest["files"]:
+            path = safe_join(bundle_dir, entry["path"])
+            if not path.is_file() or path.stat().st_size != entry["size"]:
+                bad.append(entry["path"])
+            elif full and file_sha256(path) != entry["sha256"]:
+                bad.append(entry["path"])
+        return bad
+
+    def ensure(self) -> Optional[Path]:
+        """
+        İstenen paketin kurulu ve sağlam olduğundan emin ol (gerekirse aynadan kur).
+        Kurulu paket yeterliyse hiçbir uzak çağrı yapılmaz.
+
+        Returns:
+            Paket dizini (ayna yapılandırılmamış ve kurulu paket yoksa None)
+        """
+        installed = self.current()
+        if installed is not None and self.version in (None, installed["version"]):
+            bundle_dir = self.bundle_dir(installed["version"])
+            # Henüz etkinleştirilmemiş (çalışma kopyası olmayan) sürümde tüm hash'ler kontrol edilir
+            full = True if not self.work_dir(installed["version"]).exists() else None
+            bad = self.verify(installed, bundle_dir, full=full)
+            if not bad:
+                print(f"✅ Artefakt paketi doğrulandı (sürüm {installed['version']}"
+                      f"{', tam hash kontrolü' if full else ''})")
+                return bundle_dir
+            print(f"⚠️  Artefakt paketinde {len(bad)} eksik / bozuk dosya: {', '.join(bad[:3])}")
+
+        if self.mirror is None:
+            if installed is not None or self.version is not None:
+                raise ArtifactError("Geçerli artefakt paketi yok ve ARTIFACT_MIRROR tanımlı değil")
+            return None
+        if self.offline:
+            raise ArtifactError("Offline mod: artefakt paketi kurulu değil veya bozuk, ağa çıkılmıyor")
+
+        return self.install(self.fetch_manifest())
+
+    def activate(self, bundle_dir: Path) -> Path:
+        """
+        Paketteki index'in yazılabilir çalışma kopyasını döndür (ilk etkinleştirmede
+        oluşturulur; sonraki açılışlarda mevcut kopya ve üzerindeki upsert'ler kullanılır).
+        Paket dizini hiçbir zaman değiştirilmez.
+
+        Args:
+            bundle_dir: ensure() ile doğrulanmış paket dizini
+
+        Returns:
+            Çalışma kopyasındaki index dizini
+        """
+        work_dir = self.work_dir(bundle_dir.name)
+        if work_dir.exists():
+            return work_dir / INDEX_SUBDIR
+
+        # Kopya önce geçici dizine yapılır; yarım kalan kopya çalışma dizini sayılmaz
+        staging = work_dir.with_name(f".staging-{bundle_dir.name}-{os.getpid()}")
+        if staging.exists():
+            shutil.rmtree(staging)
+        try:
+            shutil.copytree(bundle_dir / INDEX_SUBDIR, staging / INDEX_SUBDIR,
+                            ignore=shutil.ignore_patterns("*.tmp"))
+            os.replace(staging, work_dir)
+        except OSError:
+            # Aynı anda başlayan başka bir süreç kopyayı önce yerine koyduysa o kullanılır
+            shutil.rmtree(staging, ignore_errors=True)
+            if not work_dir.exists():
+                raise
+            return work_dir / INDEX_SUBDIR
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        print(f"📂 Index çalışma kopyası oluşturuldu: {work_dir}")
+        return work_dir / INDEX_SUBDIR
+
+    # ==================== İNDİRME / KURULUM ====================
+
+    def _open(self, relative_path: str):
+        """Aynadaki dosyayı binary stream olarak aç"""
+        if "://" in self.mirror:
+            url = self.mirror.rstrip("/") + "/" + urllib.parse.quote(relative_path)
+            return urllib.request.urlopen(url, timeout=DEFAULT_TIMEOUT)
+        return open(safe_join(Path(self.mirror), relative_path), 'rb')
+
+    def fetch_manifest(self) -> Dict:
+        """Aynadaki paket manifestini oku ve kontrol et"""
+        print(f"📂 Artefakt manifesti okunuyor: {self.mirror}")
+        with self._open(MANIFEST_FILE) as f:
+            manifest = json.loads(f.read().decode('utf-8'))
+
+        if manifest.get("format") != MANIFEST_FORMAT:
+            raise ArtifactError(f"Desteklenmeyen manifest formatı: {manifest.get('format')}")
+        if self.version is not None and manifest["version"] != self.version:
+            raise ArtifactError(f"Aynadaki sürüm {manifest['version']}, istenen {self.version}")
+
+        # Sürüm ve dosya yolları uzak kaynaktan gelir: paket dizini dışına yazılamamalı
+        check_version(manifest["version"])
+        for entry in manifest["files"]:
+            safe_join(self.root, entry["path"])
+        return manifest
+
+    def _fetch_file(self, entry: Dict, target: Path):
+        """Dosyayı indir, boyutunu ve hash'ini doğrula (başarısız olursa tekrar dener)"""
+        target.parent.mkdir(parents=True, exist_ok=True)
+        last_error = None
+        for attempt in range(DEFAULT_RETRIES):
+            try:
+                digest = hashlib.sha256()
+                size = 0
+                with self._open(entry["path"]) as source, open(target, 'wb') as f:
+                    for block in iter(lambda: source.read(READ_CHUNK), b""):
+                        digest.update(block)
+                        size += len(block)
+                        f.write(block)
+                if size != entry["size"] or digest.hexdigest() != entry["sha256"]:
+                    raise ArtifactError(f"Checksum uyuşmazlığı: {entry['path']}")
+                return
+            except (OSError, ArtifactError) as e:
+                last_error = e
+                time.sleep(0.5 * 2 ** attempt)
+        raise ArtifactError(f"{entry['path']} indirilemedi: {last_error}")
+
+    def _reuse_file(self, entry: Dict, installed: Optional[Dict], target: Path) -> bool:
+        """Kurulu pakette aynı hash'li dosya varsa indirmeden staging'e bağla / kopyala"""
+        if installed is None:
+            return False
+        previous = {item["path"]: item for item in installed["files"]}.get(entry["path"])
+        source = safe_join(self.bundle_dir(installed["version"]), entry["path"])
+        if previous is None or previous["sha256"] != entry["sha256"] or not source.is_file():
+            return False
+        if file_sha256(source) != entry["sha256"]:
+            return False
+
+        target.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.link(source, target)
+        except OSError:
+            shutil.copy2(source, target)
+        return True
+
+    def install(self, manifest: Dict) -> Path:
+        """
+        Paketi geçici dizine paralel indir, doğrula ve atomik olarak kur
+
+        Args:
+            manifest: Aynadaki paket manifesti
+
+        Returns:
+            Kurulan paket dizini
+        """
+        version = check_version(manifest["version"])
+        for entry in manifest["files"]:
+            safe_join(self.root, entry["path"])  # Geçersiz yol varsa hiçbir şey yazılmadan hata
+        self.root.mkdir(parents=True, exist_ok=True)
+        staging = self.root / f".staging-{version}-{os.getpid()}"
+        if staging.exists():
+            shutil.rmtree(staging)
+        staging.mkdir()
+
+        installed = self.current()
+        try:
+            # Önceki sürümde değişmeyen dosyalar yeniden indirilmez
+            to_fetch = [entry for entry in manifest["files"]
+                        if not self._reuse_file(entry, installed, safe_join(staging, entry["path"]))]
+            total_bytes = sum(entry["size"] for entry in to_fetch)
+            print(f"📥 {len(to_fetch)}/{len(manifest['files'])} dosya indiriliyor "
+                  f"({total_bytes / 1024 / 1024:.1f} MB, {self.max_workers} paralel)...")
+
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                # list(): ilk hata burada yükselir
+                list(executor.map(lambda entry: self._fetch_file(entry, safe_join(staging, entry["path"])),
+                                  to_fetch))
+
+            _write_json_atomic(staging / MANIFEST_FILE, manifest)
+
+            # Dizin tek rename ile yerine konur, sonra current.json yeni sürümü gösterir
+            target = self.bundle_dir(version)
+            if target.exists():
+                shutil.rmtree(target)
+            os.replace(staging, target)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        _write_json_atomic(self.root / CURRENT_FILE, {"version": version, "path": version})
+        # Yeni sürüm + bir önceki sürüm (geri dönüş için) tutulur
+        self._prune(keep={version, installed["version"] if installed else version})
+        print(f"✅ Artefakt paketi kuruldu: {target} (sürüm {version})")
+        return target
+
+    def _prune(self, keep: set):
+        """Tutulacak sürümler dışındaki eski kurulumları ve çalışma kopyalarını sil"""
+        for parent in (self.root, self.root / WORK_SUBDIR):
+            if not parent.is_dir():
+                continue
+            for path in parent.iterdir():
+                if (path.is_dir() and not path.name.startswith(".") and path.name not in keep
+                        and path.name != WORK_SUBDIR):
+                    shutil.rmtree(path, ignore_errors=True)
+
+
+def main():
+    """
+    Komut satırı:
+        python src/artifacts.py build <paket_dizini> <sürüm> [model_dizini]
+        python src/artifacts.py fetch    (ARTIFACT_MIRROR / ARTIFACT_VERSION ile)
+        python src/artifacts.py verify   (tüm hash'ler kontrol edilir)
+    """
+    command = sys.argv[1] if len(sys.argv) > 1 else "verify"
+
+    if command == "build":
+        if len(sys.argv) < 4:
+            print("Kullanım: python src/artifacts.py build <paket_dizini> <sürüm> [model_dizini]")
+            sys.exit(1)
+        create_bundle(sys.argv[2], sys.argv[3], model_dir=sys.argv[4] if len(sys.argv) > 4 else None)
+        return
+
+    store = ArtifactStore.from_env()
+    if command == "fetch":
+        bundle_dir = store.ensure()
+        print(f"📂 Paket dizini: {bundle_dir}")
+    elif command == "verify":
+        manifest = store.current()
+        if manifest is None:
+            print("⚠️  Kurulu artefakt paketi yok")
+            sys.exit(1)
+        bad = store.verify(manifest, store.bundle_dir(manifest["version"]), full=True)
+        if bad:
+            print(f"❌ {len(bad)} bozuk / eksik dosya: {', '.join(bad)}")
+            sys.exit(1)
+        print(f"✅ Sürüm {manifest['version']}: {len(manifest['files'])} dosya doğrulandı")
+    else:
+        print(f"Bilinmeyen komut: {command} (build, fetch, verify)")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
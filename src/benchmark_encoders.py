@@ -0,0 +1,174 @@
+"""
+Embedding Backend Karşılaştırması
+PyTorch (sentence-transformers) ile ONNX / ONNX int8 backend'lerinin embedding
+uyumunu (parity) ve CPU gecikmesini ölçer
+
+Kullanım: python src/benchmark_encoders.py
+(BENCHMARK_BACKENDS="onnx,onnx-int8", BENCHMARK_RUNS=50)
+"""
+
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+# src klasörünü path'e ekle
+sys.path.append(str(Path(__file__).parent))
+
+from encoders import load_encoder, DEFAULT_MODEL_NAME
+
+
+# Backend'in PyTorch'a göre kabul edilen minimum kosinüs benzerliği
+PARITY_MIN_COSINE = {"onnx": 0.9999, "onnx-int8": 0.98}
+
+# Retrieval uyumu: PyTorch top-k komşularının en az bu oranı bulunmalı
+PARITY_MIN_TOPK_OVERLAP = {"onnx": 1.0, "onnx-int8": 0.8}
+TOPK = 5
+
+SAMPLE_QUERIES = [
+    "İstanbul'un Fethi'nin sonuçları nelerdir?",
+    "Malazgirt Savaşı hangi yılda yapıldı?",
+    "Kurtuluş Savaşı'nda Sakarya Meydan Muharebesi",
+    "Osmanlı Devleti'nin kuruluşu",
+    "Göktürk Kitabeleri neden önemlidir?",
+    "Cumhuriyet'in ilanı ve ilk reformlar",
+    "Anadolu Beylikleri döneminde Karamanoğulları",
+    "Tanzimat Fermanı'nın getirdiği yenilikler"
+]
+
+
+def load_corpus(data_dir: str = "data/raw", limit: int = 500) -> List[str]:
+    """
+    Karşılaştırma için data/raw altındaki kayıtların içeriklerini oku (yoksa örnek sorular)
+
+    Args:
+        data_dir: JSON veri dizini
+        limit: Maksimum metin sayısı
+
+    Returns:
+        Metin listesi
+    """
+    texts = []
+    for json_file in sorted(Path(data_dir).glob('*.json')):
+        with open(json_file, 'r', encoding='utf-8') as f:
+            records = json.load(f)
+        for record in records if isinstance(records, list) else []:
+            if isinstance(record, dict) and record.get('icerik'):
+                texts.append(f"{record.get('konu', '')}. {record['icerik']}"[:512])
+        if len(texts) >= limit:
+            break
+    return texts[:limit] or list(SAMPLE_QUERIES)
+
+
+def normalize(embeddings: np.ndarray) -> np.ndarray:
+    """Satırları L2-normalize et (FAISS index'indeki gibi)"""
+    return embeddings / np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+
+
+def measure_latency(encoder, queries: List[str], corpus: List[str], runs: int) -> Dict:
+    """
+    Tekil sorgu gecikmesi ve toplu encode hızı
+
+    Returns:
+        {"single_p50_ms", "single_p95_ms", "batch_texts_per_s"}
+    """
+    encoder.encode(queries[:1])  # Isınma
+
+    latencies = []
+    for i in range(runs):
+        start = time.perf_counter()
+        encoder.encode([queries[i % len(queries)]])
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    encoder.encode(corpus, batch_size=32)
+    batch_seconds = time.perf_counter() - start
+
+    return {
+        "single_p50_ms": float(np.percentile(latencies, 50)),
+        "single_p95_ms": float(np.percentile(latencies, 95)),
+        "batch_texts_per_s": len(corpus) / batch_seconds if batch_seconds else 0.0
+    }
+
+
+def compare_parity(reference: Dict[str, np.ndarray], candidate: Dict[str, np.ndarray]) -> Dict:
+    """
+    Aday backend'in embedding'lerini PyTorch referansıyla karşılaştır
+
+    Args:
+        reference: {"queries", "corpus"} PyTorch embedding'leri
+        candidate: Aynı metinler için aday backend embedding'leri
+
+    Returns:
+        Kosinüs, mutlak fark ve top-k örtüşme istatistikleri
+    """
+    ref_all = np.vstack([reference["queries"], reference["corpus"]])
+    cand_all = np.vstack([candidate["queries"], candidate["corpus"]])
+    cosines = np.sum(normalize(ref_all) * normalize(cand_all), axis=1)
+
+    # Aynı sorgular aynı chunk'ları getiriyor mu (her backend kendi corpus embedding'leriyle)
+    k = min(TOPK, len(reference["corpus"]))
+    ref_top = np.argsort(-normalize(reference["queries"]) @ normalize(reference["corpus"]).T, axis=1)[:, :k]
+    cand_top = np.argsort(-normalize(candidate["queries"]) @ normalize(candidate["corpus"]).T, axis=1)[:, :k]
+    overlap = np.mean([len(set(r) & set(c)) / k for r, c in zip(ref_top, cand_top)])
+
+    return {
+        "min_cosine": float(cosines.min()),
+        "mean_cosine": float(cosines.mean()),
+        "max_abs_diff": float(np.abs(ref_all - cand_all).max()),
+        "topk_overlap": float(overlap)
+    }
+
+
+def main():
+    """Ana fonksiyon"""
+    backends = [b.strip() for b in os.getenv("BENCHMARK_BACKENDS", "onnx,onnx-int8").split(",") if b.strip()]
+    runs = int(os.getenv("BENCHMARK_RUNS", "50"))
+
+    corpus = load_corpus()
+    queries = list(SAMPLE_QUERIES)
+    print(f"📊 Embedding backend karşılaştırması ({len(queries)} sorgu, {len(corpus)} metin)\n")
+
+    results = {}
+    embeddings = {}
+    for backend in ["torch"] + [b for b in backends if b != "torch"]:
+        print(f"🔄 {backend} yükleniyor...")
+        start = time.perf_counter()
+        encoder = load_encoder(DEFAULT_MODEL_NAME, backend=backend)
+        load_seconds = time.perf_counter() - start
+
+        embeddings[backend] = {"queries": encoder.encode(queries), "corpus": encoder.encode(corpus, batch_size=32)}
+        results[backend] = {"load_s": load_seconds, **measure_latency(encoder, queries, corpus, runs)}
+        if backend != "torch":
+            results[backend].update(compare_parity(embeddings["torch"], embeddings[backend]))
+
+    print("\n" + "=" * 60)
+    all_passed = True
+    for backend, stats in results.items():
+        print(f"\n🔧 {backend}")
+        print(f"   • Yükleme: {stats['load_s']:.2f} s")
+        print(f"   • Tekil sorgu: p50 {stats['single_p50_ms']:.1f} ms, p95 {stats['single_p95_ms']:.1f} ms")
+        print(f"   • Toplu encode: {stats['batch_texts_per_s']:.0f} metin/s")
+        if backend == "torch":
+            continue
+
+        passed = (stats["min_cosine"] >= PARITY_MIN_COSINE.get(backend, 0.98)
+                  and stats["topk_overlap"] >= PARITY_MIN_TOPK_OVERLAP.get(backend, 0.8))
+        all_passed = all_passed and passed
+        speedup = results["torch"]["single_p50_ms"] / stats["single_p50_ms"] if stats["single_p50_ms"] else 0.0
+        print(f"   • Kosinüs (min / ort.): {stats['min_cosine']:.5f} / {stats['mean_cosine']:.5f}")
+        print(f"   • Maks. mutlak fark: {stats['max_abs_diff']:.5f}")
+        print(f"   • Top-{TOPK} örtüşme: {stats['topk_overlap']:.2%}")
+        print(f"   • Tekil sorgu hızlanması: {speedup:.2f}x")
+        print(f"   {'✅ Uyum testi geçti' if passed else '❌ Uyum testi başarısız'}")
+
+    print("\n" + "=" * 60)
+    sys.exit(0 if all_passed else 1)
+
+
+if __name__ == "__main__":
+    main()
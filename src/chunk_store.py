@@ -0,0 +1,519 @@
+"""
+Chunk Deposu Modülü
+Chunk metinlerini ve metadata'yı kompakt, mmap ile açılabilen bir ikili formatta saklar.
+
+Disk düzeni (chunk_store/ dizini):
+    texts.bin     - Tüm chunk metinleri (UTF-8, art arda)
+    offsets.npy   - Her chunk'ın texts.bin içindeki başlangıç/bitiş ofsetleri (int64, n+1)
+    columns.json  - Kolon şeması ve sözlük (dictionary) kodlu değerler
+    col_<i>.npy   - Her metadata kolonu için satır başına kod/değer dizisi
+
+Sadece istenen satırlar (örn. FAISS'in döndürdüğü top-k) Python nesnesine dönüştürülür.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import shutil
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+import numpy as np
+
+
+STORE_DIRNAME = "chunk_store"
+FORMAT_VERSION = 1
+
+# Eksik metadata alanı için kod
+MISSING = -1
+_ABSENT = object()
+
+# Filtrelenebilir metadata alanları (data_processing.load_json_data'nın kaydettiği)
+FILTER_FIELDS = ("donem", "kategori_ana", "yil", "kaynak_turu")
+
+# Yükleme sırasında değer bazlı bitmap'leri önceden hesaplanan düşük kardinaliteli alanlar
+PRECOMPUTED_FILTER_FIELDS = ("donem", "kategori_ana", "kaynak_turu")
+
+# Önbellekte tutulacak maksimum filtre maskesi sayısı
+MAX_CACHED_MASKS = 256
+
+
+def stable_chunk_id(record_id: Any, ordinal: int) -> int:
+    """
+    Kayıt id'si ve chunk sırasından kararlı (süreçler ve yeniden oluşturmalar
+    arasında değişmeyen) 63-bit chunk id'si üret
+
+    Args:
+        record_id: Kaynak kaydın id'si (data/raw JSON'daki "id")
+        ordinal: Chunk'ın kayıt içindeki sırası
+
+    Returns:
+        Pozitif int64 id
+    """
+    digest = hashlib.blake2b(f"{record_id}#{ordinal}".encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') & 0x7FFFFFFFFFFFFFFF
+
+
+def _encode_columns(metadata_list: List[Dict]) -> Dict[str, Dict]:
+    """
+    Metadata sözlüklerini kolon bazlı dizilere çevirir
+
+    Tamsayı kolonlar doğrudan int64 olarak, diğerleri (metin, liste vb.)
+    sözlük kodlaması ile int32 kod dizisi + benzersiz değer listesi olarak saklanır.
+
+    Args:
+        metadata_list: Her chunk için metadata dictionary'si
+
+    Returns:
+        Kolon adı -> {"kind", "values", "vocab"} dictionary'si
+    """
+    n = len(metadata_list)
+
+    # Kolon sırasını ilk görülme sırasına göre koru
+    names = []
+    seen = set()
+    for metadata in metadata_list:
+        for name in metadata:
+            if name not in seen:
+                seen.add(name)
+                names.append(name)
+
+    columns = {}
+    for name in names:
+        raw = [metadata.get(name, _ABSENT) for metadata in metadata_list]
+        present = [value for value in raw if value is not _ABSENT]
+
+        # Tüm satırlarda tamsayı ise (bool hariç) sayısal kolon
+        if len(present) == n and all(isinstance(v, int) and not isinstance(v, bool) for v in present):
+            columns[name] = {
+                "kind": "int",
+                "values": np.array(present, dtype='int64'),
+                "vocab": None
+            }
+            continue
+
+        kind = "str" if all(isinstance(v, str) for v in present) else "json"
+        vocab = []
+        vocab_index = {}
+        codes = np.full(n, MISSING, dtype='int32')
+
+        for row, value in enumerate(raw):
+            if value is _ABSENT:
+                continue
+            key = value if kind == "str" else json.dumps(value, ensure_ascii=False, sort_keys=True)
+            code = vocab_index.get(key)
+            if code is None:
+                code = len(vocab)
+                vocab_index[key] = code
+                vocab.append(key)
+            codes[row] = code
+
+        columns[name] = {"kind": kind, "values": codes, "vocab": vocab}
+
+    return columns
+
+
+def _filter_key(spec) -> tuple:
+    """Filtre değerini önbellek anahtarına çevir"""
+    if isinstance(spec, tuple):
+        return ("range",) + tuple(spec)
+    if isinstance(spec, (list, set, frozenset)):
+        return ("in",) + tuple(sorted(spec, key=str))
+    return ("eq", spec)
+
+
+def _matches(value, spec) -> bool:
+    """
+    Tek bir metadata değerinin filtreye uyup uymadığını kontrol et
+
+    Filtre formatı:
+        (min, max) tuple'ı -> kapalı aralık (None: sınırsız), örn: yil=(1919, 1923)
+        liste / küme       -> değerlerden biri, örn: donem=["Osmanlı Devleti", "Cumhuriyet Dönemi"]
+        tekil değer        -> eşitlik, örn: kaynak_turu="Kitap"
+    """
+    if value is _ABSENT:
+        return False
+    if isinstance(spec, tuple):
+        low, high = spec
+        if not isinstance(value, (int, float)) or isinstance(value, bool):
+            return False
+        return (low is None or value >= low) and (high is None or value <= high)
+    if isinstance(spec, (list, set, frozenset)):
+        return value in spec
+    return value == spec
+
+
+class ChunkStore:
+    """Satır id'si ile tembel (lazy) erişilen ikili chunk deposu"""
+
+    def __init__(self, blob, offsets: np.ndarray, columns: Dict[str, Dict], path: Path = None):
+        """
+        Args:
+            blob: UTF-8 metin verisi (bytes veya mmap)
+            offsets: Metin ofsetleri (n+1)
+            columns: Kolon adı -> {"kind", "values", "vocab"} dictionary'si
+            path: Deponun disk dizini (bellekte oluşturulduysa None)
+        """
+        self._blob = blob
+        self._offsets = offsets
+        self._columns = columns
+        self.path = path
+
+        # Sonradan eklenen (henüz diske yazılmamış) chunk'lar
+        self._extra: List[Dict] = []
+
+        # Filtre -> satır maskesi önbelleği (sadece disk/base satırları için)
+        self._mask_cache: Dict[tuple, np.ndarray] = {}
+
+    # ==================== OLUŞTURMA / YÜKLEME ====================
+
+    @classmethod
+    def from_records(cls, records: List[Dict]) -> "ChunkStore":
+        """
+        {"content", "metadata"} formatındaki chunk listesinden bellekte depo oluştur
+
+        Args:
+            records: Chunk listesi (eski metadata.json formatı)
+
+        Returns:
+            ChunkStore
+        """
+        encoded = [record.get("content", "").encode('utf-8') for record in records]
+        offsets = np.zeros(len(encoded) + 1, dtype='int64')
+        if encoded:
+            np.cumsum([len(text) for text in encoded], out=offsets[1:])
+
+        columns = _encode_columns([record.get("metadata", {}) for record in records])
+
+        return cls(b"".join(encoded), offsets, columns)
+
+    @classmethod
+    def from_json(cls, json_file: str) -> "ChunkStore":
+        """
+        Eski formatlı metadata.json dosyasından depo oluştur
+
+        Args:
+            json_file: metadata.json yolu
+
+        Returns:
+            ChunkStore
+        """
+        with open(json_file, 'r', encoding='utf-8') as f:
+            return cls.from_records(json.load(f))
+
+    @staticmethod
+    def exists(index_dir: str) -> bool:
+        """Verilen index dizininde chunk deposu var mı?"""
+        return (Path(index_dir) / STORE_DIRNAME / "columns.json").exists()
+
+    @classmethod
+    def load(cls, index_dir: str, use_mmap: bool = True) -> "ChunkStore":
+        """
+        Depoyu diskten aç. use_mmap açıksa metinler ve kolonlar mmap ile
+        açılır; sadece erişilen satırların sayfaları belleğe gelir.
+
+        Args:
+            index_dir: Index dizini (chunk_store/ alt dizinini içerir)
+            use_mmap: Dosyaları kopyalamadan mmap ile aç
+
+        Returns:
+            ChunkStore
+        """
+        store_path = Path(index_dir) / STORE_DIRNAME
+
+        with open(store_path / "columns.json", 'r', encoding='utf-8') as f:
+            schema = json.load(f)
+
+        mmap_mode = 'r' if use_mmap else None
+        offsets = np.load(store_path / "offsets.npy", mmap_mode=mmap_mode)
+
+        columns = {}
+        for i, column in enumerate(schema["columns"]):
+            columns[column["name"]] = {
+                "kind": column["kind"],
+                "values": np.load(store_path / f"col_{i}.npy", mmap_mode=mmap_mode),
+                "vocab": column["vocab"]
+            }
+
+        texts_file = store_path / "texts.bin"
+        if use_mmap and texts_file.stat().st_size > 0:
+            with open(texts_file, 'rb') as f:
+                blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            blob = texts_file.read_bytes()
+
+        return cls(blob, offsets, columns, path=store_path)
+
+    def save(self, index_dir: str):
+        """
+        Depoyu (sonradan eklenen chunk'lar dahil) diske yaz.
+        Önce geçici dizine yazılır, sonra eski deponun yerine taşınır.
+
+        Args:
+            index_dir: Index dizini
+        """
+        store = self._compacted()
+
+        store_path = Path(index_dir) / STORE_DIRNAME
+        tmp_path = store_path.with_name(STORE_DIRNAME + ".tmp")
+        if tmp_path.exists():
+            shutil.rmtree(tmp_path)
+        tmp_path.mkdir(parents=True)
+
+        with open(tmp_path / "texts.bin", 'wb') as f:
+            f.write(store._blob)
+        np.save(tmp_path / "offsets.npy", np.asarray(store._offsets))
+
+        schema = {"version": FORMAT_VERSION, "count": len(store), "columns": []}
+        for i, (name, column) in enumerate(store._columns.items()):
+            np.save(tmp_path / f"col_{i}.npy", np.asarray(column["values"]))
+            schema["columns"].append({"name": name, "kind": column["kind"], "vocab": column["vocab"]})
+
+        with open(tmp_path / "columns.json", 'w', encoding='utf-8') as f:
+            json.dump(schema, f, ensure_ascii=False)
+
+        # Eski depoyu yenisiyle değiştir
+        if store_path.exists():
+            old_path = store_path.with_name(STORE_DIRNAME + ".old")
+            if old_path.exists():
+                shutil.rmtree(old_path)
+            os.replace(store_path, old_path)
+            os.replace(tmp_path, store_path)
+            shutil.rmtree(old_path)
+        else:
+            os.replace(tmp_path, store_path)
+
+    def export_json(self, json_file: str):
+        """
+        Depoyu eski formatlı (chunk listesi) metadata.json olarak dışa aktar
+
+        Args:
+            json_file: Çıktı dosyası yolu
+        """
+        with open(json_file, 'w', encoding='utf-8') as f:
+            json.dump(list(self), f, ensure_ascii=False, indent=2)
+
+    # ==================== ERİŞİM ====================
+
+    @property
+    def base_count(self) -> int:
+        """Diskteki (veya ilk oluşturulan) chunk sayısı"""
+        return len(self._offsets) - 1
+
+    def __len__(self) -> int:
+        return self.base_count + len(self._extra)
+
+    def __iter__(self) -> Iterator[Dict]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def __getitem__(self, idx: int) -> Dict:
+        """
+        Tek bir chunk'ı {"content", "metadata"} formatında döndür
+
+        Args:
+            idx: Satır id'si (FAISS index pozisyonu)
+
+        Returns:
+            Chunk dictionary'si
+        """
+        idx = int(idx)
+        if idx < 0 or idx >= len(self):
+            raise IndexError(f"Chunk id aralık dışında: {idx}")
+
+        if idx >= self.base_count:
+            record = self._extra[idx - self.base_count]
+            return {"content": record.get("content", ""), "metadata": dict(record.get("metadata", {}))}
+
+        return {"content": self.get_text(idx), "metadata": self.get_metadata(idx)}
+
+    def get_many(self, ids: List[int]) -> List[Dict]:
+        """Birden fazla chunk'ı verilen sırada döndür"""
+        return [self[idx] for idx in ids]
+
+    def get_text(self, idx: int) -> str:
+        """Sadece chunk metnini döndür"""
+        if idx >= self.base_count:
+            return self._extra[idx - self.base_count].get("content", "")
+
+        start, end = int(self._offsets[idx]), int(self._offsets[idx + 1])
+        return self._blob[start:end].decode('utf-8')
+
+    def get_metadata(self, idx: int) -> Dict[str, Any]:
+        """Sadece chunk metadata'sını döndür"""
+        if idx >= self.base_count:
+            return dict(self._extra[idx - self.base_count].get("metadata", {}))
+
+        metadata = {}
+        for name, column in self._columns.items():
+            value = column["values"][idx]
+            if column["kind"] == "int":
+                metadata[name] = int(value)
+            elif value != MISSING:
+                decoded = column["vocab"][value]
+                metadata[name] = decoded if column["kind"] == "str" else json.loads(decoded)
+        return metadata
+
+    # ==================== FİLTRELEME ====================
+
+    def precompute_masks(self, names=PRECOMPUTED_FILTER_FIELDS):
+        """
+        Düşük kardinaliteli kolonlar için her değerin satır maskesini önceden hesapla
+
+        Args:
+            names: Kolon adları
+        """
+        for name in names:
+            column = self._columns.get(name)
+            if column is None or column["kind"] != "str":
+                continue
+            codes = np.asarray(column["values"])
+            for code, value in enumerate(column["vocab"]):
+                self._mask_cache[(name, _filter_key(value))] = codes == code
+
+    def _column_mask(self, name: str, spec) -> np.ndarray:
+        """Tek bir kolon filtresi için base satırlarının maskesini hesapla (önbellekli)"""
+        key = (name, _filter_key(spec))
+        mask = self._mask_cache.get(key)
+        if mask is not None:
+            return mask
+
+        column = self._columns.get(name)
+        if column is None:
+            mask = np.zeros(self.base_count, dtype=bool)
+        elif column["kind"] == "int":
+            mask = self._int_mask(np.asarray(column["values"]), spec)
+        else:
+            # Sözlük kodlu kolon: önce her benzersiz değeri değerlendir, sonra kodlarla eşle
+            vocab = column["vocab"]
+            decoded = vocab if column["kind"] == "str" else [json.loads(v) for v in vocab]
+            lookup = np.array([_matches(value, spec) for value in decoded] + [False], dtype=bool)
+            mask = lookup[np.asarray(column["values"])]  # MISSING (-1) -> son eleman (False)
+
+        if len(self._mask_cache) >= MAX_CACHED_MASKS:
+            self._mask_cache.clear()
+        self._mask_cache[key] = mask
+        return mask
+
+    @staticmethod
+    def _int_mask(values: np.ndarray, spec) -> np.ndarray:
+        """Sayısal kolon için vektörel filtre maskesi"""
+        if isinstance(spec, tuple):
+            low, high = spec
+            mask = np.ones(len(values), dtype=bool)
+            if low is not None:
+                mask &= values >= low
+            if high is not None:
+                mask &= values <= high
+            return mask
+        if isinstance(spec, (list, set, frozenset)):
+            return np.isin(values, [v for v in spec if isinstance(v, int)])
+        return values == spec
+
+    def build_mask(self, filters: Dict[str, Any]) -> np.ndarray:
+        """
+        Metadata filtrelerine uyan satırların maskesini oluştur (filtreler AND ile birleşir)
+
+        Args:
+            filters: Alan adı -> filtre değeri, örn:
+                     {"donem": "Millî Mücadele Dönemi", "yil": (1919, 1923)}
+
+        Returns:
+            len(self) uzunluğunda bool dizi
+        """
+        for name in filters:
+            if name not in FILTER_FIELDS:
+                raise ValueError(f"Bilinmeyen filtre alanı: {name} (desteklenenler: {FILTER_FIELDS})")
+
+        mask = np.ones(self.base_count, dtype=bool)
+        for name, spec in filters.items():
+            if spec is None:
+                continue
+            mask &= self._column_mask(name, spec)
+
+        # Sonradan eklenen chunk'lar az sayıda; tek tek değerlendir
+        if self._extra:
+            extra_mask = np.array([
+                all(_matches(record.get("metadata", {}).get(name, _ABSENT), spec)
+                    for name, spec in filters.items() if spec is not None)
+                for record in self._extra
+            ], dtype=bool)
+            mask = np.concatenate([mask, extra_mask])
+
+        return mask
+
+    def find_rows(self, name: str, values) -> np.ndarray:
+        """
+        Bir metadata alanı verilen değerlerden birine eşit olan satırlar
+        (örn. kayıt id'sine göre chunk'ları bulmak için; sonuçlar önbelleğe alınmaz)
+
+        Args:
+            name: Metadata alanı (örn: "id", "chunk_uid")
+            values: Aranan değerler
+
+        Returns:
+            Satır numaraları (artan sırada)
+        """
+        values = set(values)
+
+        def matches(value) -> bool:
+            try:
+                return value in values
+            except TypeError:  # liste gibi hash'lenemeyen değerler
+                return False
+
+        rows = np.empty(0, dtype='int64')
+        column = self._columns.get(name)
+        if column is not None:
+            if column["kind"] == "int":
+                mask = np.isin(np.asarray(column["values"]), [v for v in values if isinstance(v, int)])
+            else:
+                vocab = column["vocab"]
+                decoded = vocab if column["kind"] == "str" else [json.loads(v) for v in vocab]
+                lookup = np.array([matches(value) for value in decoded] + [False], dtype=bool)
+                mask = lookup[np.asarray(column["values"])]
+            rows = np.flatnonzero(mask)
+
+        extra_rows = [
+            self.base_count + i
+            for i, record in enumerate(self._extra)
+            if matches(record.get("metadata", {}).get(name, _ABSENT))
+        ]
+        if extra_rows:
+            rows = np.concatenate([rows, np.array(extra_rows, dtype='int64')])
+
+        return rows
+
+    # ==================== GÜNCELLEME ====================
+
+    def extend(self, records: List[Dict]):
+        """
+        Depoya yeni chunk'lar ekle (save çağrılana kadar bellekte tutulur)
+
+        Args:
+            records: {"content", "metadata"} formatında chunk listesi
+        """
+        self._extra.extend(records)
+
+    def snapshot(self, count: int = None) -> "ChunkStore":
+        """
+        İlk count satırın, sonradan yapılan eklemelerden etkilenmeyen kopyası
+        (arka planda diske yazmak için)
+
+        Args:
+            count: Satır sayısı (None: tümü)
+
+        Returns:
+            ChunkStore
+        """
+        count = len(self) if count is None else count
+        if count == self.base_count:
+            return ChunkStore(self._blob, self._offsets, self._columns, path=self.path)
+        return ChunkStore.from_records([self[i] for i in range(count)])
+
+    def _compacted(self) -> "ChunkStore":
+        """Sonradan eklenen chunk'lar varsa tümünü tek bir depoda birleştir"""
+        if not self._extra:
+            return self
+        return ChunkStore.from_records(list(self))
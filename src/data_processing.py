@@ -3,29 +3,67 @@ Veri İşleme Modülü - Tarih Bilgi Rehberi
 Bu modül JSON formatındaki tarih verilerini yükler, işler ve FAISSRetriever
 sınıfını kullanarak bir FAISS index'i oluşturur ve kaydeder.
 """
+from __future__ import annotations
+
+import os
 import json
 from pathlib import Path
-from typing import List, Dict
+from typing import TYPE_CHECKING, List, Dict
 import numpy as np
 import faiss
-from sentence_transformers import SentenceTransformer
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.docstore.document import Document
 from utils import clean_text 
+from index_builder import build_index, DEFAULT_INDEX_FACTORY
+from chunk_store import ChunkStore, stable_chunk_id
+from segments import SegmentManifest
+from retrieval import FAISSRetriever
+from sharding import ShardedRetriever, SHARDS_MANIFEST
+from keyword_index import BM25Index
+from encoders import load_encoder, DEFAULT_MODEL_NAME
+
+# LangChain sadece veri işleme sırasında import edilir (modül import'u hızlı kalsın)
+if TYPE_CHECKING:
+    from langchain.docstore.document import Document
 
 class DataProcessor:
     """Tarih verisi işleme ve embedding oluşturma sınıfı"""
     
-    def __init__(self, data_dir: str = "data/raw", model_name: str = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"):
+    def __init__(self, data_dir: str = "data/raw", model_name: str = DEFAULT_MODEL_NAME,
+                 index_factory: str = DEFAULT_INDEX_FACTORY, nprobe: int = None, ef_search: int = None,
+                 quantization: str = None, rescore: bool = False, keyword_stemming: bool = False,
+                 shard_key: str = None, embedding_backend: str = None):
         """
         Args:
             data_dir: JSON veri dosyalarının bulunduğu dizin
             model_name: Kullanılacak embedding model(Lokal yoldan)
+            index_factory: FAISS index tipi (örn: "Flat", "IVF,Flat", "HNSW32", "IVF,PQ").
+                           Küçük korpuslar için varsayılan "Flat" (tam arama)
+            nprobe: IVF index'leri için taranacak küme sayısı (None: otomatik)
+            ef_search: HNSW index'leri için arama derinliği (None: otomatik)
+            quantization: Sıkıştırılmış vektör depolama (örn: "SQ8", "SQfp16", "PQ"; None: float32)
+            rescore: Sıkıştırılmış index'te üst adayları tam float vektörlerle yeniden skorla
+                     (float embedding'ler diske 'embeddings.npy' olarak yazılır ve mmap ile okunur)
+            keyword_stemming: BM25 keyword index'inde Türkçe hafif kök bulma kullan
+            shard_key: Verilirse (örn: "donem") bu metadata alanının her değeri için ayrı
+                       bir index (shard) oluşturulur ve aramalar shard'larda paralel yapılır
+            embedding_backend: "torch", "onnx" veya "onnx-int8" (None ise EMBEDDING_BACKEND
+                               ortam değişkeni; index ve sorgular aynı backend ile encode edilmeli)
         """
         self.data_dir = Path(data_dir)
+        self.index_factory = index_factory
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self.quantization = quantization
+        self.rescore = rescore
+        self.keyword_stemming = keyword_stemming
+        self.shard_key = shard_key
+        self.index_params = {}
         print(f"🔄 Embedding model yükleniyor... (Hugging Face: {model_name})")
-        self.embedding_model = SentenceTransformer(model_name)
+        self.embedding_model = load_encoder(model_name, backend=embedding_backend)
         self.dimension = self.embedding_model.get_sentence_embedding_dimension()
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+        from langchain.docstore.document import Document
+        # Document sınıfı bir kez import edilir; record_to_document her kayıtta tekrar import etmez
+        self.document_class = Document
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=512,
             chunk_overlap=50,
@@ -63,55 +101,9 @@ class DataProcessor:
                 
                 # Her tarihsel kayıt için Document oluştur
                 for item in data:
-                    # Veri formatı kontrolü
-                    if not isinstance(item, dict):
-                        continue
-                    
-                    # İçerik oluştur: konu + icerik + anahtar kelimeler
-                    content_parts = []
-                    
-                    # Konu başlığı
-                    if 'konu' in item:
-                        content_parts.append(f"Konu: {item['konu']}")
-                    
-                    # Ana içerik
-                    if 'icerik' in item:
-                        content_parts.append(item['icerik'])
-                    
-                    # Anahtar kelimeleri ekle (arama için önemli)
-                    if 'anahtar_kelimeler' in item and item['anahtar_kelimeler']:
-                        keywords = ', '.join(item['anahtar_kelimeler'])
-                        content_parts.append(f"Anahtar Kelimeler: {keywords}")
-                    
-                    # İçeriği birleştir
-                    content = '\n\n'.join(content_parts)
-                    
-                    if not content.strip():
-                        continue
-                    
-                    # Metadata oluştur (zengin metadata RAG için kritik)
-                    metadata = {
-                        'id': item.get('id', 'unknown'),
-                        'donem': item.get('donem', ''),
-                        'alt_donem': item.get('alt_donem', ''),
-                        'kategori_ana': item.get('kategori', {}).get('ana', ''),
-                        'kategori_alt': item.get('kategori', {}).get('alt', ''),
-                        'konu': item.get('konu', ''),
-                        'yil': item.get('yil', 0),
-                        'etiketler': item.get('etiketler', []),
-                        'kaynak': item.get('kaynak', ''),
-                        'kaynak_turu': item.get('kaynak_turu', ''),
-                        'referans_link': item.get('referans_link', ''),
-                        'source': str(json_file),
-                        'filename': json_file.name
-                    }
-                    
-                    # Document oluştur
-                    doc = Document(
-                        page_content=content,
-                        metadata=metadata
-                    )
-                    documents.append(doc)
+                    doc = self.record_to_document(item, json_file)
+                    if doc is not None:
+                        documents.append(doc)
                 
                 print(f"  ✓ {json_file.name}: {len([x for x in data if isinstance(x, dict)])} kayıt yüklendi")
                 
@@ -123,6 +115,66 @@ class DataProcessor:
         print(f"\n✅ Toplam {len(documents)} tarihsel kayıt yüklendi\n")
         return documents
 
+    def record_to_document(self, item: Dict, json_file: Path) -> Document:
+        """
+        Tek bir tarihsel kaydı Document'e dönüştürür
+        
+        Args:
+            item: JSON kaydı
+            json_file: Kaydın geldiği dosya
+            
+        Returns:
+            Document (geçersiz veya boş kayıtlar için None)
+        """
+        # Veri formatı kontrolü
+        if not isinstance(item, dict):
+            return None
+        
+        # İçerik oluştur: konu + icerik + anahtar kelimeler
+        content_parts = []
+        
+        # Konu başlığı
+        if 'konu' in item:
+            content_parts.append(f"Konu: {item['konu']}")
+        
+        # Ana içerik
+        if 'icerik' in item:
+            content_parts.append(item['icerik'])
+        
+        # Anahtar kelimeleri ekle (arama için önemli)
+        if 'anahtar_kelimeler' in item and item['anahtar_kelimeler']:
+            keywords = ', '.join(item['anahtar_kelimeler'])
+            content_parts.append(f"Anahtar Kelimeler: {keywords}")
+        
+        # İçeriği birleştir
+        content = '\n\n'.join(content_parts)
+        
+        if not content.strip():
+            return None
+        
+        # Metadata oluştur (zengin metadata RAG için kritik)
+        metadata = {
+            'id': item.get('id', 'unknown'),
+            'donem': item.get('donem', ''),
+            'alt_donem': item.get('alt_donem', ''),
+            'kategori_ana': item.get('kategori', {}).get('ana', ''),
+            'kategori_alt': item.get('kategori', {}).get('alt', ''),
+            'konu': item.get('konu', ''),
+            'yil': item.get('yil', 0),
+            'etiketler': item.get('etiketler', []),
+            'kaynak': item.get('kaynak', ''),
+            'kaynak_turu': item.get('kaynak_turu', ''),
+            'referans_link': item.get('referans_link', ''),
+            'source': str(json_file),
+            'filename': json_file.name
+        }
+        
+        # Document oluştur
+        return self.document_class(
+            page_content=content,
+            metadata=metadata
+        )
+
     def split_documents(self, documents: List[Document]) -> List[Document]:
         """
         Dokümanları chunk'lara böler
@@ -144,9 +196,11 @@ class DataProcessor:
             # Chunk'lara böl
             chunks = self.text_splitter.split_documents([doc])
             
-            # Her chunk'a orijinal metadata'yı koru
-            for chunk in chunks:
+            # Her chunk'a orijinal metadata'yı koru, kayıt id'si + sıradan kararlı chunk id'si ver
+            for ordinal, chunk in enumerate(chunks):
                 chunk.metadata.update(doc.metadata)
+                chunk.metadata['chunk_index'] = ordinal
+                chunk.metadata['chunk_uid'] = stable_chunk_id(doc.metadata['id'], ordinal)
             
             all_chunks.extend(chunks)
         
@@ -190,18 +244,25 @@ class DataProcessor:
         Returns:
             FAISS index
         """
-        print("🔍 FAISS index oluşturuluyor...")
-        
-        # L2 (Euclidean) yerine IP (Inner Product/Cosine) kullan
-        index = faiss.IndexFlatIP(self.dimension)
-        
-        # Embeddings'i ekle
-        index.add(embeddings.astype('float32'))
+        print(f"🔍 FAISS index oluşturuluyor... (factory: {self.index_factory}, sıkıştırma: {self.quantization or 'yok'})")
+        
+        # L2 (Euclidean) yerine IP (Inner Product/Cosine) kullan.
+        # Eğitim gerektiren tipler (IVF, PQ, SQ) embedding örneklemi üzerinde eğitilir.
+        index, self.index_params = build_index(
+            embeddings,
+            factory=self.index_factory,
+            quantization=self.quantization,
+            rescore=self.rescore,
+            nprobe=self.nprobe,
+            ef_search=self.ef_search
+        )
         
-        print(f"✅ FAISS index (IndexFlatIP) oluşturuldu (toplam vektör: {index.ntotal})\n")
+        print(f"✅ FAISS index ({self.index_params['factory']}) oluşturuldu "
+              f"(toplam vektör: {index.ntotal}, vektör başına {self.index_params['bytes_per_vector']:.0f} byte)\n")
         return index
     
-    def save_index(self, index: faiss.Index, chunks: List[Document], output_dir: str = "models/faiss_index"):
+    def save_index(self, index: faiss.Index, chunks: List[Document], output_dir: str = "models/faiss_index",
+                   embeddings: np.ndarray = None, export_json: bool = True):
         """
         FAISS index'i ve metadata'yı kaydeder
         
@@ -209,6 +270,8 @@ class DataProcessor:
             index: FAISS index
             chunks: Document chunk'ları
             output_dir: Kayıt dizini
+            embeddings: Tam float embedding'ler (yeniden skorlama açıksa kaydedilir)
+            export_json: Uyumluluk için eski formatlı metadata.json'u da yaz
         """
         output_path = Path(output_dir)
         output_path.mkdir(parents=True, exist_ok=True)
@@ -218,8 +281,13 @@ class DataProcessor:
         # FAISS index'i kaydet
         faiss.write_index(index, str(output_path / "index.faiss"))
         
+        # Yeniden skorlama için tam float embedding'ler (mmap ile okunur, RAM'de tutulmaz)
+        if embeddings is not None and self.index_params.get("rescore"):
+            np.save(output_path / "embeddings.npy", embeddings.astype('float32'))
+            print("✅ Float embedding'ler yeniden skorlama için kaydedildi (embeddings.npy)")
+        
         # Metadata'yı FAISSRetriever'ın beklediği gibi
-        # doğrudan bir "chunk listesi" olarak kaydet.
+        # bir "chunk listesi" olarak kompakt chunk deposuna kaydet.
         metadata_list = [
             {
                 "content": chunk.page_content,
@@ -228,24 +296,136 @@ class DataProcessor:
             for chunk in chunks
         ]
         
-        with open(output_path / "metadata.json", 'w', encoding='utf-8') as f:
-            json.dump(metadata_list, f, ensure_ascii=False, indent=2)
+        store = ChunkStore.from_records(metadata_list)
+        store.save(output_path)
+        
+        # Eski formatlı metadata.json (Hugging Face dataset'i ve eski sürümler için)
+        if export_json:
+            store.export_json(output_path / "metadata.json")
+        
+        # Keyword arama için BM25 ters index'i (her chunk ingest sırasında bir kez token'lanır)
+        BM25Index.from_texts([chunk.page_content for chunk in chunks], stem=self.keyword_stemming).save(output_path)
         
-        print(f"✅ Index ve metadata (chunk listesi) kaydedildi\n")
+        # Tek index düzeni: önceki shard'lı düzenin manifesti varsa kaldır (RAGSystem onu tercih eder)
+        shards_manifest = output_path / SHARDS_MANIFEST
+        if shards_manifest.exists():
+            shards_manifest.unlink()
         
-        # İstatistikleri ayrı bir dosyaya (veya sadece konsola) yaz
+        # Yeni ana index önceki index'e eklenmiş delta segmentleri ve silme kayıtlarını zaten kapsar; eskileri temizle
+        manifest = SegmentManifest.load(output_path)
+        if manifest.segments or manifest.deleted:
+            manifest.reset()
+        
+        print(f"✅ Index, metadata (chunk deposu) ve BM25 keyword index kaydedildi\n")
+        
+        self._write_stats(output_path, chunks)
+    
+    def _write_stats(self, output_path: Path, chunks: List[Document]):
+        """İstatistikleri (boyut, model, dönemler, index parametreleri) stats.json'a yaz"""
         stats = {
             "total_chunks": len(chunks),
             "dimension": self.dimension,
-            "model_name": self.embedding_model._modules['0'].auto_model.name_or_path,
+            "model_name": self.embedding_model.model_name,
+            "embedding_backend": self.embedding_model.backend,
             "data_source": "Tarih Bilgi Rehberi - Türk Tarihi",
-            "periods": list(set([chunk.metadata.get('donem', '') for chunk in chunks if chunk.metadata.get('donem')]))
+            "periods": list(set([chunk.metadata.get('donem', '') for chunk in chunks if chunk.metadata.get('donem')])),
+            "index": self.index_params
         }
         with open(output_path / "stats.json", 'w', encoding='utf-8') as f:
             json.dump(stats, f, ensure_ascii=False, indent=2)
         print("✅ İstatistikler 'stats.json' dosyasına kaydedildi.")
 
     
+    def update_records(self, json_file: str, record_ids: List = None,
+                       index_dir: str = "models/faiss_index") -> Dict:
+        """
+        Değişen kayıtları mevcut index'te güncelle (tüm korpusu yeniden işlemeden).
+        Kayıtların eski chunk'ları silinir, yenileri delta segment olarak eklenir.
+        
+        Args:
+            json_file: Güncel kayıtları içeren JSON dosyası (data/raw formatında)
+            record_ids: Sadece bu id'lere sahip kayıtları güncelle (None: dosyadaki tümü)
+            index_dir: Index dizini
+            
+        Returns:
+            {"deleted", "added"} sayıları
+        """
+        json_file = Path(json_file)
+        with open(json_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        
+        wanted = set(record_ids) if record_ids is not None else None
+        documents = []
+        for item in data:
+            if wanted is not None and (not isinstance(item, dict) or item.get('id') not in wanted):
+                continue
+            doc = self.record_to_document(item, json_file)
+            if doc is not None:
+                documents.append(doc)
+        
+        if not documents:
+            print("⚠️  Güncellenecek kayıt bulunamadı!")
+            return {"deleted": 0, "added": 0}
+        
+        chunks = self.split_documents(documents)
+        embeddings = self.create_embeddings(chunks)
+        
+        retriever = self._open_retriever(index_dir)
+        result = retriever.upsert_records(
+            [{"content": chunk.page_content, "metadata": chunk.metadata} for chunk in chunks],
+            embeddings
+        )
+        retriever.wait_for_compaction()
+        return result
+    
+    def delete_records(self, record_ids: List, index_dir: str = "models/faiss_index") -> int:
+        """
+        Kayıtları mevcut index'ten sil
+        
+        Args:
+            record_ids: Silinecek kayıt id'leri
+            index_dir: Index dizini
+            
+        Returns:
+            Silinen chunk sayısı
+        """
+        return self._open_retriever(index_dir).delete_records(record_ids)
+    
+    def _open_retriever(self, index_dir: str):
+        """Index dizinini düzenine göre (tek index veya shard'lı) aç"""
+        if ShardedRetriever.exists(index_dir):
+            return ShardedRetriever(index_path=index_dir, dimension=self.dimension)
+        return FAISSRetriever(index_path=index_dir, dimension=self.dimension)
+    
+    def save_sharded_index(self, chunks: List[Document], embeddings: np.ndarray,
+                           output_dir: str = "models/faiss_index"):
+        """
+        Chunk'ları shard anahtarına göre ayrı index'lere bölüp kaydeder
+        
+        Args:
+            chunks: Document chunk'ları
+            embeddings: Chunk embedding'leri
+            output_dir: Kayıt dizini (shards.json ve shards/ alt dizini)
+        """
+        print(f"💾 Shard'lı index kaydediliyor: {output_dir} (anahtar: {self.shard_key})")
+        
+        sharded = ShardedRetriever(index_path=output_dir, dimension=self.dimension, shard_key=self.shard_key)
+        sharded.create_index(
+            embeddings,
+            [{"content": chunk.page_content, "metadata": chunk.metadata} for chunk in chunks],
+            index_factory=self.index_factory,
+            quantization=self.quantization,
+            rescore=self.rescore,
+            nprobe=self.nprobe,
+            ef_search=self.ef_search,
+            keyword_stemming=self.keyword_stemming
+        )
+        
+        # Tek index düzeniyle aynı üst düzey stats.json (index parametreleri shard'larınkiyle aynı)
+        self.index_params = dict(sharded.shards[0].index_params) if sharded.shards else {}
+        self.index_params.update({"shard_key": self.shard_key, "shards": len(sharded.shards)})
+        self._write_stats(Path(output_dir), chunks)
+    
     def process_all(self):
         """Tüm veri işleme pipeline'ını çalıştırır"""
         print("\n" + "="*60)
@@ -272,11 +452,12 @@ class DataProcessor:
         # 3. Embedding'leri oluştur
         embeddings = self.create_embeddings(chunks)
         
-        # 4. FAISS index oluştur
-        index = self.create_faiss_index(embeddings)
-        
-        # 5. Kaydet
-        self.save_index(index, chunks)
+        # 4-5. FAISS index oluştur ve kaydet (shard anahtarı verildiyse her değer için ayrı index)
+        if self.shard_key:
+            self.save_sharded_index(chunks, embeddings)
+        else:
+            index = self.create_faiss_index(embeddings)
+            self.save_index(index, chunks, embeddings=embeddings)
         
         print("="*60)
         print("✅ VERİ İŞLEME TAMAMLANDI!")
@@ -285,7 +466,7 @@ class DataProcessor:
         print(f"   • Toplam tarihsel kayıt: {len(documents)}")
         print(f"   • Toplam chunk: {len(chunks)}")
         print(f"   • Embedding boyutu: {self.dimension}")
-        print(f"   • Model: {self.embedding_model._modules['0'].auto_model.name_or_path}")
+        print(f"   • Model: {self.embedding_model.model_name}")
         
         # Dönem bazlı istatistikler
         donem_counts = {}
@@ -330,7 +511,18 @@ def main():
         return
     
     # Veri işleme pipeline'ını başlat
-    processor = DataProcessor()
+    # Büyük korpuslar için yaklaşık index: örn. FAISS_INDEX_FACTORY="IVF,Flat" veya "HNSW32"
+    # Bellek tasarrufu için sıkıştırma: örn. FAISS_QUANTIZATION="SQ8" ve FAISS_RESCORE=1
+    # Keyword aramada Türkçe hafif kök bulma: KEYWORD_STEMMING=1
+    # Dönem bazlı shard'lar: FAISS_SHARD_KEY="donem"
+    # CPU'da hızlı embedding: EMBEDDING_BACKEND="onnx" veya "onnx-int8" (RAGSystem ile aynı olmalı)
+    processor = DataProcessor(
+        index_factory=os.getenv("FAISS_INDEX_FACTORY", DEFAULT_INDEX_FACTORY),
+        quantization=os.getenv("FAISS_QUANTIZATION") or None,
+        rescore=os.getenv("FAISS_RESCORE", "0") == "1",
+        keyword_stemming=os.getenv("KEYWORD_STEMMING", "0") == "1",
+        shard_key=os.getenv("FAISS_SHARD_KEY") or None
+    )
     processor.process_all()
 
 
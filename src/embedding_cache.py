@@ -0,0 +1,238 @@
+"""
+Sorgu Embedding Önbelleği Modülü
+Tekrarlayan soruların (örn. app.py kenar çubuğundaki örnek sorular) embedding'lerini
+yeniden hesaplamamak için LRU önbellek
+
+Anahtar: model adı + normalize edilmiş sorgu metni (Türkçe küçük harf, tek boşluk).
+Bellekteki önbellek kayıt sayısı ve byte ile sınırlıdır; opsiyonel SQLite dosyası
+sayesinde önbellek yeniden başlatmalardan sonra da kullanılır.
+"""
+
+import hashlib
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+# src klasörünü path'e ekle
+sys.path.append(str(Path(__file__).parent))
+
+from turkish_text import turkish_lower
+
+
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+SQLITE_MAX_PARAMS = 500
+
+
+def normalize_query(query: str) -> str:
+    """
+    Önbellek anahtarı için sorguyu normalize et ("  İstanbul'un  Fethi " -> "istanbul'un fethi")
+
+    Args:
+        query: Sorgu metni
+
+    Returns:
+        Normalize edilmiş sorgu
+    """
+    return " ".join(turkish_lower(query).split())
+
+
+def cache_key(model_name: str, query: str) -> str:
+    """Model adı ve normalize edilmiş sorgudan önbellek anahtarı üret"""
+    text = f"{model_name}\n{normalize_query(query)}"
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class EmbeddingCache:
+    """Kayıt sayısı / byte sınırlı, opsiyonel SQLite kalıcılıklı LRU embedding önbelleği"""
+
+    def __init__(self, model_name: str, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 max_bytes: int = DEFAULT_MAX_BYTES, path: Optional[str] = None):
+        """
+        Args:
+            model_name: Embedding modeli (farklı modellerin vektörleri karışmaz)
+            max_entries: Maksimum kayıt sayısı (bellek ve SQLite için)
+            max_bytes: Bellekteki vektörlerin toplam maksimum boyutu
+            path: SQLite dosyası (None: sadece bellek)
+        """
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.path = Path(path) if path else None
+
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._db = None
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, model TEXT, vector BLOB, last_used REAL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings(last_used)")
+            self._db.commit()
+
+    def encode(self, queries: List[str], encode_fn: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """
+        Sorguların embedding'lerini döndür; önbellekte olmayanlar tek encode_fn çağrısıyla hesaplanır
+
+        Args:
+            queries: Sorgu metinleri
+            encode_fn: Metin listesini (n x dimension) matrise çeviren fonksiyon
+
+        Returns:
+            (len(queries) x dimension) embedding matrisi
+        """
+        keys = [cache_key(self.model_name, query) for query in queries]
+        vectors = self.get_many(keys)
+
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            # Aynı sorgu bir batch'te birden fazla geçiyorsa bir kez encode edilir
+            unique_keys = list(dict.fromkeys(keys[i] for i in missing))
+            texts = {keys[i]: queries[i] for i in missing}
+            encoded = np.asarray(encode_fn([texts[key] for key in unique_keys]), dtype='float32')
+
+            computed = dict(zip(unique_keys, encoded))
+            self.put_many(computed)
+            for i in missing:
+                vectors[i] = computed[keys[i]]
+
+        return np.vstack(vectors)
+
+    def get_many(self, keys: List[str]) -> List[Optional[np.ndarray]]:
+        """
+        Anahtarların vektörlerini bellekten, yoksa SQLite'tan oku
+
+        Args:
+            keys: Önbellek anahtarları
+
+        Returns:
+            Her anahtar için vektör (yoksa None)
+        """
+        vectors: List[Optional[np.ndarray]] = [None] * len(keys)
+        disk_lookup = []
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    vectors[i] = vector
+                else:
+                    disk_lookup.append(i)
+
+            if disk_lookup and self._db is not None:
+                found = self._read_disk([keys[i] for i in disk_lookup])
+                for i in disk_lookup:
+                    vector = found.get(keys[i])
+                    if vector is not None:
+                        vectors[i] = vector
+                        self._remember(keys[i], vector)
+                        self.disk_hits += 1
+
+            n_missing = sum(vector is None for vector in vectors)
+            self.hits += len(keys) - n_missing
+            self.misses += n_missing
+
+        return vectors
+
+    def put_many(self, items: Dict[str, np.ndarray]):
+        """
+        Vektörleri önbelleğe (ve varsa SQLite'a) yaz
+
+        Args:
+            items: anahtar -> vektör
+        """
+        with self._lock:
+            for key, vector in items.items():
+                self._remember(key, np.asarray(vector, dtype='float32'))
+
+            if self._db is not None and items:
+                now = time.time()
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, model, vector, last_used) VALUES (?, ?, ?, ?)",
+                    [(key, self.model_name, np.asarray(vector, dtype='float32').tobytes(), now)
+                     for key, vector in items.items()]
+                )
+                # LRU: en uzun süre kullanılmamış kayıtları sil
+                self._db.execute(
+                    "DELETE FROM embeddings WHERE key IN ("
+                    "SELECT key FROM embeddings ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                )
+                self._db.commit()
+
+    def _remember(self, key: str, vector: np.ndarray):
+        """Vektörü bellekteki LRU'ya ekle ve sınırları aşan eski kayıtları at (kilit altında çağrılır)"""
+        if key in self._memory:
+            self._memory_bytes -= self._memory.pop(key).nbytes
+        self._memory[key] = vector
+        self._memory_bytes += vector.nbytes
+
+        while self._memory and (len(self._memory) > self.max_entries or self._memory_bytes > self.max_bytes):
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted.nbytes
+
+    def _read_disk(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """SQLite'tan vektörleri oku ve son kullanım zamanlarını güncelle (kilit altında çağrılır)"""
+        rows = []
+        # SQLite parametre sınırı (999) nedeniyle parçalar halinde sorgula
+        for start in range(0, len(keys), SQLITE_MAX_PARAMS):
+            part = keys[start:start + SQLITE_MAX_PARAMS]
+            placeholders = ",".join("?" * len(part))
+            rows.extend(self._db.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", part
+            ).fetchall())
+        if not rows:
+            return {}
+
+        self._db.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?",
+                             [(time.time(), key) for key, _ in rows])
+        self._db.commit()
+        return {key: np.frombuffer(blob, dtype='float32').copy() for key, blob in rows}
+
+    def clear(self):
+        """Önbelleği (bellek ve SQLite) temizle"""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM embeddings")
+                self._db.commit()
+
+    def get_stats(self) -> Dict:
+        """
+        Önbellek istatistiklerini döndür
+
+        Returns:
+            İstatistik dictionary
+        """
+        total = self.hits + self.misses
+        stats = {
+            "model": self.model_name,
+            "entries": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0
+        }
+        if self._db is not None:
+            with self._lock:
+                stats["disk_entries"] = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            stats["path"] = str(self.path)
+        return stats
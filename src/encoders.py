@@ -0,0 +1,328 @@
+"""
+Embedding Encoder Modülü
+DataProcessor ve RAGSystem'in kullandığı embedding modeli için değiştirilebilir backend'ler
+
+- "torch": sentence-transformers (PyTorch) - varsayılan
+- "onnx": modelin ONNX'e aktarılmış hali, ONNX Runtime ile CPU'da çalışır
+- "onnx-int8": aynı ONNX modelinin dinamik int8 quantize edilmiş hali
+
+ONNX backend'leri çalışma anında PyTorch / transformers import etmez; sadece
+onnxruntime ve tokenizers gerekir. Model ilk kullanımda (veya export_onnx ile)
+bir kez PyTorch modelinden aktarılır ve models/onnx/ altına kaydedilir
+(onnxruntime ve tokenizers için: pip install -r requirements-onnx.txt).
+Tüm backend'ler aynı arayüzü (encode, get_sentence_embedding_dimension) sunar.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+
+DEFAULT_MODEL_NAME = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+ENCODER_BACKENDS = ("torch", "onnx", "onnx-int8")
+DEFAULT_ONNX_DIR = "models/onnx"
+
+ONNX_MODEL_FILE = "model.onnx"
+ONNX_INT8_MODEL_FILE = "model.int8.onnx"
+ENCODER_CONFIG_FILE = "encoder_config.json"
+TOKENIZER_FILE = "tokenizer.json"
+ONNX_OPSET = 14
+FINGERPRINT_SAMPLE_BYTES = 1 << 20  # Büyük dosyaların baştan / sondan okunan kısmı
+
+
+def _model_fingerprint(model_dir: Path) -> str:
+    """
+    Yerel model dizininin içerik parmak izi: dosya adları, boyutları ve içerikleri
+    (1 MB'tan büyük ağırlık dosyalarında ilk ve son 1 MB) hash'lenir. Dizin kopyalansa
+    da aynı kalır, farklı ağırlıklar / tokenizer farklı parmak izi verir.
+    """
+    digest = hashlib.blake2b(digest_size=6)
+    for path in sorted(p for p in model_dir.rglob("*") if p.is_file()):
+        size = path.stat().st_size
+        digest.update(f"{path.relative_to(model_dir).as_posix()}\0{size}\0".encode('utf-8'))
+        with open(path, 'rb') as f:
+            if size <= 2 * FINGERPRINT_SAMPLE_BYTES:
+                digest.update(f.read())
+            else:
+                digest.update(f.read(FINGERPRINT_SAMPLE_BYTES))
+                f.seek(-FINGERPRINT_SAMPLE_BYTES, os.SEEK_END)
+                digest.update(f.read(FINGERPRINT_SAMPLE_BYTES))
+    return digest.hexdigest()
+
+
+def onnx_model_dir(model_name: str, onnx_dir: str = DEFAULT_ONNX_DIR) -> Path:
+    """
+    Modelin ONNX dosyalarının dizini. Hub modelleri tam model adıyla
+    (models/onnx/sentence-transformers--paraphrase-multilingual-MiniLM-L12-v2), yerel
+    dizinler ad + içerik parmak iziyle (models/onnx/embedding_model-3f9c0a1b2d4e)
+    ayrılır; böylece artefakt paketlerindeki aynı adlı model dizinleri farklı model
+    veya sürümlerde birbirinin export'unu kullanmaz.
+    """
+    local_dir = Path(model_name)
+    if local_dir.is_dir():
+        return Path(onnx_dir) / f"{local_dir.resolve().name}-{_model_fingerprint(local_dir)}"
+    return Path(onnx_dir) / model_name.replace("\\", "/").strip("/").replace("/", "--")
+
+
+class SentenceTransformerEncoder:
+    """PyTorch sentence-transformers backend'i"""
+
+    backend = "torch"
+
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME):
+        """
+        Args:
+            model_name: Hugging Face model adı veya yerel yol
+        """
+        # PyTorch sadece bu backend seçildiğinde import edilir
+        from sentence_transformers import SentenceTransformer
+
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_name)
+
+    @property
+    def cache_name(self) -> str:
+        """Embedding önbelleği anahtarlarında kullanılan ad"""
+        return self.model_name
+
+    def get_sentence_embedding_dimension(self) -> int:
+        """Embedding boyutu"""
+        return self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts: List[str], batch_size: int = 32, show_progress_bar: bool = False) -> np.ndarray:
+        """
+        Metinleri embedding'e çevir
+
+        Args:
+            texts: Metin listesi
+            batch_size: Batch boyutu
+            show_progress_bar: İlerleme çubuğu göster
+
+        Returns:
+            (len(texts) x dimension) float32 matris
+        """
+        embeddings = self.model.encode(texts, batch_size=batch_size, show_progress_bar=show_progress_bar)
+        return np.asarray(embeddings, dtype='float32')
+
+
+def export_onnx(model_name: str = DEFAULT_MODEL_NAME, onnx_dir: str = DEFAULT_ONNX_DIR,
+                quantize: bool = True) -> Path:
+    """
+    sentence-transformers modelini ONNX'e aktar (opsiyonel olarak int8 quantize et).
+    Sadece export sırasında PyTorch / transformers / onnxruntime.quantization gerekir.
+
+    Args:
+        model_name: Hugging Face model adı veya yerel yol
+        onnx_dir: ONNX modellerinin kök dizini
+        quantize: Dinamik int8 quantize edilmiş kopyayı da oluştur
+
+    Returns:
+        Modelin ONNX dizini
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    output_dir = onnx_model_dir(model_name, onnx_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    print(f"🔧 ONNX export: {model_name} -> {output_dir}")
+    st_model = SentenceTransformer(model_name, device="cpu")
+    transformer = st_model[0].auto_model.eval()
+    tokenizer = st_model.tokenizer
+
+    pooling = "mean"
+    normalize = False
+    for module in st_model:
+        if type(module).__name__ == "Pooling":
+            pooling = "cls" if module.get_pooling_mode_str() == "cls" else "mean"
+        elif type(module).__name__ == "Normalize":
+            normalize = True
+
+    sample = tokenizer(["İstanbul'un Fethi 1453"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+
+    class _LastHiddenState(torch.nn.Module):
+        """Model çıktısından sadece last_hidden_state'i döndüren sarmalayıcı"""
+
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, *inputs):
+            return self.model(**dict(zip(input_names, inputs)))[0]
+
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    # Yarım yazılmış model okunmasın diye önce geçici dosyaya yaz
+    model_path = output_dir / ONNX_MODEL_FILE
+    tmp_path = model_path.with_suffix(".onnx.tmp")
+    with torch.no_grad():
+        torch.onnx.export(
+            _LastHiddenState(transformer),
+            tuple(sample[name] for name in input_names),
+            str(tmp_path),
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=ONNX_OPSET
+        )
+    os.replace(tmp_path, model_path)
+
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+
+        int8_path = output_dir / ONNX_INT8_MODEL_FILE
+        tmp_int8_path = int8_path.with_suffix(".onnx.tmp")
+        quantize_dynamic(str(model_path), str(tmp_int8_path), weight_type=QuantType.QInt8)
+        os.replace(tmp_int8_path, int8_path)
+        print("✅ int8 quantize edilmiş model kaydedildi")
+
+    tokenizer.save_pretrained(str(output_dir))
+
+    config = {
+        "model_name": model_name,
+        "dimension": st_model.get_sentence_embedding_dimension(),
+        "max_seq_length": st_model.max_seq_length,
+        "pooling": pooling,
+        "normalize": normalize,
+        "input_names": input_names,
+        "pad_token": tokenizer.pad_token,
+        "pad_token_id": tokenizer.pad_token_id
+    }
+    with open(output_dir / ENCODER_CONFIG_FILE, 'w', encoding='utf-8') as f:
+        json.dump(config, f, ensure_ascii=False, indent=2)
+
+    print(f"✅ ONNX modeli kaydedildi: {output_dir}")
+    return output_dir
+
+
+class OnnxEncoder:
+    """ONNX Runtime (opsiyonel int8) backend'i"""
+
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME, onnx_dir: str = DEFAULT_ONNX_DIR,
+                 quantized: bool = False, num_threads: int = None):
+        """
+        Args:
+            model_name: Hugging Face model adı veya yerel yol
+            onnx_dir: ONNX modellerinin kök dizini (model yoksa PyTorch'tan aktarılır)
+            quantized: Dinamik int8 quantize edilmiş modeli kullan
+            num_threads: ONNX Runtime intra-op thread sayısı (None: otomatik)
+        """
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.model_name = model_name
+        self.backend = "onnx-int8" if quantized else "onnx"
+        self.model_dir = onnx_model_dir(model_name, onnx_dir)
+
+        model_path = self.model_dir / (ONNX_INT8_MODEL_FILE if quantized else ONNX_MODEL_FILE)
+        if not model_path.exists() or not (self.model_dir / ENCODER_CONFIG_FILE).exists():
+            export_onnx(model_name, onnx_dir, quantize=quantized)
+
+        with open(self.model_dir / ENCODER_CONFIG_FILE, 'r', encoding='utf-8') as f:
+            self.config: Dict = json.load(f)
+
+        self.tokenizer = Tokenizer.from_file(str(self.model_dir / TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(max_length=self.config["max_seq_length"])
+        self.tokenizer.enable_padding(pad_id=self.config["pad_token_id"], pad_token=self.config["pad_token"])
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(str(model_path), sess_options=options,
+                                            providers=["CPUExecutionProvider"])
+        self.input_names = [model_input.name for model_input in self.session.get_inputs()]
+
+    @property
+    def cache_name(self) -> str:
+        """Embedding önbelleği anahtarlarında kullanılan ad (int8 vektörleri PyTorch'unkilerle karışmaz)"""
+        return f"{self.model_name}:{self.backend}"
+
+    def get_sentence_embedding_dimension(self) -> int:
+        """Embedding boyutu"""
+        return self.config["dimension"]
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        """Tek batch'i tokenize et, modeli çalıştır ve pooling uygula"""
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([encoding.ids for encoding in encodings], dtype='int64')
+        attention_mask = np.array([encoding.attention_mask for encoding in encodings], dtype='int64')
+        inputs = {
+            "input_ids": input_ids,
+            "attention_mask": attention_mask,
+            "token_type_ids": np.array([encoding.type_ids for encoding in encodings], dtype='int64')
+        }
+
+        hidden = self.session.run(None, {name: inputs[name] for name in self.input_names})[0]
+
+        if self.config["pooling"] == "cls":
+            embeddings = hidden[:, 0]
+        else:
+            # sentence-transformers ile aynı: padding token'ları hariç ortalama
+            mask = attention_mask[..., None].astype('float32')
+            embeddings = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+        if self.config["normalize"]:
+            embeddings = embeddings / np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        return embeddings.astype('float32')
+
+    def encode(self, texts: List[str], batch_size: int = 32, show_progress_bar: bool = False) -> np.ndarray:
+        """
+        Metinleri embedding'e çevir
+
+        Args:
+            texts: Metin listesi
+            batch_size: Batch boyutu
+            show_progress_bar: İlerleme çubuğu göster
+
+        Returns:
+            (len(texts) x dimension) float32 matris
+        """
+        if isinstance(texts, str):
+            texts = [texts]
+        if not texts:
+            return np.zeros((0, self.get_sentence_embedding_dimension()), dtype='float32')
+
+        # Benzer uzunluktaki metinler aynı batch'e düşsün (daha az padding)
+        order = np.argsort([-len(text) for text in texts], kind="stable")
+        embeddings = np.empty((len(texts), self.get_sentence_embedding_dimension()), dtype='float32')
+
+        starts = range(0, len(texts), batch_size)
+        if show_progress_bar:
+            from tqdm import tqdm
+            starts = tqdm(starts, desc="Batches")
+
+        for start in starts:
+            positions = order[start:start + batch_size]
+            embeddings[positions] = self._encode_batch([texts[i] for i in positions])
+        return embeddings
+
+
+def load_encoder(model_name: str = DEFAULT_MODEL_NAME, backend: str = None, onnx_dir: str = None):
+    """
+    Config'e göre embedding encoder'ı oluştur
+
+    Args:
+        model_name: Hugging Face model adı veya yerel yol
+        backend: "torch", "onnx" veya "onnx-int8" (None ise EMBEDDING_BACKEND ortam değişkeni)
+        onnx_dir: ONNX modellerinin kök dizini (None ise ONNX_MODEL_DIR ortam değişkeni)
+
+    Returns:
+        encode / get_sentence_embedding_dimension sunan encoder
+    """
+    backend = backend or os.getenv("EMBEDDING_BACKEND", "torch")
+    if backend not in ENCODER_BACKENDS:
+        raise ValueError(f"Bilinmeyen embedding backend'i: {backend} (seçenekler: {', '.join(ENCODER_BACKENDS)})")
+
+    if backend == "torch":
+        return SentenceTransformerEncoder(model_name)
+
+    num_threads = int(os.getenv("ONNX_NUM_THREADS", "0")) or None
+    return OnnxEncoder(model_name, onnx_dir or os.getenv("ONNX_MODEL_DIR", DEFAULT_ONNX_DIR),
+                       quantized=backend == "onnx-int8", num_threads=num_threads)
@@ -0,0 +1,468 @@
+"""
+Index Oluşturma Modülü
+FAISS index tiplerini (Flat / IVF / HNSW / PQ) factory string'i ile oluşturur,
+eğitir, sıkıştırılmış (SQ / PQ) depolama modlarını ve arama zamanı
+parametrelerini (nprobe, efSearch) yönetir
+"""
+
+import math
+import re
+from typing import Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+
+# Küçük korpuslar için varsayılan: brute-force (tam) arama
+DEFAULT_INDEX_FACTORY = "Flat"
+
+# Eğitim için kullanılacak maksimum örnek sayısı
+DEFAULT_TRAIN_SAMPLE_SIZE = 50000
+
+# HNSW için varsayılan arama derinliği
+DEFAULT_EF_SEARCH = 64
+
+# Sıkıştırılmış index'lerde tam (float) yeniden skorlama için aday çarpanı
+DEFAULT_RESCORE_FACTOR = 4
+
+# Desteklenen sıkıştırma modları (örn: "PQ" -> PQ48, "PQ32" de geçerlidir)
+QUANTIZATION_MODES = ("SQ8", "SQ6", "SQ4", "SQfp16", "PQ")
+# Vektörleri kayıplı kodlayan factory bileşenleri (PQ, OPQ, SQ*, RQ, LSH)
+_LOSSY_FACTORY_RE = re.compile(r'PQ|SQ|RQ|LSH')
+
+
+def _default_nlist(n_vectors: int) -> int:
+    """IVF için küme sayısını veri büyüklüğüne göre seç (~4*sqrt(n))"""
+    nlist = int(4 * math.sqrt(max(n_vectors, 1)))
+    # FAISS her küme için en az ~39 eğitim noktası ister
+    return max(1, min(nlist, n_vectors // 39))
+
+
+def _default_pq_m(dimension: int) -> int:
+    """PQ için alt-vektör sayısını seç (alt-vektör başına ~8 boyut)"""
+    for m in range(max(dimension // 8, 1), 0, -1):
+        if dimension % m == 0:
+            return m
+    return 1
+
+
+def resolve_index_factory(factory: str, n_vectors: int, dimension: int) -> str:
+    """
+    Parametresiz factory kalıplarını somut bir factory string'ine çevirir
+
+    Örnekler: "IVF,Flat" -> "IVF400,Flat", "IVF{n},PQ" -> "IVF400,PQ48"
+
+    Args:
+        factory: FAISS factory string'i (örn: "Flat", "IVF,Flat", "HNSW32", "IVF,PQ")
+        n_vectors: Index'e eklenecek vektör sayısı
+        dimension: Embedding vektör boyutu
+
+    Returns:
+        Somut factory string'i
+    """
+    factory = factory.strip()
+    nlist = _default_nlist(n_vectors)
+
+    factory = factory.replace("{n}", str(nlist))
+    factory = re.sub(r'IVF(?!\d)', f'IVF{nlist}', factory)
+    factory = re.sub(r'PQ(?!\d)', f'PQ{_default_pq_m(dimension)}', factory)
+
+    return factory
+
+
+def apply_quantization(factory: str, quantization: Optional[str]) -> str:
+    """
+    Factory string'inin vektör depolama kısmını sıkıştırılmış bir kodlayıcı ile değiştirir
+
+    Örnekler: ("Flat", "SQ8") -> "SQ8", ("IVF,Flat", "PQ") -> "IVF,PQ",
+    ("HNSW32", "SQfp16") -> "HNSW32,SQfp16"
+
+    Args:
+        factory: FAISS factory string'i
+        quantization: Sıkıştırma modu (None: sıkıştırma yok)
+
+    Returns:
+        Sıkıştırılmış depolama kullanan factory string'i
+    """
+    if not quantization:
+        return factory
+
+    if not quantization.startswith(QUANTIZATION_MODES):
+        raise ValueError(f"Desteklenmeyen sıkıştırma modu: {quantization} (desteklenenler: {QUANTIZATION_MODES})")
+
+    factory = factory.strip()
+    if factory == "Flat":
+        return quantization
+    if factory.endswith(",Flat"):
+        return factory[:-len("Flat")] + quantization
+    if factory.startswith("HNSW") and "," not in factory:
+        return f"{factory},{quantization}"
+
+    raise ValueError(f"'{factory}' index tipi '{quantization}' sıkıştırması ile birleştirilemiyor")
+
+
+def index_bytes_per_vector(index: faiss.Index) -> float:
+    """
+    Index'in vektör başına kullandığı yaklaşık bellek miktarını hesapla
+
+    Args:
+        index: FAISS index
+
+    Returns:
+        Vektör başına byte
+    """
+    if index is None or index.ntotal == 0:
+        return 0.0
+
+    index = faiss.downcast_index(index)
+
+    # Kod tabanlı index'ler (Flat, SQ, PQ, IVF*) kod boyutunu doğrudan bildirir
+    try:
+        code_size = float(index.sa_code_size())
+        if faiss.try_extract_index_ivf(index) is not None:
+            code_size += 8  # inverted list'lerde vektör başına int64 id
+        return code_size
+    except RuntimeError:
+        pass
+
+    # HNSW: depolama kodları + komşuluk listeleri (int32)
+    if hasattr(index, "hnsw"):
+        storage = faiss.downcast_index(index.storage)
+        return storage.sa_code_size() + index.hnsw.neighbors.size() * 4 / index.ntotal
+
+    # Bilinmeyen tipler için serileştirilmiş boyuttan tahmin et
+    return faiss.serialize_index(index).nbytes / index.ntotal
+
+
+def index_is_lossy(index: faiss.Index, factory: str) -> bool:
+    """
+    Index vektörleri kayıplı (sıkıştırılmış) kodlarla mı saklıyor? Açık factory
+    string'leri (örn: "IVF,PQ") quantization parametresi olmadan da kayıplı olabilir.
+
+    Args:
+        index: FAISS index
+        factory: Çözümlenmiş factory string'i
+
+    Returns:
+        Kodlar float32 vektörden küçükse True
+    """
+    if _LOSSY_FACTORY_RE.search(factory):
+        return True
+
+    index = faiss.downcast_index(index)
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        code_size = ivf.code_size
+    elif hasattr(index, "storage"):
+        code_size = faiss.downcast_index(index.storage).sa_code_size()
+    else:
+        try:
+            code_size = index.sa_code_size()
+        except RuntimeError:
+            return False
+
+    return code_size < 4 * index.d
+
+
+def rescore_candidates(query_embeddings: np.ndarray,
+                       embeddings: np.ndarray,
+                       indices: np.ndarray,
+                       top_k: int):
+    """
+    Sıkıştırılmış index'ten gelen adayları tam float vektörlerle yeniden skorla
+
+    Args:
+        query_embeddings: Normalize edilmiş query matrisi (n_queries x dimension)
+        embeddings: Tam float embedding matrisi (mmap olabilir)
+        indices: Aday indeksleri (n_queries x n_candidates, eksikler -1)
+        top_k: Her query için döndürülecek sonuç sayısı
+
+    Returns:
+        (similarities, indices) tuple'ı, ikisi de (n_queries x top_k) boyutunda
+    """
+    n_queries, n_candidates = indices.shape
+    valid = indices >= 0
+
+    # Sadece aday satırları oku (mmap'te yalnızca bu sayfalar belleğe gelir)
+    candidate_vectors = np.asarray(embeddings[np.where(valid, indices, 0).ravel()], dtype='float32')
+    candidate_vectors = candidate_vectors.reshape(n_queries, n_candidates, -1)
+
+    scores = np.einsum('qcd,qd->qc', candidate_vectors, query_embeddings)
+    scores[~valid] = -np.inf
+
+    order = np.argsort(-scores, axis=1)[:, :top_k]
+    similarities = np.take_along_axis(scores, order, axis=1)
+    indices = np.take_along_axis(indices, order, axis=1)
+
+    # Eksik adaylar FAISS'teki gibi -1 olarak kalsın
+    indices[~np.isfinite(similarities)] = -1
+
+    return similarities.astype('float32'), indices
+
+
+def make_search_params(index: faiss.Index, selector, selectivity: float = 1.0) -> faiss.SearchParameters:
+    """
+    ID seçici (filtre) içeren arama parametreleri oluştur. Index'in mevcut
+    nprobe / efSearch ayarları korunur (SearchParameters bunları ezer).
+
+    Args:
+        index: FAISS index
+        selector: faiss.IDSelector (örn: IDSelectorBitmap)
+        selectivity: Filtrenin seçtiği vektör oranı (0-1). IVF'de dar filtrelerin
+                     yeterli sonuç bulabilmesi için nprobe bu oranla ters orantılı artırılır.
+
+    Returns:
+        Index tipine uygun SearchParameters
+    """
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        nprobe = min(ivf.nlist, int(math.ceil(ivf.nprobe / max(selectivity, 1e-9))))
+        return faiss.SearchParametersIVF(sel=selector, nprobe=nprobe)
+
+    downcasted = faiss.downcast_index(index)
+    if hasattr(downcasted, "hnsw"):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=downcasted.hnsw.efSearch)
+
+    return faiss.SearchParameters(sel=selector)
+
+
+def exact_search(query_embeddings: np.ndarray,
+                 vectors: np.ndarray,
+                 ids: np.ndarray,
+                 top_k: int):
+    """
+    Küçük bir vektör alt kümesinde tam (brute-force) iç çarpım araması
+
+    Args:
+        query_embeddings: Normalize edilmiş query matrisi (n_queries x dimension)
+        vectors: Aday vektörler (n_candidates x dimension)
+        ids: Adayların index id'leri (n_candidates)
+        top_k: Her query için döndürülecek sonuç sayısı
+
+    Returns:
+        (similarities, indices) tuple'ı, FAISS gibi eksikler -1 ile doldurulur
+    """
+    n_queries = len(query_embeddings)
+    similarities = np.full((n_queries, top_k), -np.inf, dtype='float32')
+    indices = np.full((n_queries, top_k), -1, dtype='int64')
+
+    k = min(top_k, len(ids))
+    if k == 0:
+        return similarities, indices
+
+    scores = query_embeddings @ np.asarray(vectors, dtype='float32').T
+
+    # Tam sıralama yerine argpartition ile top-k, sonra sadece k elemanı sırala
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1)
+
+    similarities[:, :k] = np.take_along_axis(top_scores, order, axis=1)
+    indices[:, :k] = np.asarray(ids, dtype='int64')[np.take_along_axis(top, order, axis=1)]
+
+    return similarities, indices
+
+
+def merge_topk(results: List[Tuple[np.ndarray, np.ndarray]], top_k: int):
+    """
+    Birden fazla kaynaktan (ana index, delta segmentler, shard'lar) gelen
+    sonuçları birleştirip her query için en iyi top_k'yı al
+
+    Args:
+        results: (similarities, indices) tuple'ları, hepsi (n_queries x k_i) boyutunda
+        top_k: Her query için döndürülecek sonuç sayısı
+
+    Returns:
+        (similarities, indices) tuple'ı, eksikler -1 ile doldurulur
+    """
+    similarities = np.concatenate([sims for sims, _ in results], axis=1)
+    indices = np.concatenate([ids for _, ids in results], axis=1)
+    similarities = np.where(indices >= 0, similarities, -np.inf)
+
+    order = np.argsort(-similarities, axis=1, kind='stable')[:, :top_k]
+    similarities = np.take_along_axis(similarities, order, axis=1)
+    indices = np.take_along_axis(indices, order, axis=1)
+
+    if indices.shape[1] < top_k:
+        pad = top_k - indices.shape[1]
+        similarities = np.pad(similarities, ((0, 0), (0, pad)), constant_values=-np.inf)
+        indices = np.pad(indices, ((0, 0), (0, pad)), constant_values=-1)
+
+    return similarities, indices
+
+
+def range_search(index: faiss.Index,
+                 query_embeddings: np.ndarray,
+                 threshold: float,
+                 max_k: int,
+                 params: faiss.SearchParameters = None):
+    """
+    FAISS range search: benzerliği threshold'u geçen tüm sonuçlar (en fazla max_k).
+    Sonuç sayısı query'ye göre değişir; çıktı search() ile aynı biçimde doldurulur.
+
+    Args:
+        index: Inner product index'i
+        query_embeddings: Normalize edilmiş query matrisi (n_queries x dimension)
+        threshold: Minimum benzerlik
+        max_k: Her query için en fazla sonuç sayısı (üst sınır)
+        params: Arama parametreleri (ID seçici vb., opsiyonel)
+
+    Returns:
+        (similarities, indices) tuple'ı, (n_queries x max_k), eksikler -1 ile doldurulur
+    """
+    lims, distances, labels = index.range_search(query_embeddings, threshold, params=params)
+
+    n_queries = len(query_embeddings)
+    similarities = np.full((n_queries, max_k), -np.inf, dtype='float32')
+    indices = np.full((n_queries, max_k), -1, dtype='int64')
+
+    for i in range(n_queries):
+        row_similarities = distances[lims[i]:lims[i + 1]]
+        k = min(max_k, len(row_similarities))
+        if k == 0:
+            continue
+        top = np.argsort(-row_similarities, kind='stable')[:k]
+        similarities[i, :k] = row_similarities[top]
+        indices[i, :k] = labels[lims[i]:lims[i + 1]][top]
+
+    return similarities, indices
+
+
+def apply_threshold(similarities: np.ndarray, indices: np.ndarray, threshold: float):
+    """
+    Eşiğin altındaki sonuçları boş (-1) olarak işaretle; sıralama korunur
+
+    Returns:
+        (similarities, indices) tuple'ı
+    """
+    below = similarities < threshold
+    similarities = np.where(below, -np.inf, similarities).astype('float32')
+    indices = np.where(below, -1, indices)
+    return similarities, indices
+
+
+def fill_min_k(similarities: np.ndarray, indices: np.ndarray, min_k: int, fallback_search):
+    """
+    Range search'te min_k'dan az sonuç bulan query'leri eşiksiz en iyi min_k sonuçla doldur
+
+    Args:
+        similarities: Range search benzerlikleri (n_queries x max_k)
+        indices: Range search id'leri (n_queries x max_k)
+        min_k: Her query için en az sonuç sayısı (max_k'yı geçemez)
+        fallback_search: rows -> (similarities, indices) döndüren top-min_k arama fonksiyonu
+
+    Returns:
+        (similarities, indices) tuple'ı
+    """
+    min_k = min(min_k, indices.shape[1])
+    if min_k <= 0:
+        return similarities, indices
+
+    short = np.flatnonzero((indices >= 0).sum(axis=1) < min_k)
+    if len(short) == 0:
+        return similarities, indices
+
+    fallback_similarities, fallback_indices = fallback_search(short)
+    similarities, indices = similarities.copy(), indices.copy()
+    similarities[short] = -np.inf
+    indices[short] = -1
+    similarities[short, :min_k] = fallback_similarities[:, :min_k]
+    indices[short, :min_k] = fallback_indices[:, :min_k]
+
+    return similarities, indices
+
+
+def apply_search_params(index: faiss.Index, params: Dict) -> faiss.Index:
+    """
+    Arama zamanı parametrelerini (nprobe, efSearch) index'e uygula
+
+    Args:
+        index: FAISS index
+        params: Index parametreleri ('nprobe' ve/veya 'efSearch' içerebilir)
+
+    Returns:
+        Aynı index
+    """
+    parameter_space = faiss.ParameterSpace()
+
+    for name in ("nprobe", "efSearch"):
+        value = params.get(name)
+        if value is None:
+            continue
+        try:
+            parameter_space.set_index_parameter(index, name, value)
+        except RuntimeError:
+            # Bu index tipi parametreyi desteklemiyor (örn: Flat için nprobe)
+            pass
+
+    return index
+
+
+def build_index(embeddings: np.ndarray,
+                factory: str = DEFAULT_INDEX_FACTORY,
+                quantization: Optional[str] = None,
+                rescore: bool = False,
+                rescore_factor: int = DEFAULT_RESCORE_FACTOR,
+                nprobe: Optional[int] = None,
+                ef_search: Optional[int] = None,
+                train_sample_size: int = DEFAULT_TRAIN_SAMPLE_SIZE,
+                seed: int = 42):
+    """
+    Factory string'ine göre FAISS index oluşturur, gerekiyorsa eğitir ve vektörleri ekler
+
+    Args:
+        embeddings: L2-normalize edilmiş embedding matrisi (n x dimension)
+        factory: FAISS factory string'i (örn: "Flat", "IVF,Flat", "HNSW32", "IVF,PQ")
+        quantization: Sıkıştırılmış depolama modu (örn: "SQ8", "SQfp16", "PQ"; None: float32)
+        rescore: Sıkıştırılmış index'in adaylarını tam float vektörlerle yeniden skorla
+        rescore_factor: Yeniden skorlama için top_k'nın kaç katı aday alınacağı
+        nprobe: IVF index'leri için taranacak küme sayısı (None: otomatik)
+        ef_search: HNSW index'leri için arama derinliği (None: otomatik)
+        train_sample_size: Eğitim için kullanılacak maksimum vektör sayısı
+        seed: Eğitim örneklemesi için rastgelelik tohumu
+
+    Returns:
+        (index, params) tuple'ı. params stats.json'a yazılacak build parametreleridir.
+    """
+    embeddings = np.ascontiguousarray(embeddings, dtype='float32')
+    n_vectors, dimension = embeddings.shape
+
+    resolved = resolve_index_factory(apply_quantization(factory, quantization), n_vectors, dimension)
+    index = faiss.index_factory(dimension, resolved, faiss.METRIC_INNER_PRODUCT)
+
+    # Eğitim gerektiren index'ler (IVF, PQ, SQ) için örneklem üzerinde eğit
+    train_size = 0
+    if not index.is_trained:
+        train_size = min(n_vectors, train_sample_size)
+        if train_size < n_vectors:
+            rng = np.random.default_rng(seed)
+            sample = embeddings[np.sort(rng.choice(n_vectors, train_size, replace=False))]
+        else:
+            sample = embeddings
+        index.train(sample)
+
+    index.add(embeddings)
+
+    params = {
+        "factory": resolved,
+        "requested_factory": factory,
+        "train_size": train_size,
+        "quantization": quantization,
+        "rescore": bool(rescore and index_is_lossy(index, resolved)),
+        "rescore_factor": rescore_factor,
+        "bytes_per_vector": index_bytes_per_vector(index),
+        "nprobe": None,
+        "efSearch": None
+    }
+
+    # Arama zamanı parametrelerinin varsayılanlarını belirle
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        params["nlist"] = ivf.nlist
+        params["nprobe"] = nprobe or max(1, int(math.sqrt(ivf.nlist)))
+    if "HNSW" in resolved:
+        params["efSearch"] = ef_search or DEFAULT_EF_SEARCH
+
+    apply_search_params(index, params)
+
+    return index, params
@@ -0,0 +1,349 @@
+"""
+Keyword Index Modülü
+BM25 skorlamalı kalıcı ters index (inverted index)
+
+Index ingest sırasında bir kez oluşturulur ve index.faiss'in yanına kaydedilir
+(bm25/ dizini). Sorgu maliyeti korpus büyüklüğüyle değil, sorgu terimlerinin
+posting listelerinin uzunluğuyla orantılıdır. Token'lar turkish_text modülüyle
+üretilir; tokenizer sürümü ve kök bulma ayarı index ile birlikte saklanır.
+
+Disk düzeni (bm25/ dizini):
+    vocab.json          - Terim listesi, BM25 parametreleri ve tokenizer ayarları
+    postings_offsets.npy - Her terimin posting listesinin başlangıç/bitiş ofsetleri (int64, V+1)
+    postings_docs.npy   - Posting listelerindeki doküman id'leri (int32)
+    postings_tfs.npy    - Posting listelerindeki terim frekansları (int32)
+    doc_lens.npy        - Doküman uzunlukları (token sayısı, int32)
+"""
+
+import heapq
+import json
+import math
+import os
+import shutil
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from turkish_text import TOKENIZER_VERSION, tokenize, tokenize_query
+
+
+INDEX_DIRNAME = "bm25"
+
+
+class BM25Index:
+    """BM25 skorlamalı ters index"""
+
+    def __init__(self, terms: List[str], offsets: np.ndarray, docs: np.ndarray,
+                 tfs: np.ndarray, doc_lens: np.ndarray, k1: float = 1.5, b: float = 0.75,
+                 stem: bool = False, tokenizer_version: str = TOKENIZER_VERSION):
+        """
+        Args:
+            terms: Terim listesi (terim id'si = listedeki pozisyon)
+            offsets: Posting listesi ofsetleri (V+1)
+            docs: Posting doküman id'leri
+            tfs: Posting terim frekansları
+            doc_lens: Doküman uzunlukları
+            k1: BM25 terim frekansı doygunluk parametresi
+            b: BM25 uzunluk normalizasyonu parametresi
+            stem: Token'larda hafif kök bulma kullanıldı mı (sorgular da aynı şekilde işlenir)
+            tokenizer_version: Index'i üreten tokenizer sürümü
+        """
+        self.terms = terms
+        self.term_ids = {term: i for i, term in enumerate(terms)}
+        self.offsets = offsets
+        self.docs = docs
+        self.tfs = tfs
+        self.k1 = k1
+        self.b = b
+        self.stem = stem
+        self.tokenizer_version = tokenizer_version
+
+        # Sonradan eklenen dokümanlar: terim -> [(doc_id, tf), ...]
+        self._extra_postings: Dict[str, List[Tuple[int, int]]] = {}
+
+        self._set_doc_lens(np.asarray(doc_lens, dtype='int32'))
+
+    def _set_doc_lens(self, doc_lens: np.ndarray):
+        """Doküman uzunluklarından BM25 normalizasyon terimlerini hesapla"""
+        self.doc_lens = doc_lens
+        self.num_docs = len(doc_lens)
+        self.avgdl = float(doc_lens.mean()) if self.num_docs else 0.0
+
+        # Her doküman için k1 * (1 - b + b * dl / avgdl) bir kez hesaplanır
+        avgdl = self.avgdl or 1.0
+        self._norm = (self.k1 * (1 - self.b + self.b * doc_lens / avgdl)).astype('float32')
+
+    # ==================== OLUŞTURMA / YÜKLEME ====================
+
+    @classmethod
+    def build(cls, tokenized_docs: List[List[str]], k1: float = 1.5, b: float = 0.75,
+              stem: bool = False) -> "BM25Index":
+        """
+        Token listelerinden ters index oluştur
+
+        Args:
+            tokenized_docs: Her doküman için token listesi (doküman id'si = pozisyon),
+                            tokenize_documents(..., stem=stem) ile üretilmiş olmalı
+            k1: BM25 k1 parametresi
+            b: BM25 b parametresi
+            stem: Token'larda hafif kök bulma kullanıldı mı
+
+        Returns:
+            BM25Index
+        """
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        doc_lens = np.zeros(len(tokenized_docs), dtype='int32')
+
+        for doc_id, tokens in enumerate(tokenized_docs):
+            doc_lens[doc_id] = len(tokens)
+            for term, tf in Counter(tokens).items():
+                postings.setdefault(term, []).append((doc_id, tf))
+
+        terms = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype='int64')
+        if terms:
+            np.cumsum([len(postings[term]) for term in terms], out=offsets[1:])
+
+        docs = np.empty(int(offsets[-1]), dtype='int32')
+        tfs = np.empty(int(offsets[-1]), dtype='int32')
+        for i, term in enumerate(terms):
+            start, end = offsets[i], offsets[i + 1]
+            term_postings = np.array(postings[term], dtype='int32')
+            docs[start:end] = term_postings[:, 0]
+            tfs[start:end] = term_postings[:, 1]
+
+        return cls(terms, offsets, docs, tfs, doc_lens, k1=k1, b=b, stem=stem)
+
+    @classmethod
+    def from_texts(cls, texts: List[str], stem: bool = False) -> "BM25Index":
+        """
+        Ham metinlerden ters index oluştur
+
+        Args:
+            texts: Doküman metinleri
+            stem: Hafif kök bulma uygulansın mı
+
+        Returns:
+            BM25Index
+        """
+        return cls.build(tokenize_documents(texts, stem), stem=stem)
+
+    @staticmethod
+    def exists(index_dir: str) -> bool:
+        """Verilen index dizininde BM25 index'i var mı?"""
+        return (Path(index_dir) / INDEX_DIRNAME / "vocab.json").exists()
+
+    @classmethod
+    def load(cls, index_dir: str, use_mmap: bool = True) -> "BM25Index":
+        """
+        Index'i diskten aç
+
+        Args:
+            index_dir: Index dizini (bm25/ alt dizinini içerir)
+            use_mmap: Posting dizilerini mmap ile aç
+
+        Returns:
+            BM25Index
+        """
+        path = Path(index_dir) / INDEX_DIRNAME
+        mmap_mode = 'r' if use_mmap else None
+
+        with open(path / "vocab.json", 'r', encoding='utf-8') as f:
+            vocab = json.load(f)
+
+        return cls(
+            vocab["terms"],
+            np.load(path / "postings_offsets.npy", mmap_mode=mmap_mode),
+            np.load(path / "postings_docs.npy", mmap_mode=mmap_mode),
+            np.load(path / "postings_tfs.npy", mmap_mode=mmap_mode),
+            np.load(path / "doc_lens.npy"),
+            k1=vocab["k1"],
+            b=vocab["b"],
+            stem=vocab.get("stem", False),
+            tokenizer_version=vocab.get("tokenizer")
+        )
+
+    def save(self, index_dir: str):
+        """
+        Index'i (sonradan eklenen dokümanlar dahil) diske yaz
+
+        Args:
+            index_dir: Index dizini
+        """
+        index = self._compacted()
+
+        path = Path(index_dir) / INDEX_DIRNAME
+        tmp_path = path.with_name(INDEX_DIRNAME + ".tmp")
+        if tmp_path.exists():
+            shutil.rmtree(tmp_path)
+        tmp_path.mkdir(parents=True)
+
+        with open(tmp_path / "vocab.json", 'w', encoding='utf-8') as f:
+            json.dump({"terms": index.terms, "k1": index.k1, "b": index.b,
+                       "stem": index.stem, "tokenizer": index.tokenizer_version}, f, ensure_ascii=False)
+        np.save(tmp_path / "postings_offsets.npy", np.asarray(index.offsets))
+        np.save(tmp_path / "postings_docs.npy", np.asarray(index.docs))
+        np.save(tmp_path / "postings_tfs.npy", np.asarray(index.tfs))
+        np.save(tmp_path / "doc_lens.npy", np.asarray(index.doc_lens))
+
+        if path.exists():
+            shutil.rmtree(path)
+        os.replace(tmp_path, path)
+
+    @property
+    def is_current(self) -> bool:
+        """Index güncel tokenizer ile mi üretilmiş? (değilse yeniden oluşturulmalı)"""
+        return self.tokenizer_version == TOKENIZER_VERSION
+
+    # ==================== GÜNCELLEME ====================
+
+    def add_texts(self, texts: List[str]):
+        """
+        Ham metinleri index'in tokenizer ayarlarıyla token'layıp ekle
+
+        Args:
+            texts: Yeni doküman metinleri
+        """
+        self.add_documents(tokenize_documents(texts, self.stem))
+
+    def add_documents(self, tokenized_docs: List[List[str]]):
+        """
+        Index'e yeni dokümanlar ekle (id'ler mevcut dokümanların devamıdır)
+
+        Args:
+            tokenized_docs: Her yeni doküman için token listesi
+        """
+        for doc_id, tokens in enumerate(tokenized_docs, start=self.num_docs):
+            for term, tf in Counter(tokens).items():
+                self._extra_postings.setdefault(term, []).append((doc_id, tf))
+
+        new_lens = np.array([len(tokens) for tokens in tokenized_docs], dtype='int32')
+        self._set_doc_lens(np.concatenate([np.asarray(self.doc_lens, dtype='int32'), new_lens]))
+
+    def _postings(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Bir terimin (doküman id'leri, terim frekansları) posting listesi"""
+        docs = []
+        tfs = []
+
+        term_id = self.term_ids.get(term)
+        if term_id is not None:
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            docs.append(np.asarray(self.docs[start:end]))
+            tfs.append(np.asarray(self.tfs[start:end]))
+
+        extra = self._extra_postings.get(term)
+        if extra:
+            extra = np.array(extra, dtype='int32')
+            docs.append(extra[:, 0])
+            tfs.append(extra[:, 1])
+
+        if not docs:
+            return np.empty(0, dtype='int32'), np.empty(0, dtype='int32')
+        return np.concatenate(docs), np.concatenate(tfs)
+
+    def snapshot(self) -> "BM25Index":
+        """Sonradan yapılan eklemelerden etkilenmeyen, birleştirilmiş kopya (arka planda kaydetmek için)"""
+        index = self._compacted()
+        if index is self:
+            index = BM25Index(self.terms, self.offsets, self.docs, self.tfs, self.doc_lens,
+                              k1=self.k1, b=self.b, stem=self.stem, tokenizer_version=self.tokenizer_version)
+        return index
+
+    def _compacted(self) -> "BM25Index":
+        """Sonradan eklenen dokümanlar varsa tüm posting listelerini birleştir"""
+        if not self._extra_postings:
+            return self
+
+        terms = sorted(set(self.terms) | set(self._extra_postings))
+        all_docs = []
+        all_tfs = []
+        offsets = np.zeros(len(terms) + 1, dtype='int64')
+        for i, term in enumerate(terms):
+            docs, tfs = self._postings(term)
+            all_docs.append(docs)
+            all_tfs.append(tfs)
+            offsets[i + 1] = offsets[i] + len(docs)
+
+        return BM25Index(terms, offsets,
+                         np.concatenate(all_docs) if all_docs else np.empty(0, dtype='int32'),
+                         np.concatenate(all_tfs) if all_tfs else np.empty(0, dtype='int32'),
+                         self.doc_lens, k1=self.k1, b=self.b,
+                         stem=self.stem, tokenizer_version=self.tokenizer_version)
+
+    # ==================== ARAMA ====================
+
+    def search_text(self, query: str, top_k: int = 5,
+                    mask: np.ndarray = None) -> List[Tuple[int, float]]:
+        """
+        Sorgu metnini index'in tokenizer ayarlarıyla token'layıp ara
+
+        Args:
+            query: Sorgu metni
+            top_k: Döndürülecek sonuç sayısı
+            mask: İzin verilen doküman maskesi (opsiyonel)
+
+        Returns:
+            Skora göre azalan (doc_id, score) tuple'larının listesi
+        """
+        return self.search(tokenize_query(query, self.stem), top_k=top_k, mask=mask)
+
+    def search(self, query_tokens: List[str], top_k: int = 5,
+               mask: np.ndarray = None) -> List[Tuple[int, float]]:
+        """
+        BM25 ile arama yap
+
+        Args:
+            query_tokens: Sorgu token'ları
+            top_k: Döndürülecek sonuç sayısı
+            mask: İzin verilen doküman maskesi (opsiyonel, filtreli arama için)
+
+        Returns:
+            Skora göre azalan (doc_id, score) tuple'larının listesi
+        """
+        all_docs = []
+        all_scores = []
+
+        for term in set(query_tokens):
+            docs, tfs = self._postings(term)
+            if len(docs) == 0:
+                continue
+
+            # idf: terimi içeren doküman sayısına göre (filtre öncesi df)
+            df = len(docs)
+            idf = math.log(1 + (self.num_docs - df + 0.5) / (df + 0.5))
+
+            if mask is not None:
+                keep = mask[docs]
+                docs, tfs = docs[keep], tfs[keep]
+                if len(docs) == 0:
+                    continue
+
+            tfs = tfs.astype('float32')
+            all_docs.append(docs)
+            all_scores.append(idf * tfs * (self.k1 + 1) / (tfs + self._norm[docs]))
+
+        if not all_docs:
+            return []
+
+        # Aynı dokümanın farklı terimlerden gelen skorlarını topla
+        unique_docs, inverse = np.unique(np.concatenate(all_docs), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(all_scores))
+
+        top = heapq.nlargest(top_k, range(len(unique_docs)), key=scores.__getitem__)
+        return [(int(unique_docs[i]), float(scores[i])) for i in top]
+
+
+def tokenize_documents(texts: List[str], stem: bool = False) -> List[List[str]]:
+    """
+    Doküman metinlerini bir kez token'la (ingest sırasında kullanılır)
+
+    Args:
+        texts: Doküman metinleri
+        stem: Hafif kök bulma uygulansın mı
+
+    Returns:
+        Her doküman için token listesi
+    """
+    return [tokenize(text, stem) for text in texts]
@@ -0,0 +1,131 @@
+"""
+Micro-batching Modülü
+Eşzamanlı (farklı Streamlit oturumlarından gelen) tekil istekleri birkaç milisaniye
+toplayıp tek bir toplu çağrıda işler
+
+load_rag_system st.cache_resource olduğu için tüm oturumlar aynı RAGSystem'i paylaşır;
+her soru tek satırlık encode ve index.search çalıştırır. MicroBatcher bu istekleri bir
+kuyrukta toplar, en fazla max_wait_ms bekleyip (veya max_batch_size dolunca) tek bir
+batch fonksiyonu çağrısı yapar ve sonuçları Future'lar ile isteklere dağıtır.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List
+
+
+DEFAULT_MAX_BATCH_SIZE = 32
+DEFAULT_MAX_WAIT_MS = 5.0
+
+_STOP = object()
+
+
+class MicroBatcher:
+    """Tekil istekleri zaman / boyut sınırlı batch'lerde işleyen arka plan işçisi"""
+
+    def __init__(self, process_batch: Callable[[List[Any]], List[Any]],
+                 max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+                 max_wait_ms: float = DEFAULT_MAX_WAIT_MS,
+                 name: str = "micro-batcher"):
+        """
+        Args:
+            process_batch: İstek listesini alıp aynı sırada sonuç listesi döndüren fonksiyon
+            max_batch_size: Bir batch'teki maksimum istek sayısı
+            max_wait_ms: İlk istekten sonra diğer istekler için beklenecek maksimum süre
+            name: İşçi thread'inin adı
+        """
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, item: Any) -> Future:
+        """
+        İsteği kuyruğa ekle
+
+        Args:
+            item: process_batch'e iletilecek istek
+
+        Returns:
+            Sonucu (veya hatayı) taşıyacak Future
+        """
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def __call__(self, item: Any) -> Any:
+        """İsteği gönder ve sonucunu bekle"""
+        return self.submit(item).result()
+
+    def _run(self):
+        """İşçi döngüsü: ilk isteği bekle, süre / boyut sınırına kadar topla, işle"""
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+
+            batch = [first]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is _STOP:
+                    stopping = True
+                    break
+                batch.append(entry)
+
+            self._process(batch)
+
+    def _process(self, batch: List):
+        """Batch'i işle ve sonuçları Future'lara dağıt"""
+        items = [item for item, _ in batch]
+        try:
+            results = self.process_batch(items)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+        with self._lock:
+            self.batches += 1
+            self.items += len(batch)
+            self.largest_batch = max(self.largest_batch, len(batch))
+
+    def close(self):
+        """Kuyruktaki istekler işlendikten sonra işçiyi durdur"""
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def get_stats(self) -> Dict:
+        """
+        Batch istatistiklerini döndür
+
+        Returns:
+            İstatistik dictionary
+        """
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "items": self.items,
+                "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+                "largest_batch": self.largest_batch,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000
+            }
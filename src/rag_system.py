@@ -3,39 +3,88 @@ RAG Sistemi - Tarih Bilgi Rehberi
 FAISS index'ten arama yapar ve Gemini ile yanıt üretir
 """
 
+import time
+
+# Soğuk başlangıç raporu: modül import süresi
+_IMPORT_START = time.perf_counter()
+
+import asyncio
+import functools
 import os
-import json
+import sqlite3
 import sys
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Iterator, Optional, Tuple
 import numpy as np
-from sentence_transformers import SentenceTransformer
-import google.generativeai as genai
 from dotenv import load_dotenv
-from huggingface_hub import hf_hub_download
 
 # src klasörünü path'e ekle - KRİTİK!
 sys.path.append(str(Path(__file__).parent))
 
-from retrieval import FAISSRetriever
+from retrieval import FAISSRetriever, mmr_select
+from sharding import ShardedRetriever, SHARDS_MANIFEST
+from reranker import CrossEncoderReranker, DEFAULT_RERANKER_MODEL
+from embedding_cache import EmbeddingCache
+from semantic_cache import SemanticCache, DEFAULT_TTL_SECONDS
+from response_cache import ResponseCache, prompt_key
+from micro_batcher import MicroBatcher, DEFAULT_MAX_BATCH_SIZE
+from encoders import load_encoder, DEFAULT_MODEL_NAME
+from artifacts import ArtifactStore, MODEL_SUBDIR
 
 # Environment variables yükle
 load_dotenv()
 
-def download_faiss_index_from_hf(repo_id: str, local_dir: Path):
+# Ağır kütüphaneler (google.generativeai, huggingface_hub, PyTorch / ONNX Runtime)
+# modül yüklenirken değil, RAGSystem oluşturulurken import edilir
+IMPORT_MS = (time.perf_counter() - _IMPORT_START) * 1000
+
+# Başlangıç raporundaki aşamalar (startup_timings anahtarı, görünen ad)
+STARTUP_PHASES = (
+    ("imports_ms", "import"),
+    ("download_ms", "artefakt / indirme"),
+    ("model_load_ms", "embedding modeli"),
+    ("index_load_ms", "FAISS index"),
+    ("metadata_parse_ms", "metadata"),
+    ("llm_setup_ms", "Gemini"),
+)
+
+# "topk": sabit top_k sonra eşik, "range": eşiği geçen tüm chunk'lar (üst/alt sınırlı)
+RETRIEVAL_MODES = ("topk", "range")
+
+# Kalıcı önbelleklerin varsayılan SQLite dosyaları; sadece CACHE_PERSIST=1 ile ya da
+# EMBEDDING_CACHE_PATH / RESPONSE_CACHE_PATH açıkça verilince kullanılır
+DEFAULT_EMBEDDING_CACHE_PATH = "models/cache/query_embeddings.sqlite"
+DEFAULT_RESPONSE_CACHE_PATH = "models/cache/responses.sqlite"
+
+# Kalıcılık kapalıyken yanıt önbelleği süreç içi SQLite veritabanında tutulur
+IN_MEMORY_SQLITE = ":memory:"
+
+# Prompt şablonu değiştiğinde artırılır; eski şablonla üretilmiş yanıtlar önbellekten gelmez
+PROMPT_TEMPLATE_VERSION = "tarih-v1"
+
+NO_CONTEXT_RESPONSE = "Üzgünüm, bu konu hakkında bilgim bulunmuyor. Lütfen farklı bir soru sorun veya sorunuzu daha spesifik hale getirin."
+
+def download_faiss_index_from_hf(repo_id: str, local_dir: Path, offline: bool = False):
     """
     FAISS index dosyalarını Hugging Face Hub'dan indirir.
-    Eğer dosyalar zaten varsa, indirme yapmaz.
+    Eğer dosyalar zaten varsa, indirme yapmaz. Artefakt paketi (ARTIFACT_MIRROR)
+    kullanılmadığında geriye dönük uyumluluk için kullanılır.
     """
     index_path = local_dir / "index.faiss"
     metadata_path = local_dir / "metadata.json"
+    chunk_store_path = local_dir / "chunk_store" / "columns.json"
+    shards_path = local_dir / SHARDS_MANIFEST
 
-    if index_path.exists() and metadata_path.exists():
+    if shards_path.exists() or (index_path.exists() and (metadata_path.exists() or chunk_store_path.exists())):
         print("✅ FAISS index dosyaları zaten mevcut.")
         return
 
+    if offline:
+        raise FileNotFoundError(f"Offline mod: {local_dir} altında FAISS index yok ve indirme yapılmıyor")
+
     print(f"📂 FAISS index dosyaları indiriliyor... (Repo: {repo_id})")
     local_dir.mkdir(parents=True, exist_ok=True)
+    from huggingface_hub import hf_hub_download
 
     try:
         # index.faiss dosyasını indir
@@ -60,33 +109,149 @@ def download_faiss_index_from_hf(repo_id: str, local_dir: Path):
              local_dir.rmdir()
         raise
 
+def cache_path_from_env(env_name: str, default_path: str) -> Optional[str]:
+    """
+    Kalıcı önbellek dosyasını ortam değişkenlerinden belirle. Salt-okunur kurulumlarda
+    uygulama dizinine yazılmaması için varsayılan dosya sadece CACHE_PERSIST=1 ile açılır.
+
+    Args:
+        env_name: Dosya yolunu veren ortam değişkeni ("" ise önbellek kapalı)
+        default_path: CACHE_PERSIST=1 iken kullanılacak varsayılan dosya
+
+    Returns:
+        SQLite dosya yolu; None ise sadece bellek, "" ise kapalı
+    """
+    path = os.getenv(env_name)
+    if path is not None:
+        return path
+    return default_path if os.getenv("CACHE_PERSIST", "0") == "1" else None
+
+
+def open_persistent_cache(open_fn, path: str, name: str):
+    """
+    SQLite tabanlı önbelleği aç; dizin yazılamıyorsa uyarı verip None döndür
+
+    Args:
+        open_fn: Dosya yolundan önbellek nesnesi oluşturan fonksiyon
+        path: SQLite dosyası
+        name: Uyarı mesajında görünen önbellek adı
+
+    Returns:
+        Önbellek nesnesi veya None
+    """
+    try:
+        return open_fn(path)
+    except (OSError, sqlite3.Error) as e:
+        print(f"⚠️ {name} dosyası açılamadı ({path}): {e} - sadece bellek kullanılacak")
+        return None
+
+
 class RAGSystem:
     """Tarih RAG sistemi sınıfı - Retrieval ve Generation işlemleri"""
     
-    def __init__(self, index_dir: str = "models/faiss_index"):
+    def __init__(self, index_dir: str = None, use_reranker: bool = None,
+                 fetch_k: int = 20, mmr_lambda: float = None, retrieval_mode: str = None,
+                 range_max_k: int = 10, range_min_k: int = 1, embedding_cache_path: str = None,
+                 semantic_cache_threshold: float = None, response_cache_path: str = None,
+                 micro_batch_wait_ms: float = None, micro_batch_max: int = None,
+                 embedding_backend: str = None):
         """
         Args:
-            index_dir: FAISS index dizini
+            index_dir: FAISS index dizini (None ise kurulu artefakt paketindeki index'in
+                       çalışma kopyası, paket yoksa models/faiss_index)
+            use_reranker: Cross-encoder ile yeniden sıralama yapılsın mı
+                          (None ise USE_RERANKER ortam değişkeni kullanılır)
+            fetch_k: Re-ranking / MMR açıkken FAISS'ten çekilecek aday sayısı
+            mmr_lambda: MMR çeşitlendirme ağırlığı (1.0 = sadece alaka); None ise
+                        MMR_LAMBDA ortam değişkeni kullanılır, o da yoksa MMR kapalıdır
+            retrieval_mode: "topk" (sabit top_k, sonra eşik) veya "range" (eşiği geçen tüm
+                            chunk'lar; None ise RETRIEVAL_MODE ortam değişkeni kullanılır)
+            range_max_k: Range modunda prompt'a girecek en fazla chunk sayısı
+            range_min_k: Range modunda eşiği geçen chunk yoksa bile döndürülecek chunk sayısı
+            embedding_cache_path: Sorgu embedding önbelleğinin SQLite dosyası (None ise
+                                  EMBEDDING_CACHE_PATH, o da yoksa CACHE_PERSIST=1 iken
+                                  varsayılan dosya; "" ise sadece bellek)
+            semantic_cache_threshold: Semantik yanıt önbelleği için minimum soru benzerliği
+                                      (None ise SEMANTIC_CACHE_THRESHOLD; o da yoksa kapalı)
+            response_cache_path: Gemini yanıt önbelleğinin SQLite dosyası (None ise
+                                 RESPONSE_CACHE_PATH, o da yoksa CACHE_PERSIST=1 iken
+                                 varsayılan dosya, yoksa sadece bellek; "" ise kapalı)
+            micro_batch_wait_ms: Eşzamanlı tekil sorguları toplu encode / arama için
+                                 bekleme süresi (None ise MICRO_BATCH_WAIT_MS; 0 ise kapalı)
+            micro_batch_max: Bir micro-batch'teki maksimum sorgu sayısı (None ise MICRO_BATCH_MAX)
+            embedding_backend: "torch", "onnx" veya "onnx-int8" (None ise EMBEDDING_BACKEND ortam
+                               değişkeni); index'i oluşturan backend ile uyumlu olmalı
         """
+        self.last_timings: Dict[str, float] = {}
+
+        # Soğuk başlangıç aşamalarının süreleri (print_startup_report ile raporlanır)
+        phase_start = startup_start = time.perf_counter()
+        import google.generativeai as genai
+        self.startup_timings: Dict[str, float] = {"imports_ms": IMPORT_MS + (time.perf_counter() - phase_start) * 1000}
+        phase_start = time.perf_counter()
+
+        # 1. ADIM: Checksum'lı artefakt paketini (index + chunk deposu + model) doğrula / kur.
+        # Kurulu ve sağlam paket varsa uzak çağrı yapılmaz; OFFLINE=1 ile ağa hiç çıkılmaz
+        self.artifacts = ArtifactStore.from_env()
+        if self.artifacts.offline:
+            os.environ.setdefault("HF_HUB_OFFLINE", "1")
+            os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+        bundle_dir = self.artifacts.ensure()
+        self.artifact_manifest = self.artifacts.current() if bundle_dir else None
+
+        MODEL_NAME = DEFAULT_MODEL_NAME
+        if bundle_dir is not None:
+            # Paket salt okunurdur; index yazılabilir çalışma kopyasından açılır
+            index_dir = index_dir or self.artifacts.activate(bundle_dir)
+            if (bundle_dir / MODEL_SUBDIR).exists():
+                MODEL_NAME = str(bundle_dir / MODEL_SUBDIR)
+        else:
+            # Paket yoksa eski davranış: FAISS index dosyalarını Hugging Face'ten indir (eğer yoksa)
+            # Kendi Hugging Face kullanıcı adınızı ve dataset adınızı yazın
+            HF_REPO_ID = "miyigun/tarih-bilgi-rehberi-faiss-index" 
+            index_dir = index_dir or "models/faiss_index"
+            download_faiss_index_from_hf(repo_id=HF_REPO_ID, local_dir=Path(index_dir),
+                                         offline=self.artifacts.offline)
         self.index_dir = Path(index_dir)
+        self.startup_timings["download_ms"] = (time.perf_counter() - phase_start) * 1000
+        phase_start = time.perf_counter()
 
-        # 1. ADIM: FAISS index dosyalarını Hugging Face'ten indir (eğer yoksa)
-        # Kendi Hugging Face kullanıcı adınızı ve dataset adınızı yazın
-        HF_REPO_ID = "miyigun/tarih-bilgi-rehberi-faiss-index" 
-        download_faiss_index_from_hf(repo_id=HF_REPO_ID, local_dir=self.index_dir)
+        # 2. ADIM: Embedding modelini yükle (paketteki yerel kopya, yoksa Hugging Face)
+        # EMBEDDING_BACKEND=onnx / onnx-int8 ile PyTorch yerine ONNX Runtime kullanılır
+        print(f"🔄 Embedding modeli yükleniyor... ({MODEL_NAME})")
+        self.embedding_model = load_encoder(MODEL_NAME, backend=embedding_backend)
+        self.startup_timings["model_load_ms"] = (time.perf_counter() - phase_start) * 1000
 
-        # 2. ADIM: Embedding modelini Hugging Face'ten yükle
-        MODEL_NAME = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
-        print(f"🔄 Embedding modeli yükleniyor... (Hugging Face: {MODEL_NAME})")
-        self.embedding_model = SentenceTransformer(MODEL_NAME)
+        dimension = self.artifact_manifest.get("dimension") if self.artifact_manifest else None
+        if dimension and dimension != self.embedding_model.get_sentence_embedding_dimension():
+            raise ValueError(f"Artefakt paketi {dimension} boyutlu, embedding modeli "
+                             f"{self.embedding_model.get_sentence_embedding_dimension()} boyutlu")
 
-        # 3. ADIM: Yerel FAISS index'ini yükle
+        # Tekrarlayan sorular (örn. örnek sorular) encoder'ı çalıştırmadan önbellekten gelir
+        # Kalıcı dosya açılamazsa (salt-okunur kurulum) sadece bellek kullanılır
+        if embedding_cache_path is None:
+            embedding_cache_path = cache_path_from_env("EMBEDDING_CACHE_PATH", DEFAULT_EMBEDDING_CACHE_PATH)
+        cache_name = self.embedding_model.cache_name
+        self.embedding_cache = None
+        if embedding_cache_path:
+            self.embedding_cache = open_persistent_cache(
+                lambda path: EmbeddingCache(cache_name, path=path), embedding_cache_path, "Embedding önbelleği"
+            )
+        if self.embedding_cache is None:
+            self.embedding_cache = EmbeddingCache(cache_name)
+
+        # 3. ADIM: Yerel FAISS index'ini ve chunk deposunu yükle
         print("🔄 FAISSRetriever başlatılıyor ve yerel index yükleniyor...")
-        self.retriever = FAISSRetriever(index_path=index_dir)
-        
-        # Metadata yükle
-        with open(self.index_dir / "metadata.json", 'r', encoding='utf-8') as f:
-            self.chunks = json.load(f)
+        # mmap: tüm Streamlit süreçleri index'i page cache üzerinden paylaşır
+        # Dönem bazlı shard'lı düzen varsa (shards.json) shard'lar paralel taranır
+        retriever_class = ShardedRetriever if ShardedRetriever.exists(self.index_dir) else FAISSRetriever
+        self.retriever = retriever_class(
+            index_path=self.index_dir,
+            dimension=self.embedding_model.get_sentence_embedding_dimension(),
+            use_mmap=True
+        )
+        self.startup_timings.update(self.retriever.load_timings)
+        phase_start = time.perf_counter()
         
         # Gemini API yapılandır
         api_key = os.getenv("GOOGLE_API_KEY")
@@ -100,10 +265,83 @@ class RAGSystem:
             self.model = genai.GenerativeModel('gemini-2.0-flash')
         except Exception:
             self.model = genai.GenerativeModel('gemini-2.5-flash')
+        self.startup_timings["llm_setup_ms"] = (time.perf_counter() - phase_start) * 1000
+
+        # Opsiyonel re-ranking: FAISS'ten fazla aday çekilir, cross-encoder ile en iyileri seçilir
+        if use_reranker is None:
+            use_reranker = os.getenv("USE_RERANKER", "0") == "1"
+        self.fetch_k = fetch_k
+        self.reranker = None
+        if use_reranker:
+            self.reranker = CrossEncoderReranker(os.getenv("RERANKER_MODEL", DEFAULT_RERANKER_MODEL))
+
+        # Opsiyonel MMR: örtüşen komşu chunk'ların aynı prompt'a tekrar girmesini önler
+        if mmr_lambda is None and os.getenv("MMR_LAMBDA"):
+            mmr_lambda = float(os.getenv("MMR_LAMBDA"))
+        self.mmr_lambda = mmr_lambda
+
+        # Range modu: chunk sayısı sabit top_k yerine benzerlik eşiğine göre belirlenir
+        self.retrieval_mode = retrieval_mode or os.getenv("RETRIEVAL_MODE", "topk")
+        if self.retrieval_mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Bilinmeyen retrieval modu: {self.retrieval_mode} (seçenekler: {', '.join(RETRIEVAL_MODES)})")
+        self.range_max_k = range_max_k
+        self.range_min_k = range_min_k
+
+        # Aynı prompt (soru + chunk'lar + şablon) için Gemini bir kez çağrılır
+        if response_cache_path is None:
+            response_cache_path = cache_path_from_env("RESPONSE_CACHE_PATH", DEFAULT_RESPONSE_CACHE_PATH)
+        self.response_cache = None
+        if response_cache_path:
+            self.response_cache = open_persistent_cache(ResponseCache, response_cache_path, "Yanıt önbelleği")
+        if response_cache_path != "" and self.response_cache is None:
+            self.response_cache = ResponseCache(IN_MEMORY_SQLITE)
+
+        # Opsiyonel semantik önbellek: benzer soru + aynı chunk'lar -> önceki yanıt (Gemini çağrılmaz)
+        if semantic_cache_threshold is None and os.getenv("SEMANTIC_CACHE_THRESHOLD"):
+            semantic_cache_threshold = float(os.getenv("SEMANTIC_CACHE_THRESHOLD"))
+        self.semantic_cache = None
+        if semantic_cache_threshold is not None:
+            self.semantic_cache = SemanticCache(
+                dimension=self.embedding_model.get_sentence_embedding_dimension(),
+                threshold=semantic_cache_threshold,
+                ttl_seconds=float(os.getenv("SEMANTIC_CACHE_TTL", DEFAULT_TTL_SECONDS))
+            )
+
+        # Opsiyonel micro-batching: RAGSystem tüm Streamlit oturumlarınca paylaşıldığından
+        # aynı anda gelen tekil sorgular birkaç ms toplanıp tek encode + tek FAISS aramasıyla işlenir
+        if micro_batch_wait_ms is None:
+            micro_batch_wait_ms = float(os.getenv("MICRO_BATCH_WAIT_MS", "0"))
+        if micro_batch_max is None:
+            micro_batch_max = int(os.getenv("MICRO_BATCH_MAX", DEFAULT_MAX_BATCH_SIZE))
+        self.encode_batcher = None
+        self.search_batcher = None
+        if micro_batch_wait_ms > 0:
+            # Önbellek kontrolü _encode'da yapılır; batcher'a sadece ıskalar gelir
+            self.encode_batcher = MicroBatcher(lambda queries: list(self.embedding_model.encode(queries)),
+                                               max_batch_size=micro_batch_max,
+                                               max_wait_ms=micro_batch_wait_ms, name="encode-batcher")
+            self.search_batcher = MicroBatcher(self._search_grouped,
+                                               max_batch_size=micro_batch_max,
+                                               max_wait_ms=micro_batch_wait_ms, name="search-batcher")
         
-        print(f"✅ Tarih RAG sistemi hazır (Toplam chunk: {len(self.chunks)})\n")
+        self.startup_timings["total_ms"] = IMPORT_MS + (time.perf_counter() - startup_start) * 1000
+        print(f"✅ Tarih RAG sistemi hazır (Toplam chunk: {len(self.chunks)})")
+        self.print_startup_report()
+        print()
+
+    def print_startup_report(self):
+        """Soğuk başlangıç aşamalarının sürelerini yazdır (başlangıç gerilemelerini izlemek için)"""
+        parts = [f"{label} {self.startup_timings[key]:.0f} ms"
+                 for key, label in STARTUP_PHASES if key in self.startup_timings]
+        print(f"⏱️  Başlangıç: {' | '.join(parts)} | toplam {self.startup_timings['total_ms']:.0f} ms")
 
-    def retrieve(self, query: str, top_k: int = 5, threshold: float = 0.3) -> List[Dict]:
+    @property
+    def chunks(self):
+        """Retriever'ın sahip olduğu chunk deposu (ayrı bir kopya tutulmaz)"""
+        return self.retriever.chunk_list
+
+    def retrieve(self, query: str, top_k: int = 5, threshold: float = 0.3,
+                 filters: Dict = None) -> List[Dict]:
         """
         Sorgu için en alakalı chunk'ları bulur
         
@@ -111,47 +349,232 @@ class RAGSystem:
             query: Kullanıcı sorusu
             top_k: Döndürülecek chunk sayısı
             threshold: Minimum benzerlik skoru (0-1 arası)
+            filters: Metadata filtreleri (opsiyonel). Desteklenen alanlar:
+                     donem, kategori_ana, kaynak_turu (değer veya değer listesi)
+                     ve yil ((başlangıç, bitiş) aralığı), örn:
+                     {"donem": "Millî Mücadele Dönemi", "yil": (1919, 1923)}
             
         Returns:
             Alakalı chunk'ların listesi
         """
-        # Sorgu için embedding oluştur
-        query_embedding = self.embedding_model.encode([query])[0]
+        return self.retrieve_many([query], top_k=top_k, threshold=threshold, filters=filters)[0]
+    
+    def retrieve_many(self, queries: List[str], top_k: int = 5, threshold: float = 0.3,
+                      batch_size: int = 64, filters: Dict = None) -> List[List[Dict]]:
+        """
+        Birden fazla sorgu için alakalı chunk'ları toplu olarak bulur.
+        Tüm sorgular tek bir encode ve tek bir FAISS araması ile işlenir.
         
-        # FAISS ile arama yap
-        similarities, indices = self.retriever.search(query_embedding, top_k)
-
-        # Sonuçları hazırla
-        results = []
-        for similarity_score, idx in zip(similarities, indices):
-            # Gelen değer zaten benzerlik skoru!
-            # similarity = 1 / (1 + dist) <-- BU SATIRI SİLİN
+        Args:
+            queries: Kullanıcı soruları
+            top_k: Her sorgu için döndürülecek chunk sayısı (range modunda
+                   yerine range_max_k üst sınır olarak kullanılır)
+            threshold: Minimum benzerlik skoru (0-1 arası)
+            batch_size: Embedding modeli için batch boyutu
+            filters: Metadata filtreleri (opsiyonel), tüm sorgulara uygulanır
             
-            if similarity_score >= threshold:
-                # data_processing.py'nin kaydettiği formatı kullan
-                # (self.chunks[idx] zaten hem 'content' hem 'metadata' içerir)
-                chunk_data = self.chunks[idx].copy() 
-                chunk_data['similarity_score'] = float(similarity_score)
-                # distance'ı (1-sim) olarak hesaplayabilirsiniz (opsiyonel)
-                chunk_data['distance'] = float(1 - similarity_score) 
-                results.append(chunk_data)
+        Returns:
+            Her sorgu için alakalı chunk'ların listesi
+        """
+        all_results, self.last_timings, _ = self._retrieve_many(queries, top_k=top_k, threshold=threshold,
+                                                                batch_size=batch_size, filters=filters)
+        return all_results
+
+    def _retrieve_many(self, queries: List[str], top_k: int = 5, threshold: float = 0.3,
+                       batch_size: int = 64,
+                       filters: Dict = None) -> Tuple[List[List[Dict]], Dict[str, float], Optional[np.ndarray]]:
+        """
+        retrieve_many'nin paylaşılan durum değiştirmeyen hali (eşzamanlı aquery çağrıları için)
+
+        Returns:
+            (sonuçlar, süreler, sorgu embedding'leri) tuple'ı; embedding'ler semantik
+            önbellek aramasında tekrar encode etmeden kullanılır
+        """
+        if not queries:
+            return [], {}, None
+
+        start = time.perf_counter()
+        
+        # Önbellekte olmayan sorgular için embedding'leri tek seferde oluştur
+        query_embeddings = self._encode(queries, batch_size=batch_size)
+
+        range_mode = self.retrieval_mode == "range"
+        if range_mode:
+            top_k = self.range_max_k
+
+        # Re-ranking / MMR açıksa seçim yapılabilmesi için fazladan aday çek
+        diversify = self.mmr_lambda is not None
+        fetch_k = max(top_k, self.fetch_k) if (self.reranker or diversify) else top_k
         
+        # FAISS ile toplu arama yap; eşik kontrolü retriever içinde vektörel olarak yapılır
+        # (range modunda FAISS range search + en az range_min_k sonuç)
+        all_results = self._search(query_embeddings, top_k=fetch_k, threshold=threshold,
+                                   filters=filters, min_k=self.range_min_k if range_mode else None)
+
+        # Her sorgu için prompt'a girecek chunk sayısı (range modunda eşiği geçenler, en fazla top_k)
+        adaptive_k = [min(len(results), top_k) for results in all_results]
+        
+        # Retriever sonuçları zaten hem 'content' hem 'metadata' içerir
+        for results in all_results:
+            for chunk_data in results:
+                chunk_data['similarity_score'] = chunk_data['similarity']
+
+        timings = {"retrieval_ms": (time.perf_counter() - start) * 1000}
+
+        # Tüm sorguların (soru, chunk) çiftleri tek forward pass'te skorlanır
+        # (MMR açıksa tüm adaylar sıralı tutulur, seçimi MMR yapar)
+        if self.reranker:
+            start = time.perf_counter()
+            all_results = self.reranker.rerank_many(queries, all_results,
+                                                    top_k=fetch_k if diversify else top_k)
+            timings["rerank_ms"] = (time.perf_counter() - start) * 1000
+
+        if diversify:
+            start = time.perf_counter()
+            all_results = [self.diversify(results, k) for results, k in zip(all_results, adaptive_k)]
+            timings["mmr_ms"] = (time.perf_counter() - start) * 1000
+        else:
+            all_results = [results[:k] for results, k in zip(all_results, adaptive_k)]
+        
+        return all_results, timings, query_embeddings
+
+    async def aretrieve(self, query: str, top_k: int = 5, threshold: float = 0.3,
+                        filters: Dict = None) -> List[Dict]:
+        """
+        retrieve'ın async hali: CPU-yoğun encode ve FAISS araması executor'da çalışır,
+        event loop bloklanmaz
+
+        Args:
+            query: Kullanıcı sorusu
+            top_k: Döndürülecek chunk sayısı
+            threshold: Minimum benzerlik skoru (0-1 arası)
+            filters: Metadata filtreleri (opsiyonel)
+
+        Returns:
+            Alakalı chunk'ların listesi
+        """
+        loop = asyncio.get_running_loop()
+        all_results, _, _ = await loop.run_in_executor(None, functools.partial(
+            self._retrieve_many, [query], top_k=top_k, threshold=threshold, filters=filters
+        ))
+        return all_results[0]
+
+    def embed_queries(self, queries: List[str], batch_size: int = 64) -> np.ndarray:
+        """
+        Sorguların embedding'lerini döndür (önbellekte olmayanlar tek batch'te encode edilir)
+
+        Args:
+            queries: Sorgu metinleri
+            batch_size: Embedding modeli için batch boyutu
+
+        Returns:
+            (len(queries) x dimension) embedding matrisi
+        """
+        return self.embedding_cache.encode(
+            queries, lambda texts: self.embedding_model.encode(texts, batch_size=batch_size)
+        )
+
+    def _encode(self, queries: List[str], batch_size: int = 64) -> np.ndarray:
+        """
+        Sorguları embedding önbelleğinden al; tekil sorgu önbellekte yoksa (açıksa) encode
+        micro-batcher'ı üzerinden encode edilir. Önbellek isabetleri batch penceresini beklemez.
+        """
+        if self.encode_batcher is None or len(queries) != 1:
+            return self.embed_queries(queries, batch_size=batch_size)
+        return self.embedding_cache.encode(
+            queries, lambda texts: np.vstack([self.encode_batcher(text) for text in texts])
+        )
+
+    def _search(self, query_embeddings: np.ndarray, top_k: int, threshold: float,
+                filters: Dict = None, min_k: int = None) -> List[List[Dict]]:
+        """Tekil sorguyu (açıksa) arama micro-batcher'ı üzerinden, diğerlerini doğrudan ara"""
+        if self.search_batcher is None or len(query_embeddings) != 1:
+            return self.retriever.retrieve_batch(query_embeddings, top_k=top_k, threshold=threshold,
+                                                 filters=filters, min_k=min_k)
+        return [self.search_batcher((query_embeddings[0], top_k, threshold, filters, min_k))]
+
+    def _search_grouped(self, requests: List[Tuple]) -> List[List[Dict]]:
+        """
+        Micro-batch'teki aramaları aynı parametreli gruplar halinde tek retrieve_batch ile yap
+
+        Args:
+            requests: (embedding, top_k, threshold, filters, min_k) tuple'ları
+
+        Returns:
+            Her istek için sonuç listesi (istek sırasıyla)
+        """
+        groups: Dict[Tuple, List[int]] = {}
+        for i, (_, top_k, threshold, filters, min_k) in enumerate(requests):
+            filters_key = repr(sorted(filters.items())) if filters else None
+            groups.setdefault((top_k, threshold, filters_key, min_k), []).append(i)
+
+        results: List[Optional[List[Dict]]] = [None] * len(requests)
+        for positions in groups.values():
+            _, top_k, threshold, filters, min_k = requests[positions[0]]
+            embeddings = np.vstack([requests[i][0] for i in positions])
+            group_results = self.retriever.retrieve_batch(embeddings, top_k=top_k, threshold=threshold,
+                                                          filters=filters, min_k=min_k)
+            for i, chunk_results in zip(positions, group_results):
+                results[i] = chunk_results
         return results
+
+    def get_cache_stats(self) -> Dict:
+        """
+        Önbelleklerin isabet / ıska istatistiklerini döndür
+
+        Returns:
+            Önbellek adı -> istatistik dictionary
+        """
+        stats = {"embedding_cache": self.embedding_cache.get_stats()}
+        if self.response_cache:
+            stats["response_cache"] = self.response_cache.get_stats()
+        if self.reranker:
+            stats["reranker"] = self.reranker.get_stats()
+        if self.semantic_cache:
+            stats["semantic_cache"] = self.semantic_cache.get_stats()
+        if self.encode_batcher:
+            stats["encode_batcher"] = self.encode_batcher.get_stats()
+            stats["search_batcher"] = self.search_batcher.get_stats()
+        return stats
+
+    def diversify(self, candidates: List[Dict], top_k: int) -> List[Dict]:
+        """
+        Adaylar arasından MMR ile birbirine benzemeyen top_k chunk seç.
+        Aday vektörleri index'ten (veya diskteki embedding matrisinden) alınır.
+
+        Args:
+            candidates: Alakaya göre sıralı aday chunk'lar
+            top_k: Seçilecek chunk sayısı
+
+        Returns:
+            Seçilen chunk'lar (seçim sırasına göre)
+        """
+        if len(candidates) <= 1:
+            return candidates[:top_k]
+
+        vectors = self.retriever.get_vectors(np.array([chunk['index'] for chunk in candidates]))
+        if vectors is None:
+            # Vektörler geri elde edilemiyorsa (örn. embedding'siz IVF) sıralama korunur
+            return candidates[:top_k]
+
+        # Re-ranking yapıldıysa alaka olarak cross-encoder skoru kullanılır
+        relevance = np.array([chunk.get('rerank_score', chunk['similarity']) for chunk in candidates],
+                             dtype='float32')
+        selected = mmr_select(vectors, relevance, top_k, lambda_mult=self.mmr_lambda)
+        return [candidates[i] for i in selected]
     
-    def generate_response(self, query: str, context_chunks: List[Dict]) -> str:
+    def build_prompt(self, query: str, context_chunks: List[Dict]) -> str:
         """
-        Context chunk'larını kullanarak yanıt üretir
+        Soru ve context chunk'larından Gemini prompt'unu oluşturur
+        (şablon değişirse PROMPT_TEMPLATE_VERSION artırılmalıdır)
         
         Args:
             query: Kullanıcı sorusu
             context_chunks: Alakalı chunk'lar
             
         Returns:
-            Üretilen yanıt
+            Prompt metni
         """
-        if not context_chunks:
-            return "Üzgünüm, bu konu hakkında bilgim bulunmuyor. Lütfen farklı bir soru sorun veya sorunuzu daha spesifik hale getirin."
-        
         # Context'i hazırla (tarihsel metadata dahil)
         context_parts = []
         for i, chunk in enumerate(context_chunks, 1):
@@ -191,21 +614,171 @@ class RAGSystem:
 
             YANIT:
         """
+        return prompt
+
+    def _prepare_generation(self, query: str, context_chunks: List[Dict]) -> Dict:
+        """Prompt'u oluştur ve yanıt önbelleğine bak (sync / async üretimin ortak adımı)"""
+        prompt = self.build_prompt(query, context_chunks)
+        generation = {"prompt": prompt, "cache_key": None, "index_version": None,
+                      "response": None, "cached": False, "error": None}
+
+        # Tamamen aynı prompt daha önce yanıtlandıysa Gemini çağrılmaz
+        if self.response_cache:
+            chunk_ids = [chunk.get('index', -1) for chunk in context_chunks]
+            generation["cache_key"] = prompt_key(prompt, chunk_ids, PROMPT_TEMPLATE_VERSION,
+                                                 getattr(self.model, 'model_name', ''))
+            generation["index_version"] = self.retriever.index_version
+            cached = self.response_cache.get(generation["cache_key"], generation["index_version"])
+            if cached is not None:
+                generation.update(response=cached, cached=True)
+
+        return generation
+
+    def _finish_generation(self, generation: Dict, response_text: str = None, error: Exception = None) -> Dict:
+        """Gemini sonucunu (veya hatasını) kaydet; başarılı yanıtlar önbelleğe yazılır"""
+        if error is not None:
+            generation.update(response=f"Yanıt üretilirken bir hata oluştu: {str(error)}", error=str(error))
+            return generation
+
+        generation["response"] = response_text
+        if generation["cache_key"] is not None:
+            self.response_cache.put(generation["cache_key"], response_text, generation["index_version"])
+        return generation
+
+    def _generate(self, query: str, context_chunks: List[Dict]) -> Dict:
+        """generate_response'un önbellek / hata bilgisini de döndüren hali"""
+        if not context_chunks:
+            return {"response": NO_CONTEXT_RESPONSE, "cached": False, "error": None}
+
+        generation = self._prepare_generation(query, context_chunks)
+        if generation["cached"]:
+            return generation
         
         try:
             # Gemini ile yanıt üret
-            response = self.model.generate_content(prompt)
-            return response.text
+            response = self.model.generate_content(generation["prompt"])
+            return self._finish_generation(generation, response.text)
         except Exception as e:
-            return f"Yanıt üretilirken bir hata oluştu: {str(e)}"
+            return self._finish_generation(generation, error=e)
+
+    async def _agenerate(self, query: str, context_chunks: List[Dict]) -> Dict:
+        """
+        _generate'in async Gemini istemcisi kullanan hali. Yanıt önbelleği okuma / yazma
+        (SQLite) executor'da yapılır, event loop bloklanmaz.
+        """
+        if not context_chunks:
+            return {"response": NO_CONTEXT_RESPONSE, "cached": False, "error": None}
+
+        loop = asyncio.get_running_loop()
+        generation = await loop.run_in_executor(None, self._prepare_generation, query, context_chunks)
+        if generation["cached"]:
+            return generation
+
+        try:
+            response = await self.model.generate_content_async(generation["prompt"])
+        except Exception as e:
+            return self._finish_generation(generation, error=e)
+        return await loop.run_in_executor(None, self._finish_generation, generation, response.text)
+
+    def generate_response(self, query: str, context_chunks: List[Dict]) -> str:
+        """
+        Context chunk'larını kullanarak yanıt üretir
+        
+        Args:
+            query: Kullanıcı sorusu
+            context_chunks: Alakalı chunk'lar
+            
+        Returns:
+            Üretilen yanıt
+        """
+        return self._generate(query, context_chunks)["response"]
+
+    async def agenerate(self, query: str, context_chunks: List[Dict]) -> str:
+        """
+        generate_response'un async hali: Gemini çağrısı beklenirken event loop
+        diğer konuşmalara hizmet verebilir
+
+        Args:
+            query: Kullanıcı sorusu
+            context_chunks: Alakalı chunk'lar
+
+        Returns:
+            Üretilen yanıt
+        """
+        return (await self._agenerate(query, context_chunks))["response"]
+
+    def _semantic_lookup(self, user_question: str, retrieved_chunks: List[Dict], timings: Dict,
+                         query_embedding: np.ndarray) -> Tuple[Optional[Dict], Optional[np.ndarray], Optional[str]]:
+        """
+        Semantik önbelleğe bak
+
+        Args:
+            user_question: Kullanıcı sorusu
+            retrieved_chunks: Retrieve edilen chunk'lar
+            timings: Retrieve süreleri (önbellekten dönen sonuca eklenir)
+            query_embedding: Retrieve sırasında hesaplanan sorgu embedding'i
+                             (tekrar encode edilmez, embedding önbelleği istatistikleri şişmez)
+
+        Returns:
+            (önbellekten sonuç veya None, sorgu embedding'i, index sürümü)
+        """
+        if not (self.semantic_cache and retrieved_chunks):
+            return None, None, None
+
+        index_version = self.retriever.index_version
+        chunk_ids = [chunk['index'] for chunk in retrieved_chunks]
+        cached = self.semantic_cache.lookup(query_embedding, chunk_ids, index_version)
+        if cached is None:
+            return None, query_embedding, index_version
+
+        print(f"⚡ Önbellekten yanıtlandı (benzer soru: {cached['query']})\n")
+        result = dict(cached["result"], query=user_question, timings=timings,
+                      cache={"type": "semantic", "query": cached["query"],
+                             "similarity": cached["similarity"]})
+        return result, query_embedding, index_version
+
+    def _build_query_result(self, user_question: str, retrieved_chunks: List[Dict], generation: Dict,
+                            timings: Dict, query_embedding: Optional[np.ndarray],
+                            index_version: Optional[str]) -> Dict:
+        """query / aquery sonucunu hazırla ve (hatasızsa) semantik önbelleğe ekle"""
+        # adaptive_k: prompt'a giren chunk sayısı, range modunda soruya göre değişir
+        result = {
+            "query": user_question,
+            "response": generation["response"],
+            "sources": [
+                {
+                    "content": chunk['content'][:200] + "...",
+                    "donem": chunk['metadata'].get('donem', 'Bilinmiyor'),
+                    "yil": chunk['metadata'].get('yil', ''),
+                    "kaynak": chunk['metadata'].get('kaynak', 'Bilinmiyor'),
+                    "similarity": chunk['similarity_score'],  # ← 'similarity' yerine 'similarity_score'
+                    "rerank_score": chunk.get('rerank_score')
+                }
+                for chunk in retrieved_chunks
+            ],
+            "num_sources": len(retrieved_chunks),
+            "retrieval_mode": self.retrieval_mode,
+            "adaptive_k": len(retrieved_chunks),
+            "timings": timings
+        }
+        if generation["cached"]:
+            result["cache"] = {"type": "exact"}
+
+        # Hatalı yanıtlar önbelleğe alınmaz
+        if query_embedding is not None and generation["error"] is None:
+            chunk_ids = [chunk['index'] for chunk in retrieved_chunks]
+            self.semantic_cache.store(query_embedding, user_question, result, chunk_ids, index_version)
+
+        return result
     
-    def query(self, user_question: str, top_k: int = 5) -> Dict:
+    def query(self, user_question: str, top_k: int = 5, filters: Dict = None) -> Dict:
         """
         Tam RAG pipeline: Retrieve + Generate
         
         Args:
             user_question: Kullanıcı sorusu
             top_k: Aranacak chunk sayısı
+            filters: Metadata filtreleri (opsiyonel), örn: {"donem": "Osmanlı Devleti"}
             
         Returns:
             Yanıt ve metadata içeren dictionary
@@ -214,33 +787,128 @@ class RAGSystem:
         
         # 1. Retrieve
         print("🔍 İlgili tarihsel bilgiler aranıyor...")
-        retrieved_chunks = self.retrieve(user_question, top_k=top_k)
+        all_results, timings, query_embeddings = self._retrieve_many([user_question], top_k=top_k,
+                                                                     filters=filters)
+        retrieved_chunks = all_results[0]
         
         print(f"✅ {len(retrieved_chunks)} alakalı kayıt bulundu")
+
+        # Benzer bir soru aynı chunk'larla yanıtlandıysa Gemini çağrılmaz
+        cached, query_embedding, index_version = self._semantic_lookup(user_question, retrieved_chunks, timings,
+                                                                        query_embeddings[0])
+        if cached is not None:
+            return cached
         
         # 2. Generate
         print("🤖 Yanıt oluşturuluyor...")
-        response = self.generate_response(user_question, retrieved_chunks)
+        start = time.perf_counter()
+        generation = self._generate(user_question, retrieved_chunks)
+        timings["generation_ms"] = (time.perf_counter() - start) * 1000
         
         print("✅ Yanıt hazır\n")
         
-        # Sonuçları döndür
-        return {
-            "query": user_question,
-            "response": response,
-            "sources": [
-                {
-                    "content": chunk['content'][:200] + "...",
-                    "donem": chunk['metadata'].get('donem', 'Bilinmiyor'),
-                    "yil": chunk['metadata'].get('yil', ''),
-                    "kaynak": chunk['metadata'].get('kaynak', 'Bilinmiyor'),
-                    "similarity": chunk['similarity_score']  # ← 'similarity' yerine 'similarity_score'
-                }
-                for chunk in retrieved_chunks
-            ],
-            "num_sources": len(retrieved_chunks)
-        }
+        return self._build_query_result(user_question, retrieved_chunks, generation, timings,
+                                        query_embedding, index_version)
+
+    async def aquery(self, user_question: str, top_k: int = 5, filters: Dict = None) -> Dict:
+        """
+        Tam RAG pipeline'ının async hali. Encode, FAISS araması ve önbellek erişimleri
+        (semantik arama, SQLite okuma / yazma) executor'da, Gemini çağrısı async
+        istemciyle yapılır; tek süreç birçok eşzamanlı konuşmaya hizmet verir.
+        
+        Args:
+            user_question: Kullanıcı sorusu
+            top_k: Aranacak chunk sayısı
+            filters: Metadata filtreleri (opsiyonel)
+            
+        Returns:
+            query ile aynı biçimde yanıt ve metadata içeren dictionary
+        """
+        loop = asyncio.get_running_loop()
+        all_results, timings, query_embeddings = await loop.run_in_executor(None, functools.partial(
+            self._retrieve_many, [user_question], top_k=top_k, filters=filters
+        ))
+        retrieved_chunks = all_results[0]
+
+        cached, query_embedding, index_version = await loop.run_in_executor(None, functools.partial(
+            self._semantic_lookup, user_question, retrieved_chunks, timings, query_embeddings[0]
+        ))
+        if cached is not None:
+            return cached
+
+        start = time.perf_counter()
+        generation = await self._agenerate(user_question, retrieved_chunks)
+        timings["generation_ms"] = (time.perf_counter() - start) * 1000
+
+        # Semantik önbelleğe ekleme de executor'da yapılır
+        return await loop.run_in_executor(None, functools.partial(
+            self._build_query_result, user_question, retrieved_chunks, generation, timings,
+            query_embedding, index_version
+        ))
+
+    def query_stream(self, user_question: str, top_k: int = 5, filters: Dict = None) -> Iterator[Dict]:
+        """
+        Tam RAG pipeline'ının akış (streaming) hali: Gemini'nin ürettiği metin parçaları
+        geldikçe döndürülür, böylece kullanıcı ilk token'ı tüm yanıtı beklemeden görür.
+        UI dışındaki çağıranlar da kullanabilir:
+
+            for event in rag.query_stream(soru):
+                if event["type"] == "delta":
+                    print(event["text"], end="")
+                elif event["type"] == "error":
+                    print(f"\n[Yanıt yarıda kesildi: {event['message']}]")
+                else:
+                    sonuc = event["result"]
+
+        Args:
+            user_question: Kullanıcı sorusu
+            top_k: Aranacak chunk sayısı
+            filters: Metadata filtreleri (opsiyonel)
+
+        Yields:
+            {"type": "delta", "text": ...} metin parçaları; Gemini akış sırasında hata
+            verirse bir kez {"type": "error", "message": ..., "partial": ...} (o ana kadar
+            gelen metin, yanıtın devamı değildir); en sonda bir kez
+            {"type": "done", "result": ...} (query ile aynı biçimde, kaynaklar dahil)
+        """
+        all_results, timings, query_embeddings = self._retrieve_many([user_question], top_k=top_k,
+                                                                     filters=filters)
+        retrieved_chunks = all_results[0]
+
+        cached, query_embedding, index_version = self._semantic_lookup(user_question, retrieved_chunks, timings,
+                                                                        query_embeddings[0])
+        if cached is not None:
+            yield {"type": "delta", "text": cached["response"]}
+            yield {"type": "done", "result": cached}
+            return
+
+        start = time.perf_counter()
+        if not retrieved_chunks:
+            generation = {"response": NO_CONTEXT_RESPONSE, "cached": False, "error": None}
+            yield {"type": "delta", "text": generation["response"]}
+        else:
+            generation = self._prepare_generation(user_question, retrieved_chunks)
+            if generation["cached"]:
+                yield {"type": "delta", "text": generation["response"]}
+            else:
+                parts = []
+                try:
+                    for chunk in self.model.generate_content(generation["prompt"], stream=True):
+                        if not chunk.text:
+                            continue
+                        if not parts:
+                            timings["first_token_ms"] = (time.perf_counter() - start) * 1000
+                        parts.append(chunk.text)
+                        yield {"type": "delta", "text": chunk.text}
+                    generation = self._finish_generation(generation, "".join(parts))
+                except Exception as e:
+                    # Hata mesajı yanıt metnine eklenmez; ayrı olay olarak bildirilir
+                    generation = self._finish_generation(generation, error=e)
+                    yield {"type": "error", "message": generation["response"], "partial": "".join(parts)}
+        timings["generation_ms"] = (time.perf_counter() - start) * 1000
 
+        yield {"type": "done", "result": self._build_query_result(user_question, retrieved_chunks, generation,
+                                                                  timings, query_embedding, index_version)}
 
 def main():
     """Test fonksiyonu"""
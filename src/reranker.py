@@ -0,0 +1,178 @@
+"""
+Re-ranking Modülü
+Bi-encoder (FAISS) adaylarını bir cross-encoder ile yeniden sıralar
+
+Cross-encoder soru ve chunk'ı birlikte okuduğu için bi-encoder'dan daha isabetli
+skor verir; böylece Gemini'ye daha az ama daha alakalı chunk gönderilir. Bir sorgunun
+tüm (soru, chunk) çiftleri tek bir batch'te skorlanır; skorlar (sorgu hash'i, chunk
+içerik hash'i) anahtarıyla LRU önbellekte tutulur.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+
+# Türkçe dahil çok dilli, CPU'da hızlı küçük cross-encoder
+DEFAULT_RERANKER_MODEL = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"
+DEFAULT_CACHE_SIZE = 10000
+MAX_BATCH_SIZE = 256
+
+
+def query_hash(query: str) -> str:
+    """Sorgu metninin kısa hash'i (önbellek anahtarı için)"""
+    return hashlib.blake2b(query.strip().encode('utf-8'), digest_size=12).hexdigest()
+
+
+def chunk_key(chunk: Dict) -> str:
+    """
+    Chunk'ın önbellek anahtarı: cross-encoder'ın okuduğu metnin hash'i. Satır
+    numaraları index yeniden oluşturulunca, chunk_uid ise kayıt upsert ile
+    güncellendiğinde aynı kalıp içerik değişebildiği için anahtar olarak kullanılmaz.
+    """
+    return hashlib.blake2b(chunk.get('content', '').encode('utf-8'), digest_size=12).hexdigest()
+
+
+class CrossEncoderReranker:
+    """LRU skor önbellekli, batch'li cross-encoder re-ranker"""
+
+    def __init__(self, model_name: str = DEFAULT_RERANKER_MODEL,
+                 cache_size: int = DEFAULT_CACHE_SIZE,
+                 max_length: int = 512):
+        """
+        Args:
+            model_name: Hugging Face cross-encoder modeli
+            cache_size: Önbellekte tutulacak maksimum (sorgu, chunk) skoru
+            max_length: Çift başına maksimum token sayısı
+        """
+        self.model_name = model_name
+        self.cache_size = cache_size
+        self.max_length = max_length
+        self._model = None
+
+        self._cache: "OrderedDict[Tuple, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.last_rerank_ms = 0.0
+
+    @property
+    def model(self):
+        """Cross-encoder modeli (ilk kullanımda yüklenir)"""
+        if self._model is None:
+            from sentence_transformers import CrossEncoder
+
+            print(f"🔄 Cross-encoder yükleniyor... (Hugging Face: {self.model_name})")
+            self._model = CrossEncoder(self.model_name, max_length=self.max_length, device="cpu")
+        return self._model
+
+    def score_pairs(self, pairs: List[Tuple[str, Dict]]) -> np.ndarray:
+        """
+        (sorgu, chunk) çiftlerini skorla; önbellekte olmayanlar tek batch'te hesaplanır
+
+        Args:
+            pairs: (sorgu metni, chunk) çiftleri
+
+        Returns:
+            Her çift için cross-encoder skoru
+        """
+        keys = [(query_hash(query), chunk_key(chunk)) for query, chunk in pairs]
+        scores = np.empty(len(pairs), dtype='float32')
+
+        missing = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                cached = self._cache.get(key)
+                if cached is None:
+                    missing.append(i)
+                else:
+                    self._cache.move_to_end(key)
+                    scores[i] = cached
+            self.hits += len(pairs) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            texts = [(pairs[i][0], pairs[i][1].get('content', '')) for i in missing]
+            predicted = np.asarray(
+                self.model.predict(texts, batch_size=min(len(texts), MAX_BATCH_SIZE), show_progress_bar=False),
+                dtype='float32'
+            )
+            scores[missing] = predicted
+
+            with self._lock:
+                for i, score in zip(missing, predicted.tolist()):
+                    self._cache[keys[i]] = score
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        return scores
+
+    def rerank(self, query: str, candidates: List[Dict], top_k: int = 5) -> List[Dict]:
+        """
+        Tek sorgunun adaylarını yeniden sırala
+
+        Args:
+            query: Kullanıcı sorusu
+            candidates: Retriever'dan gelen aday chunk'lar
+            top_k: Döndürülecek chunk sayısı
+
+        Returns:
+            rerank_score'a göre azalan ilk top_k chunk
+        """
+        return self.rerank_many([query], [candidates], top_k)[0]
+
+    def rerank_many(self, queries: List[str], candidate_lists: List[List[Dict]],
+                    top_k: int = 5) -> List[List[Dict]]:
+        """
+        Birden fazla sorgunun adaylarını tek bir cross-encoder batch'i ile yeniden sırala
+
+        Args:
+            queries: Kullanıcı soruları
+            candidate_lists: Her sorgu için aday chunk'lar
+            top_k: Her sorgu için döndürülecek chunk sayısı
+
+        Returns:
+            Her sorgu için yeniden sıralanmış ilk top_k chunk
+        """
+        start = time.perf_counter()
+
+        pairs = [(query, chunk) for query, candidates in zip(queries, candidate_lists) for chunk in candidates]
+        scores = self.score_pairs(pairs) if pairs else np.empty(0, dtype='float32')
+
+        all_results = []
+        offset = 0
+        for candidates in candidate_lists:
+            candidate_scores = scores[offset:offset + len(candidates)]
+            offset += len(candidates)
+
+            order = np.argsort(-candidate_scores, kind='stable')[:top_k]
+            results = []
+            for i in order:
+                chunk = candidates[i]
+                chunk['rerank_score'] = float(candidate_scores[i])
+                results.append(chunk)
+            all_results.append(results)
+
+        self.last_rerank_ms = (time.perf_counter() - start) * 1000
+        return all_results
+
+    def get_stats(self) -> Dict:
+        """
+        Önbellek istatistiklerini döndür
+
+        Returns:
+            İstatistik dictionary
+        """
+        total = self.hits + self.misses
+        return {
+            "model": self.model_name,
+            "cache_size": len(self._cache),
+            "cache_hits": self.hits,
+            "cache_misses": self.misses,
+            "cache_hit_rate": self.hits / total if total else 0.0,
+            "last_rerank_ms": self.last_rerank_ms
+        }
@@ -0,0 +1,150 @@
+"""
+Yanıt Önbelleği Modülü
+Aynı prompt için Gemini'yi tekrar çağırmamak için kalıcı (SQLite) yanıt önbelleği
+
+Anahtar, tamamen oluşturulmuş prompt'un (soru + sıralı chunk id'leri + şablon
+sürümü + model adı) hash'idir; böylece aynı istek oturumlar ve yeniden başlatmalar
+arasında LLM'e hiç gitmez. Her kayıt oluşturulduğu index sürümünü taşır; FAISS index'i
+değiştiğinde eski sürümlü kayıtlar otomatik olarak silinir.
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+DEFAULT_MAX_ENTRIES = 5000
+
+
+def prompt_key(prompt: str, chunk_ids: List[int], template_version: str, model_name: str = "") -> str:
+    """
+    Prompt'un önbellek anahtarı
+
+    Args:
+        prompt: Tamamen oluşturulmuş prompt
+        chunk_ids: Prompt'taki chunk'ların id'leri (sıralı)
+        template_version: Prompt şablonu sürümü
+        model_name: LLM model adı
+
+    Returns:
+        Hex anahtar
+    """
+    header = f"{template_version}\n{model_name}\n{','.join(str(int(i)) for i in chunk_ids)}\n"
+    return hashlib.blake2b((header + prompt).encode('utf-8'), digest_size=16).hexdigest()
+
+
+class ResponseCache:
+    """Index sürümüne bağlı, LRU tahliyeli kalıcı yanıt önbelleği"""
+
+    def __init__(self, path: str, max_entries: int = DEFAULT_MAX_ENTRIES):
+        """
+        Args:
+            path: SQLite dosyası (":memory:" ile sadece bellek)
+            max_entries: Maksimum kayıt sayısı (en uzun süre kullanılmayan atılır)
+        """
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.index_version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+
+        if str(path) != ":memory:":
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, index_version TEXT, response TEXT, created REAL, last_used REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses(last_used)")
+        self._db.commit()
+
+    def _check_version(self, index_version: str):
+        """Index sürümü değiştiyse eski sürümlü kayıtları sil (kilit altında çağrılır)"""
+        if self.index_version == index_version:
+            return
+        cursor = self._db.execute("DELETE FROM responses WHERE index_version != ?", (index_version,))
+        self._db.commit()
+        self.invalidated += cursor.rowcount
+        self.index_version = index_version
+
+    def get(self, key: str, index_version: str) -> Optional[str]:
+        """
+        Önbellekteki yanıtı döndür
+
+        Args:
+            key: prompt_key ile üretilmiş anahtar
+            index_version: FAISS index'inin güncel sürümü
+
+        Returns:
+            Yanıt metni veya None
+        """
+        with self._lock:
+            self._check_version(index_version)
+            row = self._db.execute(
+                "SELECT response FROM responses WHERE key = ? AND index_version = ?", (key, index_version)
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, response: str, index_version: str):
+        """
+        Yanıtı önbelleğe yaz
+
+        Args:
+            key: prompt_key ile üretilmiş anahtar
+            response: LLM yanıtı
+            index_version: Yanıtın üretildiği index sürümü
+        """
+        now = time.time()
+        with self._lock:
+            self._check_version(index_version)
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, index_version, response, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, index_version, response, now, now)
+            )
+            # LRU: en uzun süre kullanılmamış kayıtları sil
+            self._db.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self._db.commit()
+
+    def clear(self):
+        """Tüm kayıtları sil"""
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+
+    def get_stats(self) -> Dict:
+        """
+        Önbellek istatistiklerini döndür
+
+        Returns:
+            İstatistik dictionary
+        """
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "path": str(self.path),
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "invalidated": self.invalidated
+        }
@@ -5,76 +5,214 @@ FAISS ile similarity search ve retrieval işlemleri
 
 import faiss
 import numpy as np
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Optional
+import hashlib
 import json
+import os
+import sys
+import threading
+import time
 from pathlib import Path
 
+# src klasörünü path'e ekle
+sys.path.append(str(Path(__file__).parent))
+
+from chunk_store import ChunkStore, stable_chunk_id
+from segments import SegmentManifest
+from keyword_index import BM25Index
+from turkish_text import tokenize, tokenize_query
+from index_builder import (
+    build_index,
+    apply_search_params,
+    index_bytes_per_vector,
+    rescore_candidates,
+    make_search_params,
+    exact_search,
+    merge_topk,
+    range_search,
+    apply_threshold,
+    fill_min_k,
+    DEFAULT_INDEX_FACTORY,
+    DEFAULT_RESCORE_FACTOR
+)
+
+# Bu sayıdan az vektör seçen filtrelerde index yerine seçili vektörlerde tam arama yapılır
+FILTER_EXACT_SEARCH_LIMIT = 4096
+
+# Bu sınırlardan biri aşılınca delta segmentler arka planda ana index'e katılır
+DEFAULT_MAX_DELTA_SEGMENTS = 8
+DEFAULT_MAX_DELTA_VECTORS = 20000
+
 
 class FAISSRetriever:
     """FAISS tabanlı retrieval sınıfı"""
     
-    def __init__(self, index_path: str = "models/faiss_index", dimension: int = 384):
+    def __init__(self, index_path: str = "models/faiss_index", dimension: int = 384, use_mmap: bool = False,
+                 auto_compact: bool = True, load: bool = True):
         """
         Args:
             index_path: FAISS index dizini
             dimension: Embedding vektör boyutu
+            use_mmap: Index'i salt-okunur mmap ile yükle (aynı makinedeki süreçler
+                      page cache'i paylaşır, soğuk sayfalar ihtiyaç oldukça okunur)
+            auto_compact: Delta segmentler büyüyünce arka planda ana index'e kat
+            load: Dizinde index varsa yükle (False: index create_index ile baştan oluşturulacak)
         """
         self.index_path = Path(index_path)
         self.dimension = dimension
+        self.use_mmap = use_mmap
+        self.mmap_loaded = False
         self.index = None
-        self.chunk_list = []
+        self.index_params = {}
+        self.embeddings = None  # Yeniden skorlama için tam float vektörler (mmap)
+        self.chunk_list = ChunkStore.from_records([])
+        self.keyword_index = None  # BM25 ters index (keyword arama için)
+        
+        # Delta segmentler: add_vectors ile eklenen, henüz ana index'e katılmamış vektörler.
+        # Global satır id'leri ana index'in devamıdır (base_count, base_count + 1, ...)
+        self.delta_vectors = np.empty((0, dimension), dtype='float32')
+        self.segments = SegmentManifest.load(self.index_path)
+        self.persisted = False  # Ana index diskteki ile aynı mı (segmentler ancak o zaman yazılır)
+        self.deleted = np.empty(0, dtype='int64')  # Silinmiş (aramalarda maskelenen) global satırlar
+        self._live_mask_cache = None
+        self.auto_compact = auto_compact
+        self.max_delta_segments = DEFAULT_MAX_DELTA_SEGMENTS
+        self.max_delta_vectors = DEFAULT_MAX_DELTA_VECTORS
+        self._lock = threading.RLock()
+        self._compaction_thread = None
+        self._generation = 0  # create_index ile bellekte yeniden oluşturma sayısı (index_version için)
+        self.load_timings: Dict[str, float] = {}  # load_index aşamalarının süreleri (soğuk başlangıç raporu)
         
         # Index varsa yükle
-        if (self.index_path / "index.faiss").exists():
+        if load and (self.index_path / "index.faiss").exists():
             self.load_index()
     
-    def create_index(self, embeddings: np.ndarray, metadata: List[Dict] = None):
+    def create_index(self, embeddings: np.ndarray, metadata: List[Dict] = None,
+                     index_factory: str = DEFAULT_INDEX_FACTORY,
+                     quantization: str = None,
+                     rescore: bool = False,
+                     nprobe: int = None,
+                     ef_search: int = None,
+                     keyword_stemming: bool = False):
         """
         Yeni FAISS index oluştur
         
         Args:
             embeddings: Embedding vektörleri matrisi (n_docs x dimension)
             metadata: Her embedding için metadata listesi
+            index_factory: FAISS index tipi (örn: "Flat", "IVF,Flat", "HNSW32")
+            quantization: Sıkıştırılmış depolama modu (örn: "SQ8", "SQfp16", "PQ")
+            rescore: Üst adayları tam float vektörlerle yeniden skorla
+            nprobe: IVF index'leri için taranacak küme sayısı (None: otomatik)
+            ef_search: HNSW index'leri için arama derinliği (None: otomatik)
+            keyword_stemming: BM25 keyword index'inde Türkçe hafif kök bulma kullan
         """
-        print("🔧 FAISS index oluşturuluyor...")
-        
-        # L2 (Euclidean) distance yerine IndexFlatIP (Inner Product) kullan
-        self.index = faiss.IndexFlatIP(self.dimension)
+        print(f"🔧 FAISS index oluşturuluyor... (factory: {index_factory})")
         
-        # Embeddings'i ekle
-        embeddings = embeddings.astype('float32')
+        # L2 (Euclidean) distance yerine Inner Product kullan
         # Not: data_processing.py'nin vektörleri L2-normalize etmesi GEREKİR
-        self.index.add(embeddings)
+        self.index, self.index_params = build_index(
+            embeddings,
+            factory=index_factory,
+            quantization=quantization,
+            rescore=rescore,
+            nprobe=nprobe,
+            ef_search=ef_search
+        )
+        self.embeddings = embeddings.astype('float32') if self.index_params["rescore"] else None
+        self.delta_vectors = np.empty((0, self.index.d), dtype='float32')
+        # Diskteki eski index'in segmentleri / silme kayıtları yeni index'e ait değildir
+        self.segments = SegmentManifest(self.index_path)
+        self.deleted = np.empty(0, dtype='int64')
+        self._live_mask_cache = None
+        self.persisted = False
+        self.mmap_loaded = False
+        self._generation += 1
         
         print(f"✅ Index oluşturuldu (toplam vektör: {self.index.ntotal})")
         
-        # Metadata'yı sakla
+        # Metadata'yı kompakt chunk deposunda sakla ve keyword index'ini oluştur
         if metadata:
-           self.chunk_list = metadata
+            self.chunk_list = ChunkStore.from_records(metadata)
+            self.keyword_index = BM25Index.from_texts([chunk.get("content", "") for chunk in metadata],
+                                                      stem=keyword_stemming)
     
-    def save_index(self, metadata_list: List[Dict] = None):
+    def save_index(self, metadata_list: List[Dict] = None, export_json: bool = False):
         """
-        Index'i diske kaydet
+        Index'i diske kaydet (delta segmentler ana index'e katılır ve silinir)
         
         Args:
             metadata_list: Kaydedilecek metadata listesi
+            export_json: Chunk deposuna ek olarak eski formatlı metadata.json da yaz
+        """
+        self.wait_for_compaction()
+        
+        with self._lock:
+            self._fold_deltas()
+            segment_names = [segment["name"] for segment in self.segments.segments]
+            self.segments.deleted = self.deleted.tolist()
+            
+            store = None
+            if metadata_list or self.chunk_list:
+                store = ChunkStore.from_records(metadata_list) if metadata_list else self.chunk_list
+            
+            # mmap ile açılmış (değişmemiş) index zaten diskteki dosyanın kendisidir
+            self._write_base(None if self.mmap_loaded else self.index, self.embeddings, store,
+                             self.keyword_index, export_json=export_json)
+            self.segments.drop_segments(segment_names)
+            self.segments.purge_orphans()
+            self.persisted = True
+            self._generation = 0  # Diskteki index artık bellektekiyle aynı
+    
+    def _write_base(self, index: Optional[faiss.Index], embeddings: Optional[np.ndarray],
+                    store: Optional[ChunkStore], keyword_index: Optional[BM25Index],
+                    export_json: bool = False):
+        """
+        Ana index'i ve yan dosyalarını diske yaz. index.faiss en son yazılır: diğer
+        bileşenler her zaman index'in satırlarını (ve fazlasını) içerir, eksik kalan
+        satırlar yüklemede delta segmentlerden tamamlanır.
         """
         self.index_path.mkdir(parents=True, exist_ok=True)
         
-        # FAISS index'i kaydet
-        index_file = self.index_path / "index.faiss"
-        faiss.write_index(self.index, str(index_file))
-        print(f"💾 FAISS index kaydedildi: {index_file}")
+        # Yeniden skorlama için tam float vektörleri kaydet (mmap ile açık dosyanın üzerine yazmamak için önce geçici dosyaya)
+        if embeddings is not None:
+            tmp_file = self.index_path / "embeddings.tmp.npy"
+            np.save(tmp_file, np.asarray(embeddings, dtype='float32'))
+            os.replace(tmp_file, self.index_path / "embeddings.npy")
         
-        # Metadata'yı kaydet
-        if metadata_list or self.chunk_list:
-            metadata_file = self.index_path / "metadata.json"
-            metadata_to_save = metadata_list if metadata_list else self.chunk_list
-            
-            with open(metadata_file, 'w', encoding='utf-8') as f:
-                json.dump(metadata_to_save, f, ensure_ascii=False, indent=2)
+        # Build parametrelerini stats.json'a yaz (varsa diğer istatistikleri koru)
+        if self.index_params:
+            stats_file = self.index_path / "stats.json"
+            stats = {}
+            if stats_file.exists():
+                with open(stats_file, 'r', encoding='utf-8') as f:
+                    stats = json.load(f)
+            stats["index"] = self.index_params
+            with open(stats_file, 'w', encoding='utf-8') as f:
+                json.dump(stats, f, ensure_ascii=False, indent=2)
+        
+        # Metadata'yı chunk deposu olarak kaydet
+        if store is not None:
+            store.save(self.index_path)
+            print(f"💾 Chunk deposu kaydedildi: {self.index_path / 'chunk_store'}")
             
-            print(f"💾 Metadata (chunk listesi) kaydedildi: {metadata_file}")
+            if export_json:
+                metadata_file = self.index_path / "metadata.json"
+                store.export_json(metadata_file)
+                print(f"💾 Metadata (chunk listesi) kaydedildi: {metadata_file}")
+        
+        # BM25 keyword index'ini kaydet
+        if keyword_index is not None:
+            keyword_index.save(self.index_path)
+            print(f"💾 BM25 keyword index kaydedildi: {self.index_path / 'bm25'}")
+        
+        # FAISS index'i kaydet
+        if index is not None:
+            index_file = self.index_path / "index.faiss"
+            tmp_file = self.index_path / "index.faiss.tmp"
+            faiss.write_index(index, str(tmp_file))
+            os.replace(tmp_file, index_file)
+            print(f"💾 FAISS index kaydedildi: {index_file}")
     
     def load_index(self):
         """Index'i diskten yükle"""
@@ -84,15 +222,269 @@ class FAISSRetriever:
         if not index_file.exists():
             raise FileNotFoundError(f"Index dosyası bulunamadı: {index_file}")
         
+        start = time.perf_counter()
+        
         # FAISS index'i yükle
-        self.index = faiss.read_index(str(index_file))
-        print(f"📂 FAISS index yüklendi: {self.index.ntotal} vektör")
+        self.index = self._read_index(index_file)
+        print(f"📂 FAISS index yüklendi: {self.index.ntotal} vektör" + (" (mmap)" if self.mmap_loaded else ""))
+        
+        # Build parametrelerini yükle ve arama ayarlarını (nprobe, efSearch) geri getir
+        stats_file = self.index_path / "stats.json"
+        if stats_file.exists():
+            with open(stats_file, 'r', encoding='utf-8') as f:
+                self.index_params = json.load(f).get("index", {})
+            apply_search_params(self.index, self.index_params)
+        
+        # Yeniden skorlama açıksa float vektörleri mmap ile aç (sadece okunan sayfalar RAM'e gelir)
+        embeddings_file = self.index_path / "embeddings.npy"
+        if self.index_params.get("rescore"):
+            if embeddings_file.exists():
+                self.embeddings = np.load(embeddings_file, mmap_mode='r')
+            else:
+                print("⚠️  embeddings.npy bulunamadı, yeniden skorlama devre dışı")
+        self.load_timings = {"index_load_ms": (time.perf_counter() - start) * 1000}
+        start = time.perf_counter()
         
-        # Metadata'yı yükle
-        if metadata_file.exists():
-            with open(metadata_file, 'r', encoding='utf-8') as f:
-                self.chunk_list = json.load(f)  # Bu artık bir liste
+        # Metadata'yı yükle: önce kompakt chunk deposu, yoksa eski metadata.json
+        if ChunkStore.exists(self.index_path):
+            self.chunk_list = ChunkStore.load(self.index_path)
+            print(f"📂 Chunk deposu açıldı: {len(self.chunk_list)} kayıt")
+            
+            # Dönem / kategori / kaynak türü filtreleri için değer bitmap'lerini hazırla
+            self.chunk_list.precompute_masks()
+        elif metadata_file.exists():
+            self.chunk_list = ChunkStore.from_json(metadata_file)
             print(f"📂 Metadata yüklendi: {len(self.chunk_list)} kayıt")
+            
+            # Sonraki açılışlar JSON parse etmesin diye depoyu bir kez diske yaz
+            try:
+                self.chunk_list.save(self.index_path)
+                print("💾 metadata.json chunk deposuna dönüştürüldü")
+            except OSError as e:
+                print(f"⚠️  Chunk deposu yazılamadı: {e}")
+        self.load_timings["metadata_parse_ms"] = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        
+        # BM25 keyword index'ini yükle
+        if BM25Index.exists(self.index_path):
+            self.keyword_index = BM25Index.load(self.index_path)
+            print(f"📂 BM25 keyword index yüklendi: {len(self.keyword_index.terms)} terim")
+            
+            # Eski tokenizer ile üretilmiş index'i bir kez yeniden oluştur
+            if not self.keyword_index.is_current:
+                print("🔧 BM25 index eski tokenizer ile üretilmiş, yeniden oluşturuluyor...")
+                texts = [self.chunk_list.get_text(i) for i in range(len(self.chunk_list))]
+                self.keyword_index = BM25Index.from_texts(texts, stem=self.keyword_index.stem)
+                try:
+                    self.keyword_index.save(self.index_path)
+                except OSError as e:
+                    print(f"⚠️  BM25 index yazılamadı: {e}")
+        self.load_timings["keyword_index_ms"] = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        
+        # Ana index'e henüz katılmamış delta segmentleri yükle
+        self._load_segments()
+        self.load_timings["segments_ms"] = (time.perf_counter() - start) * 1000
+        self.persisted = True
+    
+    def _load_segments(self):
+        """
+        Manifestteki delta segmentleri oku. Her bileşen (index, chunk deposu, BM25)
+        sadece kendinde olmayan satırları segmentlerden tamamlar.
+        """
+        self.segments = SegmentManifest.load(self.index_path)
+        self.delta_vectors = np.empty((0, self.index.d), dtype='float32')
+        self.deleted = np.unique(np.array(self.segments.deleted, dtype='int64'))
+        self._live_mask_cache = None
+        
+        for segment in self.segments.segments:
+            vectors, records = self.segments.read_segment(segment)
+            start = segment["start"]
+            
+            # Ana index'te olmayan vektörler
+            offset = self.index.ntotal + len(self.delta_vectors) - start
+            if 0 <= offset < len(vectors):
+                self.delta_vectors = np.concatenate([self.delta_vectors, vectors[offset:]])
+            
+            # Chunk deposunda olmayan kayıtlar
+            offset = len(self.chunk_list) - start
+            if 0 <= offset < len(records):
+                self.chunk_list.extend(records[offset:])
+            
+            # BM25 index'inde olmayan dokümanlar
+            if self.keyword_index is not None:
+                offset = self.keyword_index.num_docs - start
+                if 0 <= offset < len(records):
+                    self.keyword_index.add_texts([chunk.get("content", "") for chunk in records[offset:]])
+        
+        if self.segments.segments:
+            print(f"📂 {len(self.segments.segments)} delta segment yüklendi: {len(self.delta_vectors)} vektör")
+        if len(self.deleted):
+            print(f"📂 {len(self.deleted)} silinmiş satır aramalarda maskelenecek")
+    
+    def _read_index(self, index_file: Path) -> faiss.Index:
+        """
+        Index dosyasını oku. use_mmap açıksa dosya kopyalanmadan salt-okunur
+        olarak map edilir; bu index tipi mmap desteklemiyorsa normal okumaya düşer.
+        """
+        self.mmap_loaded = False
+        
+        if self.use_mmap:
+            try:
+                index = faiss.read_index(str(index_file), faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+                self.mmap_loaded = True
+                return index
+            except RuntimeError as e:
+                print(f"⚠️  Index mmap ile açılamadı, belleğe okunuyor: {e}")
+        
+        return faiss.read_index(str(index_file))
+    
+    def _clone_index(self, index: faiss.Index, mmap_loaded: bool = False) -> faiss.Index:
+        """
+        Index'in yazılabilir bellek kopyası. mmap ile yüklenmiş index'ler (örn. IVF'in
+        disk üzerindeki listeleri) serialize edilemediği için dosyadan belleğe okunur.
+        """
+        if mmap_loaded:
+            clone = faiss.read_index(str(self.index_path / "index.faiss"))
+        else:
+            clone = faiss.deserialize_index(faiss.serialize_index(index))
+        apply_search_params(clone, self.index_params)
+        return clone
+    
+    @property
+    def base_count(self) -> int:
+        """Ana index'teki vektör sayısı"""
+        return self.index.ntotal if self.index is not None else 0
+    
+    @property
+    def total_vectors(self) -> int:
+        """Ana index + delta segmentlerdeki toplam vektör sayısı"""
+        return self.base_count + len(self.delta_vectors)
+    
+    @property
+    def index_version(self) -> str:
+        """
+        Index içeriğinin sürümü: yeniden oluşturma, ekleme, silme veya sıkıştırmada değişir.
+        Diskteki index değişmedikçe süreçler ve yeniden başlatmalar arasında aynıdır
+        (yanıt önbelleklerinin geçersiz kılınması için).
+        """
+        index_file = self.index_path / "index.faiss"
+        file_state = (0, 0)
+        if index_file.exists():
+            stat = index_file.stat()
+            file_state = (stat.st_mtime_ns, stat.st_size)
+        
+        state = f"{file_state}:{self.base_count}:{self.total_vectors}:{len(self.deleted)}:{self._generation}"
+        return hashlib.blake2b(state.encode('utf-8'), digest_size=8).hexdigest()
+    
+    def _fold_deltas(self):
+        """Delta vektörleri bellekteki ana index'e kat (çağıran _lock'u tutmalı)"""
+        if len(self.delta_vectors) == 0:
+            return
+        
+        base_count = self.index.ntotal
+        self.index = self._clone_index(self.index, self.mmap_loaded)
+        self.index.add(self.delta_vectors)
+        self.mmap_loaded = False
+        
+        if self.embeddings is not None:
+            self.embeddings = np.concatenate([np.asarray(self.embeddings[:base_count]), self.delta_vectors])
+        
+        self.delta_vectors = np.empty((0, self.index.d), dtype='float32')
+    
+    def compact(self, background: bool = False) -> Optional[threading.Thread]:
+        """
+        Delta segmentleri ana index'e kat ve diske yaz. Sıkıştırma sürerken aramalar
+        eski ana index + deltalar üzerinden, yeni eklemeler yeni segmentlere devam eder.
+        
+        Args:
+            background: Arka plan thread'inde çalıştır
+            
+        Returns:
+            Arka planda çalışıyorsa thread, değilse None
+        """
+        if self._compaction_thread is not None and self._compaction_thread.is_alive():
+            if not background:
+                self._compaction_thread.join()
+            return self._compaction_thread
+        
+        if not background:
+            self._compact()
+            return None
+        
+        self._compaction_thread = threading.Thread(target=self._compact, name="faiss-compaction", daemon=True)
+        self._compaction_thread.start()
+        return self._compaction_thread
+    
+    def wait_for_compaction(self):
+        """Süren arka plan sıkıştırmasının bitmesini bekle"""
+        thread = self._compaction_thread
+        if thread is not None:
+            thread.join()
+    
+    def _needs_compaction(self) -> bool:
+        """Delta segmentler sıkıştırma sınırlarını aştı mı?"""
+        return (len(self.segments.segments) >= self.max_delta_segments or
+                len(self.delta_vectors) >= self.max_delta_vectors)
+    
+    def _compact(self):
+        """Sıkıştırma: anlık görüntüyü al, yeni ana index'i yaz, sonra bellekte değiştir"""
+        with self._lock:
+            index, embeddings, delta = self.index, self.embeddings, self.delta_vectors
+            mmap_loaded = self.mmap_loaded
+            segment_names = [segment["name"] for segment in self.segments.segments]
+            keyword_index = self.keyword_index.snapshot() if self.keyword_index is not None else None
+            chunk_count = len(self.chunk_list)
+        
+        if len(delta) == 0 and not segment_names:
+            return
+        
+        print(f"🔧 {len(segment_names)} delta segment ({len(delta)} vektör) ana index'e katılıyor...")
+        
+        # Yeni ana index (kilit dışında: aramalar eski index üzerinden devam eder)
+        base_count = index.ntotal
+        new_index = self._clone_index(index, mmap_loaded)
+        new_index.add(delta)
+        if embeddings is not None:
+            embeddings = np.concatenate([np.asarray(embeddings[:base_count]), delta])
+        
+        store = self.chunk_list.snapshot(chunk_count) if chunk_count else None
+        self._write_base(new_index, embeddings, store, keyword_index)
+        
+        with self._lock:
+            self.segments.drop_segments(segment_names)
+            
+            # mmap modunda yeni dosyayı map et (bellek kopyası bırakılır)
+            if self.use_mmap:
+                new_index = self._read_index(self.index_path / "index.faiss")
+                apply_search_params(new_index, self.index_params)
+            else:
+                self.mmap_loaded = False
+            
+            if embeddings is not None and self.use_mmap:
+                embeddings = np.load(self.index_path / "embeddings.npy", mmap_mode='r')
+            
+            self.index = new_index
+            self.embeddings = embeddings
+            self.delta_vectors = self.delta_vectors[len(delta):]
+        
+        print(f"✅ Sıkıştırma tamamlandı (ana index: {new_index.ntotal} vektör, bekleyen delta: {len(self.delta_vectors)})")
+    
+    def set_search_params(self, nprobe: int = None, ef_search: int = None):
+        """
+        Arama zamanı parametrelerini güncelle (hız / doğruluk dengesi)
+        
+        Args:
+            nprobe: IVF index'leri için taranacak küme sayısı
+            ef_search: HNSW index'leri için arama derinliği
+        """
+        if nprobe is not None:
+            self.index_params["nprobe"] = nprobe
+        if ef_search is not None:
+            self.index_params["efSearch"] = ef_search
+        
+        if self.index is not None:
+            apply_search_params(self.index, self.index_params)
     
     def search(self, query_embedding: np.ndarray, top_k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
         """
@@ -105,24 +497,241 @@ class FAISSRetriever:
         Returns:
             (distances, indices) tuple'ı
         """
+        similarities, indices = self.search_batch(query_embedding.reshape(1, -1), top_k)
+        
+        return similarities[0], indices[0]
+    
+    def search_batch(self, query_embeddings: np.ndarray, top_k: int = 5,
+                     filters: Dict = None, threshold: float = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Birden fazla query için tek bir index.search çağrısıyla arama yap
+        
+        Args:
+            query_embeddings: Query embedding matrisi (n_queries x dimension)
+            top_k: Her query için döndürülecek sonuç sayısı
+            filters: Metadata filtreleri (opsiyonel), örn:
+                     {"donem": "Millî Mücadele Dönemi", "yil": (1919, 1923)}
+            threshold: Verilirse ana index'te range search yapılır ve sadece benzerliği
+                       threshold'u geçen sonuçlar döner (top_k üst sınırdır)
+            
+        Returns:
+            (similarities, indices) tuple'ı, ikisi de (n_queries x top_k) boyutunda
+        """
         if self.index is None:
             raise ValueError("Index yüklenmemiş! Önce create_index veya load_index çağırın.")
         
-        # Query'yi uygun formata çevir
-        query_embedding = query_embedding.astype('float32').reshape(1, -1)
+        # Ana index ve deltaların tutarlı anlık görüntüsü (arka plan sıkıştırması değiştirebilir)
+        with self._lock:
+            index, embeddings, delta = self.index, self.embeddings, self.delta_vectors
+            mask = self.search_mask(filters)
+        base_count = index.ntotal
+        
+        # Query matrisini uygun formata çevir (kopya: normalize_L2 yerinde çalışır)
+        query_embeddings = np.array(query_embeddings, dtype='float32')
+        query_embeddings = query_embeddings.reshape(len(query_embeddings), -1)
 
-        # IndexFlatIP için sorgu vektörünü normalize et ***
-        faiss.normalize_L2(query_embedding)
+        # IndexFlatIP için sorgu vektörlerini normalize et ***
+        faiss.normalize_L2(query_embeddings)
         
-        # Arama yap
-        # IndexFlatIP kullanıldığında, 'distances' aslında 'similarity scores' (benzerlik skorları) olur
-        similarities, indices = self.index.search(query_embedding, top_k)
+        # Filtre maskesi (önceden hesaplanmış değer bitmap'lerinden)
+        if mask is not None:
+            selected = np.flatnonzero(mask)
+            
+            # Dar filtrelerde index'i hiç taramadan sadece seçili vektörlerde tam arama yap
+            if len(selected) <= FILTER_EXACT_SEARCH_LIMIT:
+                vectors = self._get_vectors(selected, index, embeddings, delta)
+                if vectors is not None:
+                    results = exact_search(query_embeddings, vectors, selected, top_k)
+                    return apply_threshold(*results, threshold) if threshold is not None else results
         
-        return similarities[0], indices[0]
+        base_mask = mask[:base_count] if mask is not None else None
+        
+        if embeddings is not None:
+            # Sıkıştırılmış index'te daha fazla aday al, sonra tam vektörlerle yeniden skorla
+            rescore_factor = self.index_params.get("rescore_factor", DEFAULT_RESCORE_FACTOR)
+            _, candidates = self._index_search(query_embeddings, top_k * rescore_factor, base_mask, index)
+            results = rescore_candidates(query_embeddings, embeddings, candidates, top_k)
+        elif threshold is not None:
+            results = self._index_range_search(query_embeddings, threshold, top_k, base_mask, index)
+        else:
+            # Arama yap
+            # IndexFlatIP kullanıldığında, 'distances' aslında 'similarity scores' (benzerlik skorları) olur
+            results = self._index_search(query_embeddings, top_k, base_mask, index)
+        
+        if len(delta) > 0:
+            # Delta segmentler küçük ve düz (flat): tam arama yap, ana index sonuçlarıyla birleştir
+            delta_ids = np.arange(base_count, base_count + len(delta))
+            if mask is not None:
+                delta_mask = mask[base_count:]
+                delta, delta_ids = delta[delta_mask], delta_ids[delta_mask]
+            
+            results = merge_topk([results, exact_search(query_embeddings, delta, delta_ids, top_k)], top_k)
+        
+        # Yeniden skorlanan ve delta sonuçlarına da aynı eşik uygulanır
+        return apply_threshold(*results, threshold) if threshold is not None else results
+    
+    def range_search_batch(self, query_embeddings: np.ndarray, threshold: float,
+                           max_k: int = 20, min_k: int = 1,
+                           filters: Dict = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Eşik tabanlı arama: benzerliği threshold'u geçen tüm sonuçlar (en fazla max_k).
+        Eşiği geçen sonuç min_k'dan azsa eşik yok sayılarak en iyi min_k sonuç döner.
+        
+        Args:
+            query_embeddings: Query embedding matrisi (n_queries x dimension)
+            threshold: Minimum benzerlik
+            max_k: Her query için en fazla sonuç sayısı
+            min_k: Her query için en az sonuç sayısı (0: geri dönüş yok)
+            filters: Metadata filtreleri (opsiyonel)
+            
+        Returns:
+            (similarities, indices) tuple'ı, (n_queries x max_k), eksikler -1 ile doldurulur
+        """
+        query_embeddings = np.asarray(query_embeddings, dtype='float32')
+        query_embeddings = query_embeddings.reshape(len(query_embeddings), -1)
+        
+        similarities, indices = self.search_batch(query_embeddings, max_k, filters=filters, threshold=threshold)
+        return fill_min_k(similarities, indices, min_k,
+                          lambda rows: self.search_batch(query_embeddings[rows], min(min_k, max_k), filters=filters))
+    
+    def search_mask(self, filters: Dict = None) -> Optional[np.ndarray]:
+        """
+        Aramada kullanılacak satır maskesi: filtrelere uyan ve silinmemiş satırlar
+        
+        Args:
+            filters: Metadata filtreleri (opsiyonel)
+            
+        Returns:
+            Bool maske; filtre ve silinmiş satır yoksa None
+        """
+        with self._lock:
+            live = self._live_mask()
+            if not filters:
+                return live
+            
+            if len(self.chunk_list) != self.total_vectors:
+                raise ValueError("Filtreli arama için chunk deposu ile index aynı sayıda kayıt içermeli.")
+            
+            mask = self.chunk_list.build_mask(filters)
+            return mask & live if live is not None else mask
+    
+    def _live_mask(self) -> Optional[np.ndarray]:
+        """Silinmemiş satırların maskesi (silinmiş satır yoksa None, önbellekli)"""
+        if len(self.deleted) == 0:
+            return None
+        
+        total = self.total_vectors
+        cached = self._live_mask_cache
+        if cached is None or len(cached) != total:
+            cached = np.ones(total, dtype=bool)
+            cached[self.deleted[self.deleted < total]] = False
+            self._live_mask_cache = cached
+        
+        return cached
+    
+    def _index_search(self, query_embeddings: np.ndarray, top_k: int,
+                      mask: np.ndarray = None, index: faiss.Index = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        FAISS araması; maske verilirse ID seçici (bitmap) olarak FAISS'e iletilir,
+        böylece kapsam dışı vektörler hiç skorlanmaz ve top-k slotlarını işgal etmez.
+        """
+        if index is None:
+            index = self.index
+        
+        if mask is None:
+            return index.search(query_embeddings, top_k)
+        
+        bitmap = np.packbits(mask, bitorder='little')
+        selector = faiss.IDSelectorBitmap(len(mask), faiss.swig_ptr(bitmap))
+        n_selected = max(int(mask.sum()), 1)
+        
+        try:
+            params = make_search_params(index, selector, selectivity=n_selected / len(mask))
+            return index.search(query_embeddings, top_k, params=params)
+        except RuntimeError:
+            pass
+        
+        # Seçici desteklemeyen index tipleri (örn: IndexPQ): fazla aday al, sonra filtrele
+        fetch_k = max(top_k, min(index.ntotal, top_k * 2 * int(np.ceil(len(mask) / n_selected))))
+        similarities, indices = index.search(query_embeddings, fetch_k)
+        
+        keep = (indices >= 0) & mask[np.maximum(indices, 0)]
+        order = np.argsort(~keep, axis=1, kind='stable')[:, :top_k]
+        similarities = np.take_along_axis(similarities, order, axis=1)
+        indices = np.take_along_axis(indices, order, axis=1)
+        
+        kept = np.take_along_axis(keep, order, axis=1)
+        similarities[~kept] = -np.inf
+        indices[~kept] = -1
+        
+        return similarities, indices
+    
+    def _index_range_search(self, query_embeddings: np.ndarray, threshold: float, max_k: int,
+                            mask: np.ndarray = None, index: faiss.Index = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        FAISS range search (maske ID seçici olarak iletilir). Range search desteklemeyen
+        index tiplerinde max_k'lık normal arama yapılıp eşik uygulanır.
+        """
+        if index is None:
+            index = self.index
+        
+        params = None
+        if mask is not None:
+            bitmap = np.packbits(mask, bitorder='little')
+            selector = faiss.IDSelectorBitmap(len(mask), faiss.swig_ptr(bitmap))
+            params = make_search_params(index, selector, selectivity=max(int(mask.sum()), 1) / len(mask))
+        
+        try:
+            return range_search(index, query_embeddings, threshold, max_k, params=params)
+        except RuntimeError:
+            return apply_threshold(*self._index_search(query_embeddings, max_k, mask, index), threshold)
+    
+    def get_vectors(self, ids: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Verilen index satırlarının vektörlerini döndür
+        
+        Args:
+            ids: Index satır id'leri
+            
+        Returns:
+            (len(ids) x dimension) matris; vektörler elde edilemiyorsa None
+        """
+        with self._lock:
+            index, embeddings, delta = self.index, self.embeddings, self.delta_vectors
+        
+        return self._get_vectors(ids, index, embeddings, delta)
+    
+    def _get_vectors(self, ids: np.ndarray, index: faiss.Index, embeddings: Optional[np.ndarray],
+                     delta: np.ndarray) -> Optional[np.ndarray]:
+        """get_vectors'ın verilen (ana index, embedding'ler, delta) anlık görüntüsü üzerinde çalışan hali"""
+        ids = np.asarray(ids, dtype='int64')
+        base_count = index.ntotal
+        in_base = ids < base_count
+        
+        vectors = np.empty((len(ids), index.d), dtype='float32')
+        vectors[~in_base] = delta[ids[~in_base] - base_count]
+        
+        base_ids = ids[in_base]
+        if len(base_ids) == 0:
+            return vectors
+        
+        # Tam float vektörler varsa (mmap) onları kullan
+        if embeddings is not None:
+            vectors[in_base] = embeddings[base_ids]
+            return vectors
+        
+        # Yoksa index'ten geri oluştur (IVF gibi bazı tipler desteklemez)
+        try:
+            vectors[in_base] = index.reconstruct_batch(base_ids)
+        except RuntimeError:
+            return None
+        
+        return vectors
     
     def retrieve(self, query_embedding: np.ndarray, 
                 top_k: int = 5, 
-                threshold: float = None) -> List[Dict]:
+                threshold: float = None,
+                filters: Dict = None) -> List[Dict]:
         """
         Query için alakalı dokümanları al
         
@@ -130,58 +739,195 @@ class FAISSRetriever:
             query_embedding: Query embedding vektörü
             top_k: Döndürülecek sonuç sayısı
             threshold: Minimum benzerlik eşiği (opsiyonel)
+            filters: Metadata filtreleri (opsiyonel)
             
         Returns:
             Alakalı dokümanların metadata listesi
         """
+        return self.retrieve_batch(query_embedding.reshape(1, -1), top_k=top_k,
+                                   threshold=threshold, filters=filters)[0]
+    
+    def retrieve_batch(self, query_embeddings: np.ndarray,
+                       top_k: int = 5,
+                       threshold: float = None,
+                       filters: Dict = None,
+                       min_k: int = None) -> List[List[Dict]]:
+        """
+        Birden fazla query için alakalı dokümanları tek seferde al
+        
+        Args:
+            query_embeddings: Query embedding matrisi (n_queries x dimension)
+            top_k: Her query için döndürülecek sonuç sayısı
+            threshold: Minimum benzerlik eşiği (opsiyonel)
+            filters: Metadata filtreleri (opsiyonel), tüm query'lere uygulanır
+            min_k: Verilirse (threshold ile birlikte) range search modu: top_k üst sınırdır,
+                   eşiği geçen sonuç min_k'dan azsa en iyi min_k sonuç döner
+            
+        Returns:
+            Her query için alakalı dokümanların metadata listesi
+        """
         # Arama yap
-        similarities, indices = self.search(query_embedding, top_k)
+        if min_k is not None and threshold is not None:
+            similarities, indices = self.range_search_batch(query_embeddings, threshold, max_k=top_k,
+                                                            min_k=min_k, filters=filters)
+            threshold = None  # Eşik uygulandı; min_k geri dönüş sonuçları elenmemeli
+        else:
+            similarities, indices = self.search_batch(query_embeddings, top_k, filters=filters)
+        
+        # Geçerli sonuç maskesi (FAISS eksik sonuçları -1 ile doldurur)
+        valid = indices >= 0
+        if threshold is not None:
+            valid &= similarities >= threshold
         
         # Sonuçları hazırla
-        results = []
-        for similarity_score, idx in zip(similarities, indices):
-            
-            # Threshold kontrolü
-            if threshold and similarity_score < threshold:
-                continue
-            
-            # Metadata'yı ekle
-            result = {
-                "index": int(idx),
-                "distance": float(1 - similarity_score), # Mesafeyi 1-similarity olarak hesapla
-                "similarity": float(similarity_score)
-            }
-            
-            # Metadata varsa ekle
-            if self.chunk_list and idx < len(self.chunk_list):
-                result.update(self.chunk_list[idx])
-            
-            results.append(result)
+        all_results = []
+        for row_similarities, row_indices, row_valid in zip(similarities, indices, valid):
+            results = []
+            for similarity_score, idx in zip(row_similarities[row_valid], row_indices[row_valid]):
+                results.append(self._build_result(int(idx), float(similarity_score)))
+            all_results.append(results)
+        
+        return all_results
+    
+    def _build_result(self, idx: int, similarity_score: float) -> Dict:
+        """Tek bir arama sonucunu metadata ile birlikte formatla"""
+        result = {
+            "index": idx,
+            "distance": 1 - similarity_score, # Mesafeyi 1-similarity olarak hesapla
+            "similarity": similarity_score
+        }
         
-        return results
+        # Metadata varsa ekle
+        if self.chunk_list and idx < len(self.chunk_list):
+            result.update(self.chunk_list[idx])
+        
+        return result
     
-    def add_vectors(self, new_embeddings: np.ndarray, new_metadata: List[Dict] = None):
+    def add_vectors(self, new_embeddings: np.ndarray, new_metadata: List[Dict] = None,
+                    persist: bool = None):
         """
-        Mevcut index'e yeni vektörler ekle
+        Mevcut index'e yeni vektörler ekle. Vektörler ana index'e değil, küçük bir
+        delta segmente yazılır; index.faiss yeniden yazılmaz ve aramalar kesintisiz sürer.
         
         Args:
             new_embeddings: Yeni embedding vektörleri
             new_metadata: Yeni metadata listesi
+            persist: Segmenti diske yaz (None: index diskten yüklendiyse/kaydedildiyse)
         """
+        self._append(new_embeddings, new_metadata, persist=persist)
+    
+    def _append(self, new_embeddings: np.ndarray, new_metadata: List[Dict] = None,
+                persist: bool = None, deleted_rows: np.ndarray = None):
+        """Vektörleri delta segment olarak ekle; verilen satırları aynı manifest güncellemesinde sil"""
         if self.index is None:
             raise ValueError("Index yüklenmemiş!")
         
-        # Vektörleri ekle
-        new_embeddings = new_embeddings.astype('float32')
+        if persist is None:
+            persist = self.persisted
+        if deleted_rows is None:
+            deleted_rows = np.empty(0, dtype='int64')
+        
+        # Vektörleri hazırla (kopya: normalize_L2 yerinde çalışır)
+        new_embeddings = np.array(new_embeddings, dtype='float32').reshape(-1, self.index.d)
         # *** Yeni vektörleri de normalize et ***
         faiss.normalize_L2(new_embeddings)
-        self.index.add(new_embeddings)
         
-        # Metadata'yı güncelle
-        if new_metadata and self.chunk_list is not None:
-            self.chunk_list.extend(new_metadata)
+        with self._lock:
+            # Önce segment diske yazılır (atomik), sonra bellekteki görünüm güncellenir
+            if persist:
+                self.segments.write_segment(new_embeddings, new_metadata or [], start=self.total_vectors,
+                                            deleted=deleted_rows.tolist())
+            
+            self.delta_vectors = np.concatenate([self.delta_vectors, new_embeddings])
+            self._mark_deleted(deleted_rows)
+            
+            # Metadata'yı güncelle
+            if new_metadata and self.chunk_list is not None:
+                self.chunk_list.extend(new_metadata)
+                
+                if self.keyword_index is not None:
+                    self.keyword_index.add_texts([chunk.get("content", "") for chunk in new_metadata])
+        
+        print(f"✅ {len(new_embeddings)} yeni vektör eklendi (toplam: {self.total_vectors}, "
+              f"delta: {len(self.delta_vectors)})")
+        
+        # Deltalar büyüdüyse arka planda ana index'e kat
+        if persist and self.auto_compact and self._needs_compaction():
+            self.compact(background=True)
+    
+    def _mark_deleted(self, rows: np.ndarray):
+        """Satırları bellekte silinmiş olarak işaretle (çağıran _lock'u tutmalı)"""
+        if len(rows) == 0:
+            return
+        self.deleted = np.union1d(self.deleted, rows).astype('int64')
+        self._live_mask_cache = None
+    
+    def _record_rows(self, record_ids: List) -> np.ndarray:
+        """Kayıt id'lerine ait silinmemiş satırlar"""
+        rows = self.chunk_list.find_rows("id", record_ids)
+        return np.setdiff1d(rows, self.deleted, assume_unique=True)
+    
+    def upsert_records(self, chunks: List[Dict], embeddings: np.ndarray, persist: bool = None) -> Dict:
+        """
+        Kayıtları ekle veya güncelle: chunk'lardaki kayıt id'lerine ait eski satırlar
+        silinir, yeni chunk'lar tek bir delta segment olarak eklenir. Maliyet değişen
+        kayıt sayısıyla orantılıdır (index yeniden oluşturulmaz).
+        
+        Args:
+            chunks: {"content", "metadata"} formatında chunk listesi; metadata["id"] kayıt id'si.
+                    Aynı kaydın chunk'ları sırayla verilmeli (chunk sırası kararlı id'ye girer)
+            embeddings: Chunk'ların embedding vektörleri
+            persist: Değişikliği diske yaz (None: index diskten yüklendiyse/kaydedildiyse)
+            
+        Returns:
+            {"deleted": silinen satır sayısı, "added": eklenen chunk sayısı}
+        """
+        if len(chunks) != len(embeddings):
+            raise ValueError("Chunk ve embedding sayıları eşit olmalı.")
+        
+        # Kararlı chunk id'leri: kayıt id'si + kayıt içindeki sıra
+        ordinals = {}
+        for chunk in chunks:
+            metadata = chunk.setdefault("metadata", {})
+            if "id" not in metadata:
+                raise ValueError("Upsert için her chunk'ın metadata'sında kayıt 'id'si olmalı.")
+            ordinal = ordinals.get(metadata["id"], 0)
+            ordinals[metadata["id"]] = ordinal + 1
+            metadata["chunk_index"] = ordinal
+            metadata["chunk_uid"] = stable_chunk_id(metadata["id"], ordinal)
         
-        print(f"✅ {len(new_embeddings)} yeni vektör eklendi (toplam: {self.index.ntotal})")
+        with self._lock:
+            stale_rows = self._record_rows(list(ordinals))
+            self._append(embeddings, chunks, persist=persist, deleted_rows=stale_rows)
+        
+        print(f"✅ Upsert: {len(ordinals)} kayıt, {len(stale_rows)} eski chunk silindi, {len(chunks)} chunk eklendi")
+        return {"deleted": int(len(stale_rows)), "added": len(chunks)}
+    
+    def delete_records(self, record_ids: List, persist: bool = None) -> int:
+        """
+        Kayıtlara ait tüm chunk'ları sil (satırlar aramalarda maskelenir)
+        
+        Args:
+            record_ids: Silinecek kayıt id'leri
+            persist: Değişikliği diske yaz (None: index diskten yüklendiyse/kaydedildiyse)
+            
+        Returns:
+            Silinen chunk sayısı
+        """
+        if persist is None:
+            persist = self.persisted
+        
+        with self._lock:
+            rows = self._record_rows(list(record_ids))
+            if len(rows) == 0:
+                return 0
+            
+            if persist:
+                self.segments.mark_deleted(rows.tolist())
+            self._mark_deleted(rows)
+        
+        print(f"🗑️  {len(rows)} chunk silindi ({len(record_ids)} kayıt)")
+        return int(len(rows))
     
     def get_stats(self) -> Dict:
         """
@@ -190,44 +936,242 @@ class FAISSRetriever:
         Returns:
             İstatistik dictionary
         """
+        bytes_per_vector = index_bytes_per_vector(self.index)
+        base_count = self.base_count
+        
         return {
-            "total_vectors": self.index.ntotal if self.index else 0,
+            "total_vectors": self.total_vectors,
+            "base_vectors": base_count,
+            "delta_vectors": len(self.delta_vectors),
+            "delta_segments": len(self.segments.segments),
+            "deleted_vectors": len(self.deleted),
+            "compacting": self._compaction_thread is not None and self._compaction_thread.is_alive(),
             "dimension": self.dimension,
             "index_type": type(self.index).__name__ if self.index else None,
-            "metadata_count": len(self.chunk_list) if self.chunk_list else 0
+            "index_factory": self.index_params.get("factory"),
+            "nprobe": self.index_params.get("nprobe"),
+            "efSearch": self.index_params.get("efSearch"),
+            "quantization": self.index_params.get("quantization"),
+            "rescore": self.embeddings is not None,
+            "mmap": self.mmap_loaded,
+            "bytes_per_vector": bytes_per_vector,
+            "index_memory_mb": (bytes_per_vector * base_count + self.delta_vectors.nbytes) / (1024 * 1024),
+            "metadata_count": len(self.chunk_list),
+            "keyword_terms": len(self.keyword_index.terms) if self.keyword_index else 0
         }
 
 
+FUSION_MODES = ("minmax", "zscore", "rrf")
+DEFAULT_RRF_K = 60
+
+
+def normalize_scores(scores: np.ndarray, method: str = "minmax") -> np.ndarray:
+    """
+    Bir skor listesini ölçeklerden bağımsız hale getir
+    
+    Args:
+        scores: Ham skorlar
+        method: "minmax" ([0, 1] aralığı) veya "zscore" (ortalama 0, std 1)
+        
+    Returns:
+        Normalize edilmiş skorlar (float32)
+    """
+    scores = np.asarray(scores, dtype='float32')
+    if len(scores) == 0:
+        return scores
+    
+    if method == "minmax":
+        span = scores.max() - scores.min()
+        if span <= 0:
+            return np.ones_like(scores)
+        return (scores - scores.min()) / span
+    
+    if method == "zscore":
+        std = scores.std()
+        if std <= 0:
+            return np.zeros_like(scores)
+        return (scores - scores.mean()) / std
+    
+    raise ValueError(f"Bilinmeyen normalizasyon yöntemi: {method}")
+
+
+def fuse_scores(ranked_lists: List[Tuple[np.ndarray, np.ndarray]],
+                weights: List[float],
+                top_k: int,
+                method: str = "minmax",
+                rrf_k: int = DEFAULT_RRF_K) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Birden fazla sıralı sonuç listesini NumPy üzerinde birleştir
+    
+    Args:
+        ranked_lists: Her kaynak için skora göre azalan (ids, scores) dizileri
+        weights: Her kaynağın ağırlığı
+        top_k: Döndürülecek sonuç sayısı
+        method: "minmax" / "zscore" (normalize edilmiş ağırlıklı toplam) veya
+                "rrf" (reciprocal rank fusion: sum(w / (rrf_k + rank)))
+        rrf_k: RRF sabiti
+        
+    Returns:
+        (ids, fused_scores) tuple'ı, skora göre azalan
+    """
+    if method not in FUSION_MODES:
+        raise ValueError(f"Bilinmeyen fusion modu: {method} (seçenekler: {', '.join(FUSION_MODES)})")
+    
+    all_ids = [np.asarray(ids, dtype='int64') for ids, _ in ranked_lists]
+    if not any(len(ids) for ids in all_ids):
+        return np.empty(0, dtype='int64'), np.empty(0, dtype='float32')
+    
+    # Aday kümesi ve her listedeki id'nin aday pozisyonu
+    candidates, inverse = np.unique(np.concatenate(all_ids), return_inverse=True)
+    fused = np.zeros(len(candidates), dtype='float32')
+    
+    offset = 0
+    for (ids, scores), weight in zip(ranked_lists, weights):
+        positions = inverse[offset:offset + len(ids)]
+        offset += len(ids)
+        if len(ids) == 0:
+            continue
+        
+        if method == "rrf":
+            contribution = 1.0 / (rrf_k + np.arange(1, len(ids) + 1, dtype='float32'))
+            fused[positions] += weight * contribution
+        else:
+            normalized = normalize_scores(scores, method)
+            # Listede olmayan adaylar o listenin en düşük skorunu alır
+            column = np.full(len(candidates), normalized.min(), dtype='float32')
+            column[positions] = normalized
+            fused += weight * column
+    
+    # argpartition ile top-k, sadece seçilen k eleman sıralanır
+    k = min(top_k, len(candidates))
+    top = np.argpartition(-fused, k - 1)[:k] if k < len(candidates) else np.arange(len(candidates))
+    top = top[np.argsort(-fused[top], kind='stable')]
+    
+    return candidates[top], fused[top]
+
+
+DEFAULT_MMR_LAMBDA = 0.7
+
+
+def mmr_select(candidate_vectors: np.ndarray, relevance: np.ndarray, top_k: int,
+               lambda_mult: float = DEFAULT_MMR_LAMBDA) -> np.ndarray:
+    """
+    Maximal marginal relevance ile çeşitlendirilmiş aday seçimi.
+    Her adımda lambda * alaka - (1 - lambda) * max(seçilenlere benzerlik) skoru en
+    yüksek aday seçilir; örtüşen komşu chunk'lar aynı sonuç listesini doldurmaz.
+
+    Args:
+        candidate_vectors: L2-normalize edilmiş aday vektörleri (n x d)
+        relevance: Adayların sorguya alaka skorları (n,)
+        top_k: Seçilecek aday sayısı
+        lambda_mult: 1.0 = sadece alaka, 0.0 = sadece çeşitlilik
+
+    Returns:
+        Seçilen adayların pozisyonları (seçim sırasına göre)
+    """
+    n = len(candidate_vectors)
+    k = min(top_k, n)
+    if k == 0:
+        return np.empty(0, dtype='int64')
+
+    # Alaka skorları benzerlikle aynı ölçeğe ([0, 1]) getirilir (cross-encoder skorları için)
+    relevance = normalize_scores(relevance, "minmax")
+    vectors = np.asarray(candidate_vectors, dtype='float32')
+    similarity = vectors @ vectors.T
+
+    # İlk seçim sadece alakaya göre yapılır
+    selected = np.empty(k, dtype='int64')
+    selected[0] = int(np.argmax(relevance))
+    max_similarity = similarity[selected[0]].copy()
+    available = np.ones(n, dtype=bool)
+    available[selected[0]] = False
+
+    for step in range(1, k):
+        scores = lambda_mult * relevance - (1.0 - lambda_mult) * max_similarity
+        scores[~available] = -np.inf
+
+        best = int(np.argmax(scores))
+        selected[step] = best
+        available[best] = False
+        np.maximum(max_similarity, similarity[best], out=max_similarity)
+
+    return selected
+
+
 class HybridRetriever:
     """Hybrid retrieval (semantic + keyword) sınıfı"""
     
-    def __init__(self, faiss_retriever: FAISSRetriever, alpha: float = 0.7):
+    def __init__(self, faiss_retriever: FAISSRetriever, alpha: float = 0.7,
+                 fusion: str = "minmax", rrf_k: int = DEFAULT_RRF_K):
         """
         Args:
-            faiss_retriever: FAISS retriever instance
+            faiss_retriever: FAISS retriever instance (tek index düzeni; shard'lı
+                             ShardedRetriever'ın ortak BM25 index'i ve search_mask'i yoktur)
             alpha: Semantic search ağırlığı (0-1 arası)
+            fusion: Skor birleştirme modu ("minmax", "zscore" veya "rrf")
+            rrf_k: Reciprocal rank fusion sabiti
         """
+        if not hasattr(faiss_retriever, "keyword_index") or not hasattr(faiss_retriever, "search_mask"):
+            raise TypeError(
+                f"HybridRetriever tek index düzeni gerektirir, {type(faiss_retriever).__name__} desteklenmiyor "
+                "(shard'lı index'lerde keyword_index / search_mask yok)"
+            )
+        if fusion not in FUSION_MODES:
+            raise ValueError(f"Bilinmeyen fusion modu: {fusion} (seçenekler: {', '.join(FUSION_MODES)})")
+        
         self.faiss_retriever = faiss_retriever
         self.alpha = alpha  # Semantic weight
         self.beta = 1 - alpha  # Keyword weight
+        self.fusion = fusion
+        self.rrf_k = rrf_k
+        
+        # Jaccard araması için dışarıdan verilen doküman listesinin token kümeleri
+        self._documents_ref = None
+        self._documents_tokens = []
+    
+    def get_keyword_index(self) -> BM25Index:
+        """
+        Retriever'ın BM25 index'ini döndür. Diskte yoksa (eski index dizinleri)
+        chunk deposundan bir kez oluşturulur ve retriever'a bağlanır.
+        """
+        if self.faiss_retriever.keyword_index is None:
+            print("🔧 BM25 keyword index chunk deposundan oluşturuluyor...")
+            chunk_list = self.faiss_retriever.chunk_list
+            self.faiss_retriever.keyword_index = BM25Index.from_texts(
+                [chunk_list.get_text(i) for i in range(len(chunk_list))]
+            )
+        
+        return self.faiss_retriever.keyword_index
+    
+    def _document_token_sets(self, documents: List[str]) -> List[set]:
+        """Doküman listesinin token kümelerini döndür (aynı liste için bir kez hesaplanır)"""
+        if documents is not self._documents_ref or len(documents) != len(self._documents_tokens):
+            self._documents_tokens = [set(tokenize(doc)) for doc in documents]
+            self._documents_ref = documents
+        
+        return self._documents_tokens
     
-    def keyword_search(self, query: str, documents: List[str], top_k: int = 5) -> List[Tuple[int, float]]:
+    def keyword_search(self, query: str, documents: List[str] = None, top_k: int = 5) -> List[Tuple[int, float]]:
         """
-        Basit keyword tabanlı arama
+        Keyword tabanlı arama. Varsayılan olarak kalıcı BM25 ters index'i kullanılır;
+        maliyet korpus büyüklüğüyle değil sorgu terimlerinin posting listeleriyle orantılıdır.
         
         Args:
             query: Arama sorgusu
-            documents: Doküman listesi
+            documents: Doküman listesi (verilirse eski Jaccard araması bu liste üzerinde yapılır)
             top_k: Döndürülecek sonuç sayısı
             
         Returns:
             (index, score) tuple'larının listesi
         """
-        query_words = set(query.lower().split())
+        if documents is None:
+            return self.get_keyword_index().search_text(query, top_k=top_k,
+                                                        mask=self.faiss_retriever.search_mask())
+        
+        query_words = set(tokenize_query(query))
         
         scores = []
-        for idx, doc in enumerate(documents):
-            doc_words = set(doc.lower().split())
+        for idx, doc_words in enumerate(self._document_token_sets(documents)):
             
             # Jaccard similarity
             intersection = len(query_words.intersection(doc_words))
@@ -242,50 +1186,84 @@ class HybridRetriever:
     
     def hybrid_search(self, query_embedding: np.ndarray, 
                      query_text: str,
-                     documents: List[str],
-                     top_k: int = 5) -> List[Dict]:
+                     documents: List[str] = None,
+                     top_k: int = 5,
+                     fusion: str = None,
+                     filters: Dict = None) -> List[Dict]:
         """
         Hybrid search: semantic + keyword
         
         Args:
             query_embedding: Query embedding vektörü
             query_text: Query metni
-            documents: Doküman listesi
+            documents: Doküman listesi (opsiyonel; verilmezse BM25 index ve chunk deposu kullanılır)
             top_k: Döndürülecek sonuç sayısı
+            fusion: Skor birleştirme modu (None ise self.fusion)
+            filters: Metadata filtreleri (opsiyonel, sadece BM25 index ile)
             
         Returns:
-            Sonuç listesi
+            FAISSRetriever.retrieve ile aynı formatta sonuç listesi (content + metadata),
+            ek olarak hybrid_score, semantic_score, keyword_score ve document alanları
         """
+        fusion = fusion or self.fusion
+        candidate_k = top_k * 2
+        
         # Semantic search
-        semantic_results = self.faiss_retriever.retrieve(query_embedding, top_k=top_k*2)
+        query = np.asarray(query_embedding, dtype='float32').reshape(1, -1)
+        sem_scores, sem_ids = self.faiss_retriever.search_batch(query, top_k=candidate_k, filters=filters)
+        valid = sem_ids[0] >= 0
+        sem_ids, sem_scores = sem_ids[0][valid], sem_scores[0][valid]
         
         # Keyword search
-        keyword_results = self.keyword_search(query_text, documents, top_k=top_k*2)
-        
-        # Skorları birleştir
-        combined_scores = {}
+        if documents is None:
+            mask = self.faiss_retriever.search_mask(filters)
+            keyword_results = self.get_keyword_index().search_text(query_text, top_k=candidate_k, mask=mask)
+        else:
+            keyword_results = self.keyword_search(query_text, documents, top_k=candidate_k)
+        kw_ids = np.array([idx for idx, _ in keyword_results], dtype='int64')
+        kw_scores = np.array([score for _, score in keyword_results], dtype='float32')
         
-        for result in semantic_results:
-            idx = result['index']
-            combined_scores[idx] = self.alpha * result['similarity']
+        # Skorları birleştir ve top-k'yı al
+        top_ids, top_scores = fuse_scores(
+            [(sem_ids, sem_scores), (kw_ids, kw_scores)],
+            [self.alpha, self.beta],
+            top_k,
+            method=fusion,
+            rrf_k=self.rrf_k
+        )
         
-        for idx, score in keyword_results:
-            if idx in combined_scores:
-                combined_scores[idx] += self.beta * score
-            else:
-                combined_scores[idx] = self.beta * score
+        return self._format_results(query[0], top_ids, top_scores, sem_ids, sem_scores,
+                                    kw_ids, kw_scores, documents)
+    
+    def _format_results(self, query: np.ndarray, ids: np.ndarray, hybrid_scores: np.ndarray,
+                        sem_ids: np.ndarray, sem_scores: np.ndarray,
+                        kw_ids: np.ndarray, kw_scores: np.ndarray,
+                        documents: List[str] = None) -> List[Dict]:
+        """Birleştirilmiş sonuçları metadata ve kaynak skorlarıyla formatla"""
+        semantic = dict(zip(sem_ids.tolist(), sem_scores.tolist()))
+        keyword = dict(zip(kw_ids.tolist(), kw_scores.tolist()))
         
-        # Sırala ve top-k'yı al
-        sorted_results = sorted(combined_scores.items(), key=lambda x: x[1], reverse=True)[:top_k]
+        # Sadece keyword ile bulunan sonuçların semantic benzerliğini vektörlerden hesapla
+        missing = [idx for idx in ids.tolist() if idx not in semantic]
+        if missing:
+            query = query / max(np.linalg.norm(query), 1e-12)
+            vectors = self.faiss_retriever.get_vectors(np.array(missing))
+            if vectors is not None:
+                semantic.update(zip(missing, (vectors @ query).tolist()))
         
-        # Sonuçları formatla
         final_results = []
-        for idx, score in sorted_results:
-            result = {
-                "index": idx,
-                "hybrid_score": score,
-                "document": documents[idx] if idx < len(documents) else None
-            }
+        for idx, score in zip(ids.tolist(), hybrid_scores.tolist()):
+            similarity = semantic.get(idx, 0.0)
+            result = self.faiss_retriever._build_result(idx, similarity)
+            
+            if documents is not None:
+                result["document"] = documents[idx] if idx < len(documents) else None
+            else:
+                result["document"] = self.faiss_retriever.chunk_list.get_text(idx)
+            
+            result["hybrid_score"] = score
+            result["semantic_score"] = semantic.get(idx)
+            result["keyword_score"] = keyword.get(idx, 0.0)
             final_results.append(result)
         
         return final_results
@@ -0,0 +1,198 @@
+"""
+Delta Segment Modülü
+FAISSRetriever'a sonradan eklenen vektörleri küçük, eklemeli (append-only)
+segmentler halinde saklar.
+
+Her add_vectors çağrısı index.faiss'i yeniden yazmak yerine yeni bir segment
+dizini oluşturur; segment listesi segments.json manifestinde tutulur. Arka plan
+sıkıştırması (compaction) segmentleri ana index'e katar ve manifestten siler.
+
+Disk düzeni (index dizini altında):
+    segments.json              - Aktif segmentlerin ve silinmiş satırların listesi (atomik olarak değiştirilir)
+    segments/delta_000001/     - Bir segment
+        vectors.npy            - L2-normalize edilmiş float32 vektörler
+        records.json           - Vektörlerin chunk kayıtları ({"content", "metadata"})
+
+Segmentler global satır aralıkları [start, start + count) taşır. Ana index, chunk
+deposu ve BM25 index'i bu satırların bir önekini (prefix) içerir; yükleme sırasında
+her bileşen kendinde olmayan satırları segmentlerden tamamlar. Böylece sıkıştırma
+sırasında yarıda kalan bir yazma işlemi tutarsız durum bırakmaz.
+
+Silinen (veya güncellenen kayıtların eski) satırları manifestte "deleted" listesinde
+tutulur ve aramalarda maskelenir; satır numaraları hiçbir zaman değişmez. Fiziksel
+temizlik bir sonraki tam yeniden oluşturmada (DataProcessor.process_all) yapılır.
+"""
+
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+
+MANIFEST_FILE = "segments.json"
+SEGMENTS_DIRNAME = "segments"
+FORMAT_VERSION = 1
+
+
+def _atomic_write_json(path: Path, data: Dict):
+    """JSON dosyasını geçici dosyaya yazıp os.replace ile atomik olarak değiştir"""
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class SegmentManifest:
+    """Index dizinindeki delta segmentlerinin listesi"""
+
+    def __init__(self, index_dir: str, segments: List[Dict] = None, next_id: int = 1,
+                 deleted: List[int] = None):
+        """
+        Args:
+            index_dir: Index dizini
+            segments: {"name", "start", "count"} segment kayıtları (satır sırasına göre)
+            next_id: Bir sonraki segmentin numarası
+            deleted: Silinmiş global satır numaraları
+        """
+        self.index_dir = Path(index_dir)
+        self.segments = segments or []
+        self.next_id = next_id
+        self.deleted = deleted or []
+
+    @classmethod
+    def load(cls, index_dir: str) -> "SegmentManifest":
+        """
+        Manifesti oku (yoksa boş manifest döndür)
+
+        Args:
+            index_dir: Index dizini
+
+        Returns:
+            SegmentManifest
+        """
+        manifest_file = Path(index_dir) / MANIFEST_FILE
+        if not manifest_file.exists():
+            return cls(index_dir)
+
+        with open(manifest_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        return cls(index_dir, data.get("segments", []), data.get("next_id", 1), data.get("deleted", []))
+
+    def save(self):
+        """Manifesti atomik olarak yaz"""
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        _atomic_write_json(self.index_dir / MANIFEST_FILE, {
+            "version": FORMAT_VERSION,
+            "next_id": self.next_id,
+            "segments": self.segments,
+            "deleted": self.deleted
+        })
+
+    @property
+    def total_vectors(self) -> int:
+        """Segmentlerdeki toplam vektör sayısı"""
+        return sum(segment["count"] for segment in self.segments)
+
+    def segment_path(self, name: str) -> Path:
+        """Segment dizininin yolu"""
+        return self.index_dir / SEGMENTS_DIRNAME / name
+
+    def write_segment(self, vectors: np.ndarray, records: List[Dict], start: int,
+                      deleted: List[int] = None) -> Dict:
+        """
+        Yeni bir segmenti diske yaz ve manifeste ekle.
+        Segment önce geçici dizine yazılır; manifest ancak segment tamamlandıktan
+        sonra (atomik olarak) güncellenir.
+
+        Args:
+            vectors: L2-normalize edilmiş vektörler
+            records: Vektörlerin chunk kayıtları (boş olabilir)
+            start: Segmentin ilk global satır numarası
+            deleted: Aynı manifest güncellemesinde silinecek satırlar (upsert için)
+
+        Returns:
+            Segment kaydı
+        """
+        name = f"delta_{self.next_id:06d}"
+        path = self.segment_path(name)
+        tmp_path = path.with_name(name + ".tmp")
+        if tmp_path.exists():
+            shutil.rmtree(tmp_path)
+        tmp_path.mkdir(parents=True)
+
+        np.save(tmp_path / "vectors.npy", np.asarray(vectors, dtype='float32'))
+        with open(tmp_path / "records.json", 'w', encoding='utf-8') as f:
+            json.dump(records, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+        segment = {"name": name, "start": int(start), "count": int(len(vectors))}
+        self.segments.append(segment)
+        self.next_id += 1
+        if deleted:
+            self.deleted.extend(int(row) for row in deleted)
+        self.save()
+
+        return segment
+
+    def mark_deleted(self, rows: List[int]):
+        """
+        Satırları silinmiş olarak işaretle
+
+        Args:
+            rows: Global satır numaraları
+        """
+        self.deleted.extend(int(row) for row in rows)
+        self.save()
+
+    def read_segment(self, segment: Dict) -> Tuple[np.ndarray, List[Dict]]:
+        """
+        Segmentin vektörlerini ve kayıtlarını oku
+
+        Args:
+            segment: Segment kaydı
+
+        Returns:
+            (vectors, records) tuple'ı
+        """
+        path = self.segment_path(segment["name"])
+        vectors = np.load(path / "vectors.npy")
+        with open(path / "records.json", 'r', encoding='utf-8') as f:
+            records = json.load(f)
+        return vectors, records
+
+    def drop_segments(self, names: List[str]):
+        """
+        Ana index'e katılmış segmentleri manifestten çıkar ve dizinlerini sil
+
+        Args:
+            names: Silinecek segment adları
+        """
+        names = set(names)
+        self.segments = [segment for segment in self.segments if segment["name"] not in names]
+        self.save()
+
+        for name in names:
+            shutil.rmtree(self.segment_path(name), ignore_errors=True)
+
+    def purge_orphans(self):
+        """Manifestte olmayan segment dizinlerini sil (örn. index yeniden oluşturulmadan önce kalanlar)"""
+        segments_dir = self.index_dir / SEGMENTS_DIRNAME
+        if not segments_dir.exists():
+            return
+
+        known = {segment["name"] for segment in self.segments}
+        for path in segments_dir.iterdir():
+            if path.is_dir() and path.name not in known:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def reset(self):
+        """Tüm segmentleri ve silme kayıtlarını temizle (index baştan oluşturulduğunda)"""
+        names = [segment["name"] for segment in self.segments]
+        self.deleted = []
+        self.drop_segments(names)
@@ -0,0 +1,190 @@
+"""
+Semantik Yanıt Önbelleği Modülü
+Farklı kelimelerle sorulmuş aynı soruya ("İstanbul'un fethi sonuçları" / "İstanbul'un
+Fethi'nin dünya tarihi açısından sonuçları nelerdir?") Gemini'yi çağırmadan yanıt verir
+
+Geçmiş sorguların embedding'leri küçük bir FAISS index'inde tutulur. Yeni sorgu bir
+öncekine yeterince benziyorsa VE aynı chunk'lar getirilmişse önceki yanıt döndürülür.
+Kayıtların ömrü (TTL) ve sayısı sınırlıdır; FAISS index'i değiştiğinde (yeniden
+oluşturma, güncelleme) önbellek tamamen temizlenir.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+import faiss
+import numpy as np
+
+
+DEFAULT_SIMILARITY_THRESHOLD = 0.92
+DEFAULT_TTL_SECONDS = 6 * 60 * 60
+DEFAULT_MAX_ENTRIES = 2000
+
+# Benzerlik eşiğini geçen bu kadar komşu sırayla kontrol edilir
+LOOKUP_NEIGHBORS = 4
+
+
+class SemanticCache:
+    """Sorgu embedding'i benzerliğine dayalı, TTL ve boyut sınırlı yanıt önbelleği"""
+
+    def __init__(self, dimension: int, threshold: float = DEFAULT_SIMILARITY_THRESHOLD,
+                 ttl_seconds: float = DEFAULT_TTL_SECONDS, max_entries: int = DEFAULT_MAX_ENTRIES):
+        """
+        Args:
+            dimension: Sorgu embedding boyutu
+            threshold: Önbellekteki soruyla minimum kosinüs benzerliği
+            ttl_seconds: Kaydın geçerlilik süresi (saniye)
+            max_entries: Maksimum kayıt sayısı (en eski kayıt atılır)
+        """
+        self.dimension = dimension
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(dimension))
+        self.entries: "OrderedDict[int, Dict]" = OrderedDict()  # Ekleme sırasına göre
+        self.index_version = None
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+        self.lookups = 0
+        self.hits = 0
+        self.expired = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _normalize(query_embedding: np.ndarray) -> np.ndarray:
+        """Embedding'i (1 x dimension) L2-normalize edilmiş kopyaya çevir"""
+        vector = np.array(query_embedding, dtype='float32').reshape(1, -1)
+        faiss.normalize_L2(vector)
+        return vector
+
+    def _check_version(self, index_version: str):
+        """FAISS index'i değiştiyse tüm kayıtları sil (kilit altında çağrılır)"""
+        if self.index_version != index_version:
+            if self.entries:
+                self.invalidations += 1
+            self._clear()
+            self.index_version = index_version
+
+    def _clear(self):
+        """Tüm kayıtları sil (kilit altında çağrılır)"""
+        self.index.reset()
+        self.entries.clear()
+
+    def _remove(self, entry_ids: Iterable[int]):
+        """Kayıtları index'ten ve sözlükten sil (kilit altında çağrılır)"""
+        entry_ids = np.asarray(list(entry_ids), dtype='int64')
+        if len(entry_ids):
+            self.index.remove_ids(entry_ids)
+            for entry_id in entry_ids.tolist():
+                self.entries.pop(entry_id, None)
+
+    def lookup(self, query_embedding: np.ndarray, chunk_ids: Iterable[int],
+               index_version: str) -> Optional[Dict]:
+        """
+        Benzer bir soru aynı chunk'larla daha önce yanıtlandıysa kaydı döndür
+
+        Args:
+            query_embedding: Yeni sorgunun embedding'i
+            chunk_ids: Yeni sorgu için getirilen chunk id'leri
+            index_version: FAISS index'inin güncel sürümü
+
+        Returns:
+            {"query", "result", "similarity", ...} kaydı veya None
+        """
+        chunk_ids = frozenset(int(chunk_id) for chunk_id in chunk_ids)
+        vector = self._normalize(query_embedding)
+
+        with self._lock:
+            self._check_version(index_version)
+            self.lookups += 1
+            if not self.entries:
+                return None
+
+            similarities, entry_ids = self.index.search(vector, min(LOOKUP_NEIGHBORS, len(self.entries)))
+            now = time.time()
+            stale = []
+            found = None
+
+            for similarity, entry_id in zip(similarities[0], entry_ids[0]):
+                if entry_id < 0 or similarity < self.threshold:
+                    break
+                entry = self.entries[int(entry_id)]
+                if now - entry["created"] > self.ttl_seconds:
+                    stale.append(int(entry_id))
+                    continue
+                if entry["chunk_ids"] == chunk_ids:
+                    found = dict(entry, similarity=float(similarity))
+                    entry["hits"] += 1
+                    break
+
+            if stale:
+                self.expired += len(stale)
+                self._remove(stale)
+            if found is not None:
+                self.hits += 1
+            return found
+
+    def store(self, query_embedding: np.ndarray, query: str, result: Dict,
+              chunk_ids: Iterable[int], index_version: str):
+        """
+        Yanıtı önbelleğe ekle
+
+        Args:
+            query_embedding: Sorgunun embedding'i
+            query: Sorgu metni
+            result: RAGSystem.query sonucu
+            chunk_ids: Yanıt için kullanılan chunk id'leri
+            index_version: FAISS index'inin güncel sürümü
+        """
+        vector = self._normalize(query_embedding)
+
+        with self._lock:
+            self._check_version(index_version)
+
+            entry_id = self._next_id
+            self._next_id += 1
+            self.index.add_with_ids(vector, np.array([entry_id], dtype='int64'))
+            self.entries[entry_id] = {
+                "query": query,
+                "result": result,
+                "chunk_ids": frozenset(int(chunk_id) for chunk_id in chunk_ids),
+                "created": time.time(),
+                "hits": 0
+            }
+
+            # Boyut sınırı: en eski kayıtlar atılır
+            overflow = len(self.entries) - self.max_entries
+            if overflow > 0:
+                self.evictions += overflow
+                self._remove(list(self.entries)[:overflow])
+
+    def invalidate(self):
+        """Tüm kayıtları sil (örn. index dışarıdan yeniden oluşturulduğunda)"""
+        with self._lock:
+            if self.entries:
+                self.invalidations += 1
+            self._clear()
+
+    def get_stats(self) -> Dict:
+        """
+        Önbellek istatistiklerini döndür
+
+        Returns:
+            İstatistik dictionary
+        """
+        return {
+            "entries": len(self.entries),
+            "threshold": self.threshold,
+            "ttl_seconds": self.ttl_seconds,
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations
+        }
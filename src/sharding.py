@@ -0,0 +1,552 @@
+"""
+Sharding Modülü
+Korpusu bir metadata alanına göre (varsayılan: dönem) ayrı FAISS index'lerine böler
+ve aramaları shard'lar üzerinde paralel yürütür.
+
+Her shard kendi dizininde bağımsız bir FAISSRetriever'dır (index, chunk deposu,
+BM25, delta segmentler); tek bir shard diğerlerine dokunmadan yeniden oluşturulabilir.
+FAISS arama sırasında GIL'i bıraktığı için shard'lar thread havuzunda gerçekten
+eşzamanlı taranır; sonuçlar k-yollu birleştirme ile tek bir top-k listesine indirilir.
+
+Disk düzeni (index dizini altında):
+    shards.json            - Shard anahtarı ve shard listesi (değer -> dizin adı)
+    shards/<ad>/           - Bir shard'ın FAISSRetriever dizini
+
+Global satır id'si = (shard numarası << SHARD_ID_BITS) | shard içi satır id'si
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# src klasörünü path'e ekle
+sys.path.append(str(Path(__file__).parent))
+
+from retrieval import FAISSRetriever
+from index_builder import merge_topk, fill_min_k, DEFAULT_INDEX_FACTORY
+from turkish_text import turkish_lower
+
+
+SHARDS_MANIFEST = "shards.json"
+SHARDS_DIRNAME = "shards"
+SHARDS_STAGING_DIRNAME = "shards.staging"
+SHARDS_OLD_DIRNAME = "shards.old"
+DEFAULT_SHARD_KEY = "donem"
+
+# Global id'de shard içi satır id'sine ayrılan bit sayısı
+SHARD_ID_BITS = 40
+LOCAL_ID_MASK = (1 << SHARD_ID_BITS) - 1
+
+_NON_ALNUM_RE = re.compile(r'[^a-z0-9]+')
+
+
+def shard_dirname(value: Any) -> str:
+    """
+    Shard değerinden dosya sistemi için güvenli, benzersiz dizin adı üret
+    (örn: "Millî Mücadele Dönemi" -> "milli_mucadele_donemi-3f2a1c")
+
+    Args:
+        value: Shard anahtarının değeri
+
+    Returns:
+        Dizin adı
+    """
+    text = unicodedata.normalize("NFKD", turkish_lower(str(value)).replace("ı", "i"))
+    slug = _NON_ALNUM_RE.sub("_", text.encode("ascii", "ignore").decode("ascii")).strip("_") or "bos"
+    digest = hashlib.blake2b(json.dumps(value, ensure_ascii=False).encode("utf-8"), digest_size=3).hexdigest()
+    return f"{slug[:48]}-{digest}"
+
+
+def encode_ids(shard_no: int, local_ids: np.ndarray) -> np.ndarray:
+    """Shard içi id'leri global id'ye çevir (eksik sonuçlar -1 kalır)"""
+    local_ids = np.asarray(local_ids, dtype='int64')
+    return np.where(local_ids >= 0, (shard_no << SHARD_ID_BITS) | local_ids, -1)
+
+
+def decode_id(global_id: int) -> Tuple[int, int]:
+    """Global id'yi (shard numarası, shard içi id) çiftine çevir"""
+    return int(global_id) >> SHARD_ID_BITS, int(global_id) & LOCAL_ID_MASK
+
+
+class ShardedChunkView:
+    """Shard'ların chunk depolarına global id ile erişim (RAGSystem.chunks uyumluluğu için)"""
+
+    def __init__(self, sharded: "ShardedRetriever"):
+        self._sharded = sharded
+
+    def __len__(self) -> int:
+        return sum(len(shard.chunk_list) for shard in self._sharded.shards)
+
+    def __getitem__(self, global_id: int) -> Dict:
+        shard_no, local_id = decode_id(global_id)
+        return self._sharded.shards[shard_no].chunk_list[local_id]
+
+    def get_text(self, global_id: int) -> str:
+        shard_no, local_id = decode_id(global_id)
+        return self._sharded.shards[shard_no].chunk_list.get_text(local_id)
+
+
+class ShardedRetriever:
+    """Metadata alanına göre shard'lanmış, paralel arama yapan retriever"""
+
+    def __init__(self, index_path: str = "models/faiss_index", dimension: int = 384,
+                 use_mmap: bool = False, shard_key: str = DEFAULT_SHARD_KEY,
+                 max_workers: int = None):
+        """
+        Args:
+            index_path: Shard'ların üst dizini
+            dimension: Embedding vektör boyutu
+            use_mmap: Shard index'lerini salt-okunur mmap ile yükle
+            shard_key: Shard'lamada kullanılan metadata alanı (mevcut bir index yüklenirse
+                       manifestteki değer kullanılır)
+            max_workers: Paralel arama thread sayısı (None: shard sayısı, en fazla 32)
+        """
+        self.index_path = Path(index_path)
+        self.dimension = dimension
+        self.use_mmap = use_mmap
+        self.shard_key = shard_key
+        self.max_workers = max_workers
+
+        # Manifest sırası shard numarasını (global id'nin üst bitleri) belirler
+        self.shard_values: List[Any] = []
+        self.shard_names: List[str] = []
+        self.shards: List[FAISSRetriever] = []
+        self.chunk_list = ShardedChunkView(self)
+        self._executor = None
+        self.load_timings: Dict[str, float] = {}
+
+        if self.exists(self.index_path):
+            self.load_index()
+
+    # ==================== OLUŞTURMA / YÜKLEME ====================
+
+    @staticmethod
+    def exists(index_dir: str) -> bool:
+        """Verilen dizinde shard'lanmış index var mı?"""
+        return (Path(index_dir) / SHARDS_MANIFEST).exists()
+
+    def load_index(self):
+        """Manifesti ve tüm shard'ları yükle"""
+        with open(self.index_path / SHARDS_MANIFEST, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+
+        self.shard_key = manifest["shard_key"]
+        self.shard_values = [shard["value"] for shard in manifest["shards"]]
+        self.shard_names = [shard["name"] for shard in manifest["shards"]]
+        self.shards = [self._open_shard(name) for name in self.shard_names]
+        self._executor = None
+
+        # Soğuk başlangıç raporu için shard'ların aşama sürelerini topla
+        self.load_timings = {}
+        for shard in self.shards:
+            for phase, elapsed in shard.load_timings.items():
+                self.load_timings[phase] = self.load_timings.get(phase, 0.0) + elapsed
+
+        print(f"📂 {len(self.shards)} shard yüklendi ({self.shard_key}): "
+              f"{sum(shard.total_vectors for shard in self.shards)} vektör")
+
+    def _open_shard(self, name: str) -> FAISSRetriever:
+        """Bir shard dizinini FAISSRetriever olarak aç"""
+        return FAISSRetriever(index_path=self.index_path / SHARDS_DIRNAME / name,
+                              dimension=self.dimension, use_mmap=self.use_mmap)
+
+    def _save_manifest(self):
+        """Manifesti atomik olarak yaz"""
+        self.index_path.mkdir(parents=True, exist_ok=True)
+        manifest_file = self.index_path / SHARDS_MANIFEST
+        tmp_file = manifest_file.with_name(SHARDS_MANIFEST + ".tmp")
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({
+                "shard_key": self.shard_key,
+                "shards": [
+                    {"value": value, "name": name, "count": shard.total_vectors}
+                    for value, name, shard in zip(self.shard_values, self.shard_names, self.shards)
+                ]
+            }, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_file, manifest_file)
+
+    def _group_rows(self, metadata: List[Dict]) -> Dict[Any, List[int]]:
+        """Satırları shard anahtarının değerine göre grupla (ilk görülme sırasıyla)"""
+        groups: Dict[Any, List[int]] = {}
+        for row, chunk in enumerate(metadata):
+            value = chunk.get("metadata", {}).get(self.shard_key, "")
+            groups.setdefault(value, []).append(row)
+        return groups
+
+    def create_index(self, embeddings: np.ndarray, metadata: List[Dict],
+                     index_factory: str = DEFAULT_INDEX_FACTORY,
+                     quantization: str = None,
+                     rescore: bool = False,
+                     nprobe: int = None,
+                     ef_search: int = None,
+                     keyword_stemming: bool = False):
+        """
+        Tüm korpustan shard'ları oluştur ve kaydet
+
+        Args:
+            embeddings: Embedding vektörleri matrisi (n_docs x dimension)
+            metadata: Her embedding için chunk kaydı ({"content", "metadata"})
+            index_factory: Her shard için FAISS index tipi
+            quantization: Sıkıştırılmış depolama modu
+            rescore: Üst adayları tam float vektörlerle yeniden skorla
+            nprobe: IVF shard'ları için taranacak küme sayısı (None: otomatik)
+            ef_search: HNSW shard'ları için arama derinliği (None: otomatik)
+            keyword_stemming: BM25 keyword index'lerinde Türkçe hafif kök bulma kullan
+
+
+        Shard'lar önce shards.staging/ altına yazılır, sonra shards/ dizininin yerine
+        geçer; böylece korpustan kaybolan anahtar değerlerinin eski shard'ları kalmaz.
+        """
+        groups = self._group_rows(metadata)
+        print(f"🔧 {len(groups)} shard oluşturuluyor ({self.shard_key})...")
+
+        staging_dir = self.index_path / SHARDS_STAGING_DIRNAME
+        if staging_dir.exists():
+            shutil.rmtree(staging_dir)
+
+        names = []
+        for value, rows in groups.items():
+            name = shard_dirname(value)
+            self._create_shard(staging_dir / name, embeddings[rows], [metadata[row] for row in rows],
+                               index_factory=index_factory, quantization=quantization,
+                               rescore=rescore, nprobe=nprobe, ef_search=ef_search,
+                               keyword_stemming=keyword_stemming)
+            names.append(name)
+
+        # Eski shard'ların arka plan birleştirmeleri dizin değişiminden önce bitsin
+        self.wait_for_compaction()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+        shards_dir = self.index_path / SHARDS_DIRNAME
+        old_dir = self.index_path / SHARDS_OLD_DIRNAME
+        if old_dir.exists():
+            shutil.rmtree(old_dir)
+        if shards_dir.exists():
+            os.replace(shards_dir, old_dir)
+        os.replace(staging_dir, shards_dir)
+
+        # Manifest sadece az önce oluşturulan shard'ları listeler
+        self.shard_values = list(groups)
+        self.shard_names = names
+        self.shards = [self._open_shard(name) for name in names]
+        self._save_manifest()
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+        print(f"✅ {len(self.shards)} shard oluşturuldu")
+
+    def _create_shard(self, shard_dir: Path, embeddings: np.ndarray, metadata: List[Dict],
+                      **index_params) -> FAISSRetriever:
+        """Shard index'ini (diskteki eski shard'ı yüklemeden) baştan oluştur ve kaydet"""
+        shard = FAISSRetriever(index_path=shard_dir, dimension=self.dimension,
+                               use_mmap=self.use_mmap, load=False)
+        shard.create_index(embeddings, metadata, **index_params)
+        shard.save_index()
+        return shard
+
+    def build_shard(self, value: Any, embeddings: np.ndarray, metadata: List[Dict],
+                    index_factory: str = DEFAULT_INDEX_FACTORY,
+                    quantization: str = None,
+                    rescore: bool = False,
+                    nprobe: int = None,
+                    ef_search: int = None,
+                    keyword_stemming: bool = False,
+                    save_manifest: bool = True):
+        """
+        Tek bir shard'ı (diğerlerine dokunmadan) oluştur veya yeniden oluştur
+
+        Args:
+            value: Shard anahtarının değeri (örn: "Osmanlı Devleti")
+            embeddings: Bu shard'ın embedding vektörleri
+            metadata: Bu shard'ın chunk kayıtları
+            index_factory: FAISS index tipi
+            quantization: Sıkıştırılmış depolama modu
+            rescore: Üst adayları tam float vektörlerle yeniden skorla
+            nprobe: IVF index'leri için taranacak küme sayısı (None: otomatik)
+            ef_search: HNSW index'leri için arama derinliği (None: otomatik)
+            keyword_stemming: BM25 keyword index'inde Türkçe hafif kök bulma kullan
+            save_manifest: Manifesti güncelle
+        """
+        if value in self.shard_values:
+            shard_no = self.shard_values.index(value)
+            name = self.shard_names[shard_no]
+            # Eski shard'ın arka plan birleştirmesi yeni dosyaların üzerine yazmasın
+            self.shards[shard_no].wait_for_compaction()
+        else:
+            shard_no = None
+            name = shard_dirname(value)
+
+        shard = self._create_shard(self.index_path / SHARDS_DIRNAME / name, embeddings, metadata,
+                                   index_factory=index_factory, quantization=quantization,
+                                   rescore=rescore, nprobe=nprobe, ef_search=ef_search,
+                                   keyword_stemming=keyword_stemming)
+
+        # mmap modunda kaydedilen index'i dosyadan yeniden aç
+        if self.use_mmap:
+            shard = self._open_shard(name)
+
+        if shard_no is None:
+            self.shard_values.append(value)
+            self.shard_names.append(name)
+            self.shards.append(shard)
+        else:
+            self.shards[shard_no] = shard
+
+        if save_manifest:
+            self._save_manifest()
+
+        print(f"✅ Shard hazır: {value!r} -> {name} ({shard.total_vectors} vektör)")
+
+    # ==================== ARAMA ====================
+
+    def _select_shards(self, filters: Dict = None) -> Tuple[List[int], Optional[Dict]]:
+        """
+        Filtrelere göre taranacak shard'ları seç. Shard anahtarı üzerindeki eşitlik /
+        liste filtresi shard seçimine çevrilir ve shard'lara iletilmez.
+
+        Returns:
+            (shard numaraları, shard'lara iletilecek filtreler)
+        """
+        all_shards = list(range(len(self.shards)))
+        if not filters or filters.get(self.shard_key) is None:
+            return all_shards, filters
+
+        spec = filters[self.shard_key]
+        if isinstance(spec, tuple):
+            return all_shards, filters
+
+        wanted = spec if isinstance(spec, (list, set, frozenset)) else [spec]
+        selected = [no for no, value in enumerate(self.shard_values) if value in wanted]
+        rest = {name: value for name, value in filters.items() if name != self.shard_key}
+
+        return selected, rest or None
+
+    def _pool(self) -> ThreadPoolExecutor:
+        """Shard aramaları için thread havuzu (ilk kullanımda oluşturulur)"""
+        if self._executor is None:
+            workers = self.max_workers or min(32, max(1, len(self.shards)))
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="shard-search")
+        return self._executor
+
+    def search_batch(self, query_embeddings: np.ndarray, top_k: int = 5,
+                     filters: Dict = None, threshold: float = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Seçilen shard'larda paralel arama yap ve sonuçları birleştir
+
+        Args:
+            query_embeddings: Query embedding matrisi (n_queries x dimension)
+            top_k: Her query için döndürülecek sonuç sayısı
+            filters: Metadata filtreleri (opsiyonel); shard anahtarı üzerindeki
+                     filtre sadece ilgili shard'ların taranmasını sağlar
+            threshold: Verilirse shard'larda range search yapılır (top_k üst sınırdır)
+
+        Returns:
+            (similarities, global_ids) tuple'ı, ikisi de (n_queries x top_k) boyutunda
+        """
+        query_embeddings = np.asarray(query_embeddings, dtype='float32')
+        query_embeddings = query_embeddings.reshape(len(query_embeddings), -1)
+
+        selected, shard_filters = self._select_shards(filters)
+        if not selected:
+            return (np.full((len(query_embeddings), top_k), -np.inf, dtype='float32'),
+                    np.full((len(query_embeddings), top_k), -1, dtype='int64'))
+
+        def search_shard(shard_no: int):
+            similarities, indices = self.shards[shard_no].search_batch(
+                query_embeddings, top_k, filters=shard_filters, threshold=threshold
+            )
+            return similarities, encode_ids(shard_no, indices)
+
+        if len(selected) == 1:
+            results = [search_shard(selected[0])]
+        else:
+            results = list(self._pool().map(search_shard, selected))
+
+        return merge_topk(results, top_k)
+
+    def range_search_batch(self, query_embeddings: np.ndarray, threshold: float,
+                           max_k: int = 20, min_k: int = 1,
+                           filters: Dict = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Shard'larda eşik tabanlı arama (FAISSRetriever.range_search_batch ile aynı arayüz)"""
+        query_embeddings = np.asarray(query_embeddings, dtype='float32')
+        query_embeddings = query_embeddings.reshape(len(query_embeddings), -1)
+
+        similarities, indices = self.search_batch(query_embeddings, max_k, filters=filters, threshold=threshold)
+        return fill_min_k(similarities, indices, min_k,
+                          lambda rows: self.search_batch(query_embeddings[rows], min(min_k, max_k), filters=filters))
+
+    def search(self, query_embedding: np.ndarray, top_k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """Tek query için arama (FAISSRetriever.search ile aynı arayüz)"""
+        similarities, indices = self.search_batch(query_embedding.reshape(1, -1), top_k)
+        return similarities[0], indices[0]
+
+    def retrieve(self, query_embedding: np.ndarray, top_k: int = 5,
+                 threshold: float = None, filters: Dict = None) -> List[Dict]:
+        """Tek query için alakalı dokümanları al (FAISSRetriever.retrieve ile aynı arayüz)"""
+        return self.retrieve_batch(query_embedding.reshape(1, -1), top_k=top_k,
+                                   threshold=threshold, filters=filters)[0]
+
+    def retrieve_batch(self, query_embeddings: np.ndarray, top_k: int = 5,
+                       threshold: float = None, filters: Dict = None,
+                       min_k: int = None) -> List[List[Dict]]:
+        """
+        Birden fazla query için alakalı dokümanları al
+
+        Args:
+            query_embeddings: Query embedding matrisi (n_queries x dimension)
+            top_k: Her query için döndürülecek sonuç sayısı
+            threshold: Minimum benzerlik eşiği (opsiyonel)
+            filters: Metadata filtreleri (opsiyonel)
+            min_k: Verilirse range search modu (bkz. FAISSRetriever.retrieve_batch)
+
+        Returns:
+            Her query için sonuç listesi; sonuçlarda "shard" alanı da bulunur
+        """
+        if min_k is not None and threshold is not None:
+            similarities, indices = self.range_search_batch(query_embeddings, threshold, max_k=top_k,
+                                                            min_k=min_k, filters=filters)
+            threshold = None
+        else:
+            similarities, indices = self.search_batch(query_embeddings, top_k, filters=filters)
+
+        valid = indices >= 0
+        if threshold is not None:
+            valid &= similarities >= threshold
+
+        all_results = []
+        for row_similarities, row_indices, row_valid in zip(similarities, indices, valid):
+            results = []
+            for similarity_score, global_id in zip(row_similarities[row_valid], row_indices[row_valid]):
+                results.append(self._build_result(int(global_id), float(similarity_score)))
+            all_results.append(results)
+
+        return all_results
+
+    def _build_result(self, global_id: int, similarity_score: float) -> Dict:
+        """Global id'li sonucu ilgili shard'ın metadata'sıyla formatla"""
+        shard_no, local_id = decode_id(global_id)
+        result = self.shards[shard_no]._build_result(local_id, similarity_score)
+        result["index"] = global_id
+        result["shard"] = self.shard_values[shard_no]
+        return result
+
+    def get_vectors(self, ids: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Global id'lerin vektörlerini döndür
+
+        Args:
+            ids: Global satır id'leri
+
+        Returns:
+            (len(ids) x dimension) matris; vektörler elde edilemiyorsa None
+        """
+        ids = np.asarray(ids, dtype='int64')
+        shard_nos = ids >> SHARD_ID_BITS
+        vectors = np.empty((len(ids), self.dimension), dtype='float32')
+
+        for shard_no in np.unique(shard_nos):
+            rows = shard_nos == shard_no
+            shard_vectors = self.shards[int(shard_no)].get_vectors(ids[rows] & LOCAL_ID_MASK)
+            if shard_vectors is None:
+                return None
+            vectors[rows] = shard_vectors
+
+        return vectors
+
+    # ==================== GÜNCELLEME ====================
+
+    def add_vectors(self, new_embeddings: np.ndarray, new_metadata: List[Dict]):
+        """
+        Yeni vektörleri ilgili shard'ların delta segmentlerine ekle
+        (yeni bir shard değeri görülürse o değer için shard oluşturulur)
+
+        Args:
+            new_embeddings: Yeni embedding vektörleri
+            new_metadata: Yeni chunk kayıtları (shard anahtarını içermeli)
+        """
+        for value, rows in self._group_rows(new_metadata).items():
+            embeddings = new_embeddings[rows]
+            metadata = [new_metadata[row] for row in rows]
+
+            if value in self.shard_values:
+                self.shards[self.shard_values.index(value)].add_vectors(embeddings, metadata)
+            else:
+                self.build_shard(value, embeddings, metadata)
+
+    def upsert_records(self, chunks: List[Dict], embeddings: np.ndarray) -> Dict:
+        """
+        Kayıtları ilgili shard'larda ekle veya güncelle. Kaydın dönemi değiştiyse
+        eski shard'daki chunk'ları da silinir.
+
+        Args:
+            chunks: {"content", "metadata"} formatında chunk listesi
+            embeddings: Chunk'ların embedding vektörleri
+
+        Returns:
+            {"deleted", "added"} sayıları
+        """
+        groups = self._group_rows(chunks)
+        record_ids = {chunk["metadata"]["id"] for chunk in chunks}
+        totals = {"deleted": 0, "added": 0}
+
+        for value, rows in groups.items():
+            shard_chunks = [chunks[row] for row in rows]
+            if value in self.shard_values:
+                result = self.shards[self.shard_values.index(value)].upsert_records(shard_chunks, embeddings[rows])
+                totals["deleted"] += result["deleted"]
+                totals["added"] += result["added"]
+            else:
+                self.build_shard(value, embeddings[rows], shard_chunks)
+                totals["added"] += len(rows)
+
+        # Başka shard'a taşınan kayıtların eski chunk'ları
+        for value, shard in zip(self.shard_values, self.shards):
+            if value not in groups:
+                totals["deleted"] += shard.delete_records(list(record_ids))
+
+        return totals
+
+    def delete_records(self, record_ids: List) -> int:
+        """Kayıtları tüm shard'lardan sil; silinen chunk sayısını döndür"""
+        return sum(shard.delete_records(record_ids) for shard in self.shards)
+
+    def wait_for_compaction(self):
+        """Tüm shard'lardaki arka plan sıkıştırmalarını bekle"""
+        for shard in self.shards:
+            shard.wait_for_compaction()
+
+    @property
+    def index_version(self) -> str:
+        """Shard'ların index sürümlerinden türetilen sürüm (bkz. FAISSRetriever.index_version)"""
+        versions = ",".join(f"{value}={shard.index_version}" for value, shard in zip(self.shard_values, self.shards))
+        return hashlib.blake2b(versions.encode('utf-8'), digest_size=8).hexdigest()
+
+    def get_stats(self) -> Dict:
+        """
+        Shard istatistiklerini döndür
+
+        Returns:
+            İstatistik dictionary
+        """
+        shard_stats = {
+            str(value): shard.get_stats()
+            for value, shard in zip(self.shard_values, self.shards)
+        }
+        return {
+            "shard_key": self.shard_key,
+            "num_shards": len(self.shards),
+            "total_vectors": sum(stats["total_vectors"] for stats in shard_stats.values()),
+            "dimension": self.dimension,
+            "metadata_count": len(self.chunk_list),
+            "shards": shard_stats
+        }
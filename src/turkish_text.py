@@ -0,0 +1,136 @@
+"""
+Türkçe Metin Normalizasyonu Modülü
+Türkçe'ye uygun küçük harf dönüşümü, kesme işareti eki temizleme ve
+hafif kök bulma (light stemming) ile tokenizasyon
+
+Python'un str.lower() fonksiyonu Türkçe için yanlış sonuç verir:
+"İ".lower() -> "i̇" (i + birleşik nokta), "I".lower() -> "i" (doğrusu "ı").
+Bu modül keyword index'i (BM25) ve ingest pipeline'ı tarafından ortak kullanılır;
+böylece index ve sorgular aynı şekilde normalize edilir.
+"""
+
+import re
+import unicodedata
+from functools import lru_cache
+from typing import List, Tuple
+
+
+# Tokenizer davranışı değiştiğinde artırılır; eski BM25 index'leri yeniden oluşturulur
+TOKENIZER_VERSION = "tr-2"
+
+# Türkçe büyük/küçük harf eşlemesi (str.lower()'dan önce uygulanır)
+_TURKISH_UPPER_MAP = str.maketrans({"I": "ı", "İ": "i"})
+
+# Şapkalı harfler (millî, kâtip, hükûmet) ve birleşik nokta (U+0307)
+_CIRCUMFLEX_MAP = str.maketrans({"â": "a", "î": "i", "û": "u", "̇": None})
+
+# Kesme işaretinden sonraki ekler: İstanbul'un -> İstanbul, Atatürk’ün -> Atatürk
+_APOSTROPHE_SUFFIX_RE = re.compile(r"(?<=\w)['’‘`ʼ]\w*")
+
+_WORD_RE = re.compile(r"\w+")
+
+# Hafif kök bulma için çekim ekleri (uzundan kısaya, ilk eşleşen atılır)
+_INFLECTION_SUFFIXES: Tuple[str, ...] = tuple(sorted({
+    "lerinden", "larından", "lerinde", "larında", "lerine", "larına",
+    "lerini", "larını", "lerin", "ların", "leri", "ları", "ler", "lar",
+    "ndan", "nden", "nın", "nin", "nun", "nün",
+    "dan", "den", "tan", "ten", "da", "de", "ta", "te",
+    "ın", "in", "un", "ün", "yı", "yi", "yu", "yü", "ya", "ye",
+}, key=len, reverse=True))
+
+MIN_STEM_LENGTH = 3
+
+# Kelime bazlı normalizasyon önbelleği: Türkçe metinlerde farklı kelime biçimi
+# sayısı sınırlı olduğundan her biçim korpus boyunca bir kez işlenir
+WORD_CACHE_SIZE = 200_000
+QUERY_CACHE_SIZE = 4096
+
+
+def turkish_lower(text: str) -> str:
+    """
+    Türkçe kurallarıyla küçük harfe çevir (İ -> i, I -> ı, â -> a)
+
+    Args:
+        text: Metin
+
+    Returns:
+        Küçük harfli metin
+    """
+    text = unicodedata.normalize("NFC", text)
+    return text.translate(_TURKISH_UPPER_MAP).lower().translate(_CIRCUMFLEX_MAP)
+
+
+def strip_apostrophe_suffixes(text: str) -> str:
+    """
+    Özel isimlere kesme işaretiyle eklenen ekleri at ("İstanbul'un" -> "İstanbul")
+
+    Args:
+        text: Metin
+
+    Returns:
+        Eksiz metin
+    """
+    return _APOSTROPHE_SUFFIX_RE.sub("", text)
+
+
+def light_stem(token: str) -> str:
+    """
+    Yaygın çoğul ve hal eklerini at (örn: "osmanlıların" -> "osmanlı").
+    Tam bir morfolojik çözümleyici değildir; kök en az MIN_STEM_LENGTH karakter kalır.
+
+    Args:
+        token: Küçük harfli kelime
+
+    Returns:
+        Kök
+    """
+    for suffix in _INFLECTION_SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= MIN_STEM_LENGTH:
+            return token[:-len(suffix)]
+    return token
+
+
+@lru_cache(maxsize=WORD_CACHE_SIZE)
+def normalize_word(word: str, stem: bool = False) -> str:
+    """
+    Tek bir kelimeyi normalize et (önbellekli)
+
+    Args:
+        word: Kelime (orijinal harflerle)
+        stem: Hafif kök bulma uygulansın mı
+
+    Returns:
+        Normalize edilmiş token
+    """
+    token = turkish_lower(word)
+    return light_stem(token) if stem else token
+
+
+def tokenize(text: str, stem: bool = False) -> List[str]:
+    """
+    Metni Türkçe'ye uygun şekilde token'lara ayır
+
+    Args:
+        text: Metin
+        stem: Hafif kök bulma uygulansın mı
+
+    Returns:
+        Token listesi
+    """
+    words = _WORD_RE.findall(strip_apostrophe_suffixes(text))
+    return [normalize_word(word, stem) for word in words]
+
+
+@lru_cache(maxsize=QUERY_CACHE_SIZE)
+def tokenize_query(query: str, stem: bool = False) -> Tuple[str, ...]:
+    """
+    Sorgu metnini token'lara ayır (tekrarlayan sorgular için önbellekli)
+
+    Args:
+        query: Sorgu metni
+        stem: Hafif kök bulma uygulansın mı
+
+    Returns:
+        Token tuple'ı
+    """
+    return tuple(tokenize(query, stem))
@@ -12,6 +12,14 @@ from datetime import datetime
 import re
 
 
+# Metin işleme regex'leri (modül yüklenirken bir kez derlenir)
+_WHITESPACE_RE = re.compile(r'\s+')
+# Kesme işaretleri korunur: BM25 tokenizer'ı "İstanbul'un" gibi özel isim eklerini
+# kesme işaretinden ayırır (silinirse "istanbulun" olarak index'lenir)
+_SPECIAL_CHARS_RE = re.compile(r"[^\w\sğüşıöçĞÜŞİÖÇ.,!?():;/'’‘ʼ-]")
+_SENTENCE_SPLIT_RE = re.compile(r'[.!?]+')
+
+
 # ==================== DİZİN İŞLEMLERİ ====================
 
 def ensure_dir(directory: str) -> Path:
@@ -87,10 +95,10 @@ def clean_text(text: str) -> str:
         Temizlenmiş metin
     """
     # Fazla boşlukları temizle
-    text = re.sub(r'\s+', ' ', text)
+    text = _WHITESPACE_RE.sub(' ', text)
     
     # Özel karakterleri temizle (Türkçe karakterleri koru)
-    text = re.sub(r'[^\w\sğüşıöçĞÜŞİÖÇ.,!?():;/-]', '', text)
+    text = _SPECIAL_CHARS_RE.sub('', text)
     
     # Baştan ve sondan boşlukları kaldır
     text = text.strip()
@@ -140,7 +148,7 @@ def extract_sentences(text: str) -> List[str]:
         Cümle listesi
     """
     # Basit cümle ayırma (nokta, ünlem, soru işareti)
-    sentences = re.split(r'[.!?]+', text)
+    sentences = _SENTENCE_SPLIT_RE.split(text)
     
     # Boş cümleleri temizle
     sentences = [s.strip() for s in sentences if s.strip()]
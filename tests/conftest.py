@@ -0,0 +1,28 @@
+"""
+Ortak fixture'lar. src/ modülleri kardeş import'larıyla (from retrieval import ...)
+çalıştığı için src/ sys.path'e eklenir. Testler sentetik vektörler kullanır;
+ağ, embedding modeli veya Gemini gerekmez.
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from retrieval import FAISSRetriever  # noqa: E402
+from tests.helpers import make_chunks  # noqa: E402
+
+
+@pytest.fixture
+def make_retriever(tmp_path):
+    """Sentetik vektörlerle FAISSRetriever oluşturan fabrika (index tmp_path/index altında)"""
+    def _make(vectors: np.ndarray, chunks=None, **create_kwargs) -> FAISSRetriever:
+        retriever = FAISSRetriever(index_path=tmp_path / "index", dimension=vectors.shape[1],
+                                   auto_compact=False, load=False)
+        retriever.create_index(vectors, chunks if chunks is not None else make_chunks(len(vectors)),
+                               **create_kwargs)
+        return retriever
+    return _make
@@ -0,0 +1,27 @@
+"""Testlerde kullanılan sentetik veri üreticileri"""
+
+import numpy as np
+
+DIMENSION = 16
+PERIODS = ("İslamiyet Öncesi", "Osmanlı Devleti", "Cumhuriyet Dönemi")
+
+
+def unit_vectors(n: int, dimension: int = DIMENSION, seed: int = 0) -> np.ndarray:
+    """L2-normalize edilmiş rastgele vektörler"""
+    vectors = np.random.default_rng(seed).standard_normal((n, dimension)).astype('float32')
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def make_chunks(n: int, chunks_per_record: int = 1, start: int = 0):
+    """Dönem / yıl / kayıt id'si olan sentetik chunk'lar"""
+    return [
+        {
+            "content": f"kayıt {i // chunks_per_record} parça {i}",
+            "metadata": {
+                "id": f"r{i // chunks_per_record}",
+                "donem": PERIODS[i % len(PERIODS)],
+                "yil": 1000 + i
+            }
+        }
+        for i in range(start, start + n)
+    ]
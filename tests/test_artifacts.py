@@ -0,0 +1,79 @@
+"""Artefakt paketi: kurulum, doğrulama ve uzak manifestteki güvensiz yolların reddi"""
+
+import json
+import os
+
+import pytest
+
+from artifacts import (ArtifactError, ArtifactStore, INDEX_SUBDIR, MANIFEST_FILE, build_manifest,
+                       safe_join)
+
+
+@pytest.fixture
+def mirror(tmp_path):
+    """İki dosyalı küçük bir paket aynası"""
+    mirror = tmp_path / "mirror"
+    (mirror / INDEX_SUBDIR).mkdir(parents=True)
+    (mirror / INDEX_SUBDIR / "index.faiss").write_bytes(b"faiss" * 100)
+    (mirror / INDEX_SUBDIR / "stats.json").write_text(json.dumps({"dimension": 16}))
+    build_manifest(mirror, "1")
+    return mirror
+
+
+def rewrite_manifest(mirror, **changes):
+    manifest = json.loads((mirror / MANIFEST_FILE).read_text())
+    manifest.update(changes)
+    (mirror / MANIFEST_FILE).write_text(json.dumps(manifest))
+    return manifest
+
+
+def test_install_verifies_and_reinstall_repairs(mirror, tmp_path):
+    store = ArtifactStore(root=tmp_path / "inst", mirror=str(mirror))
+    bundle = store.ensure()
+    assert store.verify(store.current(), bundle, full=True) == []
+
+    # Aynı boyutta bozulma: ilk etkinleştirmede tam hash kontrolüyle yakalanır
+    damaged = bundle / INDEX_SUBDIR / "index.faiss"
+    damaged.write_bytes(b"FAISS" * 100)
+    store.ensure()
+    assert damaged.read_bytes() == b"faiss" * 100
+
+
+@pytest.mark.parametrize("bad_path", ["../escape.bin", "faiss_index/../../escape.bin", "/tmp/escape.bin",
+                                      "C:/escape.bin", "faiss_index\\..\\..\\escape.bin", "", "./x"])
+def test_manifest_paths_outside_bundle_are_rejected(mirror, tmp_path, bad_path):
+    files = json.loads((mirror / MANIFEST_FILE).read_text())["files"]
+    rewrite_manifest(mirror, files=files + [dict(files[0], path=bad_path)])
+    store = ArtifactStore(root=tmp_path / "inst", mirror=str(mirror))
+
+    with pytest.raises(ArtifactError):
+        store.ensure()
+    assert not (tmp_path / "escape.bin").exists()
+    assert not (tmp_path / "inst").exists() or not any((tmp_path / "inst").iterdir())
+
+
+@pytest.mark.parametrize("bad_version", ["../evil", "a/b", ".hidden", "work", ""])
+def test_unsafe_versions_are_rejected(mirror, tmp_path, bad_version):
+    rewrite_manifest(mirror, version=bad_version)
+
+    with pytest.raises(ArtifactError):
+        ArtifactStore(root=tmp_path / "inst", mirror=str(mirror)).ensure()
+    assert not (tmp_path / "evil").exists()
+
+
+def test_current_pointer_outside_root_is_rejected(mirror, tmp_path):
+    store = ArtifactStore(root=tmp_path / "inst", mirror=str(mirror))
+    store.ensure()
+    (tmp_path / "inst" / "current.json").write_text(json.dumps({"version": "1", "path": "../mirror"}))
+
+    with pytest.raises(ArtifactError):
+        store.current()
+
+
+def test_safe_join_rejects_symlink_escape(tmp_path):
+    (tmp_path / "base").mkdir()
+    os.symlink(tmp_path, tmp_path / "base" / "link")
+
+    assert safe_join(tmp_path / "base", "a/b.bin") == tmp_path / "base" / "a" / "b.bin"
+    with pytest.raises(ArtifactError):
+        safe_join(tmp_path / "base", "link/escape.bin")
@@ -0,0 +1,70 @@
+"""Metadata filtrelerinin FAISS aramasına (IDSelector / dar filtrede tam arama) iletilmesi"""
+
+import numpy as np
+import pytest
+
+import retrieval
+from tests.helpers import PERIODS, make_chunks, unit_vectors
+
+
+def brute_force(vectors, query, allowed, top_k):
+    """Filtreye uyan satırlar üzerinde referans tam arama"""
+    rows = np.flatnonzero(allowed)
+    scores = vectors[rows] @ query
+    return rows[np.argsort(-scores, kind='stable')[:top_k]]
+
+
+@pytest.mark.parametrize("exact_limit", [0, 10 ** 6], ids=["id-selector", "exact-search"])
+@pytest.mark.parametrize("factory", ["Flat", "HNSW8"])
+def test_filtered_search_returns_only_matching_rows(make_retriever, monkeypatch, exact_limit, factory):
+    # exact_limit=0: dar filtre yolu kapalı, maske IDSelectorBitmap ile FAISS'e gider
+    monkeypatch.setattr(retrieval, "FILTER_EXACT_SEARCH_LIMIT", exact_limit)
+    vectors = unit_vectors(300)
+    retriever = make_retriever(vectors, index_factory=factory)
+    query = unit_vectors(1, seed=1)
+
+    results = retriever.retrieve(query[0], top_k=10, filters={"donem": PERIODS[1]})
+
+    assert len(results) == 10
+    assert all(result["metadata"]["donem"] == PERIODS[1] for result in results)
+    if factory == "Flat":
+        allowed = np.arange(300) % len(PERIODS) == 1
+        assert [result["index"] for result in results] == brute_force(vectors, query[0], allowed, 10).tolist()
+
+
+def test_filter_does_not_lose_top_k_slots(make_retriever, monkeypatch):
+    # Filtre dışı ama sorguya çok yakın vektörler top-k slotlarını işgal etmemeli
+    monkeypatch.setattr(retrieval, "FILTER_EXACT_SEARCH_LIMIT", 0)
+    vectors = unit_vectors(300)
+    query = unit_vectors(1, seed=1)[0]
+    vectors[np.arange(300) % len(PERIODS) == 0] = query  # Hepsi filtre dışı kalacak
+    retriever = make_retriever(vectors)
+
+    results = retriever.retrieve(query, top_k=5, filters={"donem": [PERIODS[1], PERIODS[2]]})
+
+    assert len(results) == 5
+    assert all(result["metadata"]["donem"] != PERIODS[0] for result in results)
+
+
+def test_range_and_value_filters_combine(make_retriever, monkeypatch):
+    monkeypatch.setattr(retrieval, "FILTER_EXACT_SEARCH_LIMIT", 0)
+    retriever = make_retriever(unit_vectors(300))
+
+    results = retriever.retrieve(unit_vectors(1, seed=2)[0], top_k=50,
+                                 filters={"donem": PERIODS[2], "yil": (1100, 1130)})
+
+    expected = {i for i in range(100, 131) if i % len(PERIODS) == 2}
+    assert {result["index"] for result in results} == expected
+
+
+def test_filters_apply_to_delta_rows(make_retriever, monkeypatch):
+    monkeypatch.setattr(retrieval, "FILTER_EXACT_SEARCH_LIMIT", 0)
+    retriever = make_retriever(unit_vectors(30))
+    new_chunks = make_chunks(3, start=30)
+    query = unit_vectors(1, seed=3)[0]
+    retriever.add_vectors(np.repeat(query[None], 3, axis=0), new_chunks, persist=False)
+
+    results = retriever.retrieve(query, top_k=3, filters={"donem": new_chunks[0]["metadata"]["donem"]})
+
+    assert results[0]["index"] == 30
+    assert all(result["metadata"]["donem"] == new_chunks[0]["metadata"]["donem"] for result in results)
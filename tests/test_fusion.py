@@ -0,0 +1,69 @@
+"""Hybrid skor birleştirme: min-max / z-score normalizasyonu ve reciprocal rank fusion"""
+
+import numpy as np
+import pytest
+
+from retrieval import DEFAULT_RRF_K, HybridRetriever, fuse_scores, normalize_scores
+from tests.helpers import unit_vectors
+
+
+def test_minmax_normalization():
+    np.testing.assert_allclose(normalize_scores([2.0, 4.0, 3.0]), [0.0, 1.0, 0.5])
+    # Tüm skorlar eşitse sıfıra bölme yerine hepsi 1
+    np.testing.assert_allclose(normalize_scores([0.7, 0.7]), [1.0, 1.0])
+    assert len(normalize_scores([])) == 0
+
+
+def test_minmax_fusion_weighted_sum():
+    semantic = (np.array([1, 2, 3]), np.array([0.9, 0.5, 0.1]))
+    keyword = (np.array([3, 4]), np.array([10.0, 2.0]))
+
+    ids, scores = fuse_scores([semantic, keyword], [0.7, 0.3], top_k=4, method="minmax")
+
+    # Listede olmayan aday o listenin en düşük (normalize) skorunu alır
+    expected = {1: 0.7 * 1.0 + 0.3 * 0.0, 2: 0.7 * 0.5 + 0.3 * 0.0,
+                3: 0.7 * 0.0 + 0.3 * 1.0, 4: 0.7 * 0.0 + 0.3 * 0.0}
+    assert dict(zip(ids.tolist(), scores.tolist())) == pytest.approx(expected)
+    assert ids.tolist() == [1, 2, 3, 4]
+
+
+def test_rrf_fusion_uses_ranks_not_scores():
+    # Skor ölçekleri çok farklı olsa da RRF sadece sıraya bakar
+    semantic = (np.array([10, 20, 30]), np.array([0.99, 0.98, 0.97]))
+    keyword = (np.array([30, 10]), np.array([1000.0, 1.0]))
+
+    ids, scores = fuse_scores([semantic, keyword], [1.0, 1.0], top_k=3, method="rrf", rrf_k=DEFAULT_RRF_K)
+
+    k = DEFAULT_RRF_K
+    expected = {10: 1 / (k + 1) + 1 / (k + 2), 20: 1 / (k + 2), 30: 1 / (k + 3) + 1 / (k + 1)}
+    assert dict(zip(ids.tolist(), scores.tolist())) == pytest.approx(expected)
+    assert ids.tolist() == [10, 30, 20]
+
+
+def test_fusion_top_k_and_empty_lists():
+    ranked = (np.arange(50), np.linspace(1.0, 0.0, 50))
+    ids, scores = fuse_scores([ranked, (np.array([], dtype='int64'), np.array([]))], [0.5, 0.5],
+                              top_k=5, method="rrf")
+    assert ids.tolist() == [0, 1, 2, 3, 4]
+    assert np.all(np.diff(scores) <= 0)
+
+    ids, scores = fuse_scores([(np.array([]), np.array([]))] * 2, [0.5, 0.5], top_k=5)
+    assert len(ids) == 0 and len(scores) == 0
+
+    with pytest.raises(ValueError):
+        fuse_scores([ranked], [1.0], top_k=5, method="bilinmeyen")
+
+
+@pytest.mark.parametrize("fusion", ["minmax", "zscore", "rrf"])
+def test_hybrid_search_ranks_semantic_and_keyword_match_first(make_retriever, fusion):
+    vectors = unit_vectors(40)
+    chunks = [{"content": f"sıradan metin {i}", "metadata": {"donem": "x"}} for i in range(40)]
+    chunks[7]["content"] = "Malazgirt Meydan Muharebesi 1071"
+    retriever = make_retriever(vectors, chunks)
+    hybrid = HybridRetriever(retriever, alpha=0.5, fusion=fusion)
+
+    results = hybrid.hybrid_search(vectors[7], "Malazgirt muharebesi", top_k=3)
+
+    assert results[0]["index"] == 7
+    assert len(results) == 3
+    assert results[0]["hybrid_score"] >= results[1]["hybrid_score"] >= results[2]["hybrid_score"]
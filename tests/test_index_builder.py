@@ -0,0 +1,27 @@
+"""Index oluşturma: kayıplı index'lerde yeniden skorlama kararı"""
+
+import pytest
+
+from index_builder import build_index
+from tests.helpers import unit_vectors
+
+
+@pytest.mark.parametrize("factory, quantization, expected", [
+    ("IVF4,PQ4x4", None, True),
+    ("IVF4,SQ8", None, True),
+    ("HNSW16,PQ4x4", None, True),
+    ("Flat", "SQ8", True),
+    ("Flat", None, False),
+    ("IVF4,Flat", None, False),
+    ("HNSW16", None, False),
+])
+def test_rescore_follows_lossy_storage(factory, quantization, expected):
+    _, params = build_index(unit_vectors(300), factory=factory, quantization=quantization, rescore=True)
+
+    assert params["rescore"] is expected
+
+
+def test_rescore_stays_off_unless_requested():
+    _, params = build_index(unit_vectors(300), factory="IVF4,PQ4x4")
+
+    assert params["rescore"] is False
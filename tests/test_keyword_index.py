@@ -0,0 +1,43 @@
+"""Temizlenmiş chunk metinlerinin BM25 index'inde Türkçe sorgularla bulunması"""
+
+import pytest
+
+from keyword_index import BM25Index
+from turkish_text import TOKENIZER_VERSION
+from utils import clean_text
+
+CHUNKS = [
+    "İstanbul'un fethi 1453 yılında oldu",
+    "Malazgirt Meydan Muharebesi 1071 yılında yapıldı",
+    "Atatürk’ün Samsun'a çıkışı 19 Mayıs 1919'da gerçekleşti",
+]
+
+
+@pytest.fixture
+def index():
+    # Ingest pipeline'ı ile aynı: chunk'lar clean_text'ten geçip index'lenir
+    return BM25Index.from_texts([clean_text(text) for text in CHUNKS])
+
+
+def test_clean_text_keeps_apostrophes():
+    assert clean_text("  İstanbul'un   fethi @# ") == "İstanbul'un fethi"
+    assert "Atatürk’ün" in clean_text(CHUNKS[2])
+
+
+@pytest.mark.parametrize("query", ["İstanbul'un", "istanbul", "İSTANBUL", "İstanbul’da"])
+def test_apostrophe_and_bare_stem_queries_hit_cleaned_chunk(index, query):
+    results = index.search_text(query)
+
+    assert results and results[0][0] == 0
+
+
+@pytest.mark.parametrize("query, expected", [("Atatürk", 2), ("Samsun'a", 2), ("malazgirt", 1)])
+def test_other_proper_nouns(index, query, expected):
+    assert index.search_text(query)[0][0] == expected
+
+
+def test_index_from_older_tokenizer_is_not_current(index):
+    assert index.is_current
+    old = BM25Index.from_texts([clean_text(text) for text in CHUNKS])
+    old.tokenizer_version = "tr-1"
+    assert TOKENIZER_VERSION != "tr-1" and not old.is_current
@@ -0,0 +1,108 @@
+"""Eşzamanlı tekil isteklerin micro-batch'lerde birleştirilmesi"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from micro_batcher import MicroBatcher
+from retrieval import FAISSRetriever
+from tests.helpers import unit_vectors
+
+
+class RecordingBatchFn:
+    """Gelen batch'leri kaydeden, her isteğin karesini döndüren batch fonksiyonu"""
+
+    def __init__(self):
+        self.batches = []
+        self._lock = threading.Lock()
+
+    def __call__(self, items):
+        with self._lock:
+            self.batches.append(list(items))
+        return [item * item for item in items]
+
+
+def test_requests_within_wait_window_share_one_batch():
+    batch_fn = RecordingBatchFn()
+    batcher = MicroBatcher(batch_fn, max_batch_size=32, max_wait_ms=500)
+    try:
+        futures = [batcher.submit(i) for i in range(8)]
+        assert [future.result(timeout=5) for future in futures] == [i * i for i in range(8)]
+    finally:
+        batcher.close()
+
+    assert batch_fn.batches == [list(range(8))]
+    assert batcher.get_stats()["largest_batch"] == 8
+
+
+def test_max_batch_size_splits_batches():
+    batch_fn = RecordingBatchFn()
+    batcher = MicroBatcher(batch_fn, max_batch_size=4, max_wait_ms=500)
+    try:
+        futures = [batcher.submit(i) for i in range(10)]
+        assert [future.result(timeout=5) for future in futures] == [i * i for i in range(10)]
+    finally:
+        batcher.close()
+
+    assert [len(batch) for batch in batch_fn.batches] == [4, 4, 2]
+    stats = batcher.get_stats()
+    assert stats["batches"] == 3 and stats["items"] == 10
+
+
+def test_concurrent_callers_get_their_own_results():
+    batch_fn = RecordingBatchFn()
+    batcher = MicroBatcher(batch_fn, max_batch_size=16, max_wait_ms=20)
+    try:
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            results = list(executor.map(batcher, range(64)))
+    finally:
+        batcher.close()
+
+    assert results == [i * i for i in range(64)]
+    assert sorted(item for batch in batch_fn.batches for item in batch) == list(range(64))
+    assert len(batch_fn.batches) < 64
+
+
+def test_batch_error_is_raised_to_every_caller():
+    def failing(items):
+        raise RuntimeError("encode hatası")
+
+    batcher = MicroBatcher(failing, max_wait_ms=200)
+    try:
+        futures = [batcher.submit(i) for i in range(3)]
+        for future in futures:
+            with pytest.raises(RuntimeError, match="encode hatası"):
+                future.result(timeout=5)
+        # İşçi hatadan sonra çalışmaya devam eder
+        batcher.process_batch = lambda items: list(items)
+        assert batcher(7) == 7
+    finally:
+        batcher.close()
+
+
+def test_close_drains_pending_requests():
+    batcher = MicroBatcher(RecordingBatchFn(), max_wait_ms=1000)
+    futures = [batcher.submit(i) for i in range(3)]
+    batcher.close()
+
+    assert all(future.done() for future in futures)
+    assert [future.result() for future in futures] == [0, 1, 4]
+
+
+def test_batched_search_matches_direct_search(tmp_path):
+    vectors = unit_vectors(100)
+    retriever = FAISSRetriever(index_path=tmp_path / "index", dimension=vectors.shape[1], load=False)
+    retriever.create_index(vectors)
+    queries = unit_vectors(12, seed=3)
+
+    batcher = MicroBatcher(lambda batch: retriever.search_batch(np.stack(batch), top_k=5)[1].tolist(),
+                           max_batch_size=8, max_wait_ms=20)
+    try:
+        with ThreadPoolExecutor(max_workers=12) as executor:
+            batched = list(executor.map(batcher, queries))
+    finally:
+        batcher.close()
+
+    assert batched == retriever.search_batch(queries, top_k=5)[1].tolist()
@@ -0,0 +1,67 @@
+"""Eşik tabanlı (range) arama: değişken sonuç sayısı, max_k üst sınırı ve min_k geri dönüşü"""
+
+import numpy as np
+import pytest
+
+from tests.helpers import unit_vectors
+
+
+def similarities_to(vectors, query):
+    return vectors @ query
+
+
+@pytest.mark.parametrize("factory", ["Flat", "HNSW8"])
+def test_range_returns_all_results_above_threshold(make_retriever, factory):
+    vectors = unit_vectors(200)
+    query = vectors[0]
+    retriever = make_retriever(vectors, index_factory=factory)
+    threshold = 0.3
+
+    results = retriever.retrieve_batch(query[None], top_k=200, threshold=threshold, min_k=1)[0]
+
+    expected = np.flatnonzero(similarities_to(vectors, query) >= threshold)
+    assert {result["index"] for result in results} <= set(expected.tolist())
+    assert all(result["similarity"] >= threshold - 1e-6 for result in results)
+    if factory == "Flat":
+        assert len(results) == len(expected)
+    scores = [result["similarity"] for result in results]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_range_result_count_varies_per_query_and_respects_max_k(make_retriever):
+    vectors = unit_vectors(200)
+    # İlk sorgunun 12 yakın komşusu var, ikincisinin hiç yok (eşik çok yüksek)
+    vectors[1:12] = vectors[0] + 0.01 * unit_vectors(11, seed=4)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    retriever = make_retriever(vectors)
+    queries = np.stack([vectors[0], unit_vectors(1, seed=99)[0]])
+
+    near, far = retriever.retrieve_batch(queries, top_k=8, threshold=0.95, min_k=0)
+
+    assert len(near) == 8  # 12 sonuç eşiği geçer, max_k (top_k) ile sınırlanır
+    assert far == []
+
+
+def test_min_k_falls_back_to_best_results_below_threshold(make_retriever):
+    vectors = unit_vectors(100)
+    retriever = make_retriever(vectors)
+    query = unit_vectors(1, seed=42)[0]
+
+    results = retriever.retrieve_batch(query[None], top_k=10, threshold=0.99, min_k=3)[0]
+
+    best = np.argsort(-similarities_to(vectors, query))[:3]
+    assert [result["index"] for result in results] == best.tolist()
+    assert all(result["similarity"] < 0.99 for result in results)
+
+
+def test_min_k_is_capped_by_max_k_and_combines_with_filters(make_retriever):
+    vectors = unit_vectors(90)
+    retriever = make_retriever(vectors)
+    query = unit_vectors(1, seed=42)[0]
+    donem = retriever.chunk_list[1]["metadata"]["donem"]
+
+    results = retriever.retrieve_batch(query[None], top_k=2, threshold=0.99, min_k=5,
+                                       filters={"donem": donem})[0]
+
+    assert len(results) == 2
+    assert all(result["metadata"]["donem"] == donem for result in results)
@@ -0,0 +1,54 @@
+"""Cross-encoder skor önbelleğinin anahtarları (model yerine sayaçlı test modeli kullanılır)"""
+
+from reranker import CrossEncoderReranker
+
+
+class CountingModel:
+    """predict çağrılarını sayan, skoru metin uzunluğundan üreten model"""
+
+    def __init__(self):
+        self.scored = []
+
+    def predict(self, pairs, batch_size=32, show_progress_bar=False):
+        self.scored.extend(pairs)
+        return [float(len(text)) for _, text in pairs]
+
+
+def make_reranker():
+    reranker = CrossEncoderReranker()
+    reranker._model = CountingModel()
+    return reranker
+
+
+def chunk(content, uid=42):
+    return {"content": content, "metadata": {"id": "r1", "chunk_uid": uid}}
+
+
+def test_repeated_pairs_are_served_from_cache():
+    reranker = make_reranker()
+    reranker.score_pairs([("soru", chunk("a")), ("soru", chunk("bb"))])
+    scores = reranker.score_pairs([("soru", chunk("a")), ("soru", chunk("bb"))])
+
+    assert scores.tolist() == [1.0, 2.0]
+    assert len(reranker._model.scored) == 2
+    assert reranker.hits == 2
+
+
+def test_upserted_chunk_with_same_uid_is_rescored():
+    # Upsert aynı kayıt id'si + sırası için aynı chunk_uid'i korur, metin değişir
+    reranker = make_reranker()
+    reranker.score_pairs([("soru", chunk("eski metin"))])
+
+    scores = reranker.score_pairs([("soru", chunk("güncellenmiş metin"))])
+
+    assert scores.tolist() == [float(len("güncellenmiş metin"))]
+    assert [text for _, text in reranker._model.scored] == ["eski metin", "güncellenmiş metin"]
+
+
+def test_rerank_orders_by_score():
+    reranker = make_reranker()
+    candidates = [chunk("k", uid=1), chunk("en uzun metin", uid=2), chunk("orta", uid=3)]
+
+    results = reranker.rerank("soru", candidates, top_k=2)
+
+    assert [result["content"] for result in results] == ["en uzun metin", "orta"]
@@ -0,0 +1,42 @@
+"""Shard'lı index: yeniden oluşturma ve HybridRetriever uyumluluğu"""
+
+import pytest
+
+from retrieval import HybridRetriever
+from sharding import (SHARDS_DIRNAME, SHARDS_OLD_DIRNAME, SHARDS_STAGING_DIRNAME,
+                      ShardedRetriever, shard_dirname)
+from tests.helpers import DIMENSION, PERIODS, make_chunks, unit_vectors
+
+
+def build(index_path, chunks):
+    sharded = ShardedRetriever(index_path=index_path, dimension=DIMENSION)
+    sharded.create_index(unit_vectors(len(chunks)), chunks)
+    return sharded
+
+
+def test_rebuild_drops_shards_missing_from_corpus(tmp_path):
+    index_path = tmp_path / "index"
+    build(index_path, make_chunks(30))
+
+    # İkinci korpusta ilk dönem yok
+    chunks = [chunk for chunk in make_chunks(30) if chunk["metadata"]["donem"] != PERIODS[0]]
+    sharded = build(index_path, chunks)
+
+    assert sharded.shard_values == list(PERIODS[1:])
+    assert sorted(path.name for path in (index_path / SHARDS_DIRNAME).iterdir()) == \
+        sorted(shard_dirname(value) for value in PERIODS[1:])
+    assert not (index_path / SHARDS_STAGING_DIRNAME).exists()
+    assert not (index_path / SHARDS_OLD_DIRNAME).exists()
+
+    reloaded = ShardedRetriever(index_path=index_path, dimension=DIMENSION)
+    assert reloaded.shard_values == list(PERIODS[1:])
+    assert len(reloaded.chunk_list) == len(chunks)
+    results = reloaded.retrieve(unit_vectors(1, seed=3)[0], top_k=50)
+    assert {result["shard"] for result in results} == set(PERIODS[1:])
+
+
+def test_hybrid_retriever_rejects_sharded_layout(tmp_path):
+    sharded = build(tmp_path / "index", make_chunks(9))
+
+    with pytest.raises(TypeError, match="ShardedRetriever"):
+        HybridRetriever(sharded)
@@ -0,0 +1,94 @@
+"""Kararlı chunk id'leri ile upsert / delete (silme kayıtları) ve sıkıştırma"""
+
+import numpy as np
+
+from chunk_store import stable_chunk_id
+from retrieval import FAISSRetriever
+from tests.helpers import make_chunks, unit_vectors
+
+
+def saved_retriever(make_retriever, n=30, chunks_per_record=3):
+    """Diske kaydedilmiş (değişiklikleri segment olarak yazan) retriever"""
+    retriever = make_retriever(unit_vectors(n), make_chunks(n, chunks_per_record=chunks_per_record))
+    retriever.save_index()
+    assert retriever.persisted
+    return retriever
+
+
+def live_indices(retriever, query, top_k=100):
+    return [result["index"] for result in retriever.retrieve(query, top_k=top_k)]
+
+
+def test_upsert_replaces_old_chunks(make_retriever):
+    retriever = saved_retriever(make_retriever)
+    new_vectors = unit_vectors(2, seed=5)
+    chunks = [{"content": "yeni 1", "metadata": {"id": "r2"}},
+              {"content": "yeni 2", "metadata": {"id": "r2"}}]
+
+    stats = retriever.upsert_records(chunks, new_vectors)
+
+    assert stats == {"deleted": 3, "added": 2}
+    # Eski satırlar (6, 7, 8) aramada görünmez, yeni satırlar global id'lerin devamıdır
+    rows = live_indices(retriever, new_vectors[0])
+    assert not {6, 7, 8} & set(rows)
+    assert rows[0] == 30 and 31 in rows
+    assert [chunk["metadata"]["chunk_uid"] for chunk in chunks] == \
+        [stable_chunk_id("r2", 0), stable_chunk_id("r2", 1)]
+
+
+def test_delete_masks_rows_and_is_idempotent(make_retriever):
+    retriever = saved_retriever(make_retriever)
+    vectors = unit_vectors(30)
+
+    assert retriever.delete_records(["r0", "r5"]) == 6
+    assert retriever.delete_records(["r0"]) == 0
+
+    rows = live_indices(retriever, vectors[0])
+    assert len(rows) == 24
+    assert not {0, 1, 2, 15, 16, 17} & set(rows)
+
+
+def test_changes_survive_reload(make_retriever, tmp_path):
+    retriever = saved_retriever(make_retriever)
+    retriever.delete_records(["r1"])
+    retriever.upsert_records([{"content": "güncel", "metadata": {"id": "r3"}}], unit_vectors(1, seed=9))
+
+    reloaded = FAISSRetriever(index_path=tmp_path / "index", dimension=retriever.dimension, auto_compact=False)
+
+    assert reloaded.total_vectors == 31
+    assert sorted(reloaded.deleted.tolist()) == [3, 4, 5, 9, 10, 11]
+    assert reloaded.chunk_list[30]["content"] == "güncel"
+    assert reloaded.index_version == retriever.index_version
+
+
+def test_compaction_folds_deltas_and_keeps_results(make_retriever, tmp_path):
+    retriever = saved_retriever(make_retriever)
+    retriever.upsert_records([{"content": "a", "metadata": {"id": "r4"}}], unit_vectors(1, seed=7))
+    retriever.add_vectors(unit_vectors(4, seed=8), make_chunks(4, start=100), persist=True)
+    retriever.delete_records(["r6"])
+    query = unit_vectors(1, seed=11)[0]
+    before = retriever.retrieve(query, top_k=10)
+
+    retriever.compact()
+
+    assert len(retriever.delta_vectors) == 0
+    assert retriever.base_count == 35
+    assert retriever.segments.segments == []
+    assert [r["index"] for r in retriever.retrieve(query, top_k=10)] == [r["index"] for r in before]
+
+    # Sıkıştırılmış index diskten aynı sonuçlarla açılır, silinmiş satırlar maskeli kalır
+    reloaded = FAISSRetriever(index_path=tmp_path / "index", dimension=retriever.dimension, auto_compact=False)
+    assert reloaded.base_count == 35 and len(reloaded.delta_vectors) == 0
+    assert [r["index"] for r in reloaded.retrieve(query, top_k=10)] == [r["index"] for r in before]
+    assert not {12, 13, 14, 18, 19, 20} & set(live_indices(reloaded, query))
+
+
+def test_filters_exclude_deleted_rows(make_retriever):
+    retriever = saved_retriever(make_retriever, chunks_per_record=1)
+    retriever.delete_records([f"r{i}" for i in range(0, 30, 3)])
+
+    results = retriever.retrieve(unit_vectors(1, seed=3)[0], top_k=30,
+                                 filters={"donem": make_chunks(1)[0]["metadata"]["donem"]})
+
+    assert results == []
+    assert np.all(retriever.search_mask()[1::3])